@@ -0,0 +1,191 @@
+"""
+Rerun-Safe Upload Analysis
+Memoizes the analysis of each uploaded file in Streamlit session state
+"""
+
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from history import current_session_id
+from model import predict_batch, get_detailed_analysis, query_history
+from inference_queue import InferenceRejected
+import metrics
+import tracing
+
+# Number of analyzed uploads kept per session
+MAX_CACHED_ANALYSES = 8
+
+# Longest side of the image copy kept for display; the full-resolution
+# decode is released once the prediction (and extras) no longer need it
+DISPLAY_SIZE = 1024
+
+# Past predictions shown as similar cases, and the confidence band they must fall in
+SIMILAR_CASES = 5
+SIMILAR_CONFIDENCE_BAND = 5.0
+
+# Background pool for the extras shown below the result (shared by all sessions)
+_EXTRAS_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload-extras")
+
+_CACHE_KEY = "_upload_analyses"
+_DIGEST_KEY = "_upload_digests"
+
+
+def upload_digest(uploaded_file):
+    """
+    Return the SHA-256 of an uploaded file's content
+
+    The digest is computed once per upload (Streamlit file id) and reused
+    on later reruns.
+    """
+
+    digests = st.session_state.setdefault(_DIGEST_KEY, {})
+    digest = digests.get(uploaded_file.file_id)
+    if digest is None:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        digests[uploaded_file.file_id] = digest
+    return digest
+
+
+def analyze_upload(uploaded_file, extras=False):
+    """
+    Decode, validate and classify an uploaded image once per upload
+
+    Reruns triggered by widget interaction get the stored result back
+    without decoding, validating or predicting again, so each upload is
+    recorded in the prediction history exactly once. An upload turned away
+    by the inference queue (overload) is reported as not valid and is not
+    stored, so the next rerun tries again.
+
+    Only a display copy of at most DISPLAY_SIZE pixels per side is stored;
+    pass extras=True to start the extras (see `start_extras`) from the
+    full-resolution image before it is released.
+
+    Args:
+        uploaded_file (UploadedFile): File returned by `st.file_uploader`
+        extras (bool): Start the extras of a valid image
+
+    Returns:
+        dict: image (display copy), is_valid, message, metadata and, for valid images,
+              severity_class, class_id, confidence, probabilities, predicted_at,
+              degraded and details; request_id is the trace id when tracing is on
+    """
+
+    key = (uploaded_file.file_id, upload_digest(uploaded_file))
+    analyses = st.session_state.setdefault(_CACHE_KEY, {})
+    analysis = analyses.get(key)
+    metrics.cache_lookup("upload_analysis", analysis is not None)
+    if analysis is not None:
+        return analysis
+
+    # Pillow and NumPy (via utils) load on the first upload, not on page load
+    from utils import create_thumbnail, decode_image, preprocess_image, validate_image, get_image_metadata
+
+    with tracing.span("upload.analyze", file=uploaded_file.name, bytes=uploaded_file.size) as span:
+        started = time.perf_counter()
+        image = decode_image(uploaded_file)  # decode now; the uploaded buffer is not kept across reruns
+        is_valid, message = validate_image(image, file_size=uploaded_file.size)
+        analysis = {
+            "image": create_thumbnail(image, (DISPLAY_SIZE, DISPLAY_SIZE)),
+            "is_valid": is_valid,
+            "message": message,
+            "metadata": get_image_metadata(image),
+        }
+
+        if is_valid:
+            processed_img = preprocess_image(image)
+            try:
+                result = predict_batch(processed_img)[0]
+            except InferenceRejected as e:
+                analysis.update({
+                    "is_valid": False,
+                    "message": f"⏳ The model is busy ({e.reason}). Please try again in a few seconds.",
+                })
+                return analysis
+            analysis.update({
+                "severity_class": result.severity,
+                "class_id": result.class_id,
+                "confidence": result.confidence,
+                "probabilities": result.probabilities,
+                "predicted_at": result.timestamp,
+                "degraded": result.degraded,
+                "details": get_detailed_analysis(result.severity),
+            })
+            metrics.observe("end_to_end", time.perf_counter() - started)
+            if extras:
+                start_extras(analysis, current_session_id(), image)
+        span.set(valid=analysis["is_valid"])
+        analysis["request_id"] = span.request_id
+
+    analyses[key] = analysis
+    while len(analyses) > MAX_CACHED_ANALYSES:
+        stale_key = next(iter(analyses))  # oldest first (insertion order)
+        del analyses[stale_key]
+        st.session_state[_DIGEST_KEY].pop(stale_key[0], None)
+    return analysis
+
+
+def enhancement_preview(image, max_size=(400, 400)):
+    """Thumbnails of the image before and after the standard enhancement."""
+    from utils import create_thumbnail, enhance_image
+
+    original = create_thumbnail(image, max_size)
+    enhanced = enhance_image(original, brightness=1.1, contrast=1.2, sharpness=1.5)
+    return {"original": original, "enhanced": enhanced}
+
+
+def find_similar_cases(analysis, session_id):
+    """
+    Past predictions with the same severity and a similar confidence
+
+    Searches only the current session's history (persisted or in memory),
+    so other users' predictions are never shown; the analysis itself is
+    left out.
+    """
+
+    confidence = analysis["confidence"]
+    page = query_history(
+        limit=SIMILAR_CASES + 1,
+        scope="session",
+        session_id=session_id,
+        class_ids=[analysis["class_id"]],
+        min_confidence=confidence - SIMILAR_CONFIDENCE_BAND,
+        max_confidence=confidence + SIMILAR_CONFIDENCE_BAND,
+    )
+    cases = [r for r in page["records"] if r["timestamp"] != analysis["predicted_at"]]
+    return cases[:SIMILAR_CASES]
+
+
+def start_extras(analysis, session_id, image=None):
+    """
+    Start the slower extras for a valid analysis in the background
+
+    Submitted once per analysis; later reruns get the same futures back,
+    already finished. Workers never call Streamlit, so the page renders the
+    result first and fills placeholders as each future completes. Only the
+    results are kept: the image is released when the workers finish.
+
+    Args:
+        analysis (dict): Result of `analyze_upload` for a valid image
+        session_id (str): Current session id (worker threads have no
+                          Streamlit context to look it up)
+        image (PIL.Image): Full-resolution image (defaults to the display copy)
+
+    Returns:
+        dict: image_stats, enhancement and similar_cases futures
+    """
+
+    from utils import calculate_image_stats
+
+    extras = analysis.get("extras")
+    if extras is None:
+        image = image if image is not None else analysis["image"]
+        extras = {
+            "image_stats": _EXTRAS_EXECUTOR.submit(calculate_image_stats, image),
+            "enhancement": _EXTRAS_EXECUTOR.submit(enhancement_preview, image),
+            "similar_cases": _EXTRAS_EXECUTOR.submit(find_similar_cases, analysis, session_id),
+        }
+        analysis["extras"] = extras
+    return extras
@@ -0,0 +1,348 @@
+"""
+Headless Inference API
+Standard-library HTTP service exposing the classifier without Streamlit
+
+Endpoints:
+    GET  /healthz         Model and history status
+    GET  /metrics         Prometheus metrics of this process
+    GET  /debug/profile   Status and files of the current or last profile
+    POST /debug/profile   Start sampling this worker (?seconds=30&memory=1)
+    POST /debug/profile/stop
+    POST /predict         One image, as the raw request body (image/*) or
+                          as the first file of a multipart/form-data body
+    POST /predict/batch   Every file of a multipart/form-data body
+
+Predictions go through the same model manager, preprocessing and
+`model.predict_batch` as the Streamlit pages and are recorded in the
+prediction history under the "api" session. Requests shed by the inference
+queue under overload are answered with 503 and a Retry-After header; when
+only the dummy fallback model is available every prediction request is
+answered with 503 rather than with random results. A batch shed after its
+first micro-batch was classified returns the finished results and marks
+the remaining files with "retry": true, so a retry does not record the
+classified ones twice.
+
+With tracing on (see tracing.py) each POST is traced, continuing the
+caller's trace when it sends a W3C `traceparent` header, and the response
+carries the trace id as X-Request-Id.
+
+The /debug/profile endpoints (see profiler.py) answer only when
+ACCIDENT_ADMIN_TOKEN is set and the request sends it as a bearer token.
+
+Usage:
+    python api.py [--host 127.0.0.1] [--port 8000]
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import metrics
+import model
+import profiler
+import tracing
+from inference_queue import InferenceRejected
+from model import ModelUnavailable
+from batch_inference import BATCH_SIZE, DECODE_WORKERS, load_upload
+
+# History session and scheduling class for predictions served by the API
+API_SESSION = "api"
+API_PRIORITY = "api"
+
+# Largest accepted request body and number of files per batch request
+MAX_BODY_BYTES = int(os.environ.get("ACCIDENT_API_MAX_BODY_MB", "64")) * 1024 * 1024
+MAX_BATCH_FILES = 64
+
+# Shared by all request threads for decoding and resizing
+_DECODE_POOL = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="api-decode")
+
+
+class RequestError(Exception):
+    """A client error reported to the caller with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Upload(io.BytesIO):
+    """An uploaded file held in memory, shaped like Streamlit's UploadedFile."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def parse_multipart(content_type, body):
+    """
+    Split a multipart/form-data body into its file parts
+
+    Args:
+        content_type (str): Request Content-Type header, including the boundary
+        body (bytes): Request body
+
+    Returns:
+        list: Upload objects, in request order
+    """
+
+    header = f"Content-Type: {content_type}\r\nMIME-Version: 1.0\r\n\r\n".encode("latin-1")
+    message = BytesParser(policy=policy.HTTP).parsebytes(header + body)
+    if not message.is_multipart():
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed multipart body")
+
+    uploads = []
+    for index, part in enumerate(message.iter_parts()):
+        name = part.get_filename()
+        if name is None:
+            continue  # plain form fields
+        uploads.append(Upload(name or f"file-{index}", part.get_payload(decode=True) or b""))
+    return uploads
+
+
+def classify_uploads(uploads, session_id=API_SESSION):
+    """
+    Classify uploaded images in micro-batches
+
+    Args:
+        uploads (list): Upload objects
+        session_id (str): History session the predictions are recorded under
+
+    Returns:
+        list: One dict per upload: file and either result (PredictionResult.to_dict())
+              or error (with retry: true for files left unclassified because the
+              inference queue shed a later micro-batch)
+
+    Raises:
+        InferenceRejected: The queue shed the first micro-batch (nothing recorded)
+        ModelUnavailable: Only the dummy fallback model is available
+    """
+
+    from utils import preprocess_batch
+
+    responses = []
+    for start in range(0, len(uploads), BATCH_SIZE):
+        loaded = list(_DECODE_POOL.map(tracing.bind(load_upload), uploads[start:start + BATCH_SIZE]))
+        valid = [item for item in loaded if item["is_valid"]]
+
+        results = []
+        if valid:
+            batch = preprocess_batch([item["image"] for item in valid], executor=_DECODE_POOL)
+            try:
+                # With the history database every prediction is kept there;
+                # otherwise the (bounded) "api" session log is the only copy
+                results = model.predict_batch(batch, session_id=session_id, priority=API_PRIORITY,
+                                              allow_fallback=False, session_log=not model.history_persisted())
+            except InferenceRejected as e:
+                if not responses:
+                    raise
+                # Earlier micro-batches are already recorded: report them and
+                # let the client retry only the rest
+                message = f"Model busy ({e.reason}); retry this file"
+                responses.extend({"file": upload.name, "error": message, "retry": True}
+                                 for upload in uploads[start:])
+                return responses
+
+        results = iter(results)
+        for item in loaded:
+            if item["is_valid"]:
+                responses.append({"file": item["name"], "result": next(results).to_dict()})
+            else:
+                responses.append({"file": item["name"], "error": item["message"]})
+    return responses
+
+
+def health():
+    """Service status reported by /healthz."""
+    manager = model.get_model_manager()
+    return {
+        "status": "ok",
+        "model_loaded": manager.is_loaded,
+        "model_fallback": manager.is_fallback,
+        "model_file": model.model_exists(),
+        "model_version": model.MODEL_VERSION,
+        "loaded_at": manager.loaded_at.isoformat() if manager.loaded_at else None,
+        "history_persisted": model.history_persisted(),
+        "inference": model.get_inference_metrics(),
+    }
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the inference endpoints and answers in JSON."""
+
+    server_version = "AccidentSeverityAPI/1.0"
+    protocol_version = "HTTP/1.1"
+    request_id = None
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self.send_json(HTTPStatus.OK, health())
+        elif path == "/metrics":
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", metrics.PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/debug/profile":
+            try:
+                self.check_admin()
+                self.send_json(HTTPStatus.OK, profiler.status())
+            except RequestError as e:
+                self.send_json(e.status, {"error": str(e)})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        parent = tracing.parse_traceparent(self.headers.get("traceparent"))
+        with tracing.span(f"POST {path}", parent=parent, kind=tracing.KIND_SERVER) as span:
+            self.request_id = span.request_id
+            status = self.handle_post(path)
+            span.set(**{"http.status_code": int(status)})
+        self.request_id = None
+
+    def handle_post(self, path):
+        started = time.perf_counter()
+        try:
+            if path == "/predict":
+                response = self.predict_one()
+            elif path == "/predict/batch":
+                response = {"results": self.predict_many()}
+            elif path == "/debug/profile":
+                return self.send_json(HTTPStatus.ACCEPTED, self.start_profile())
+            elif path == "/debug/profile/stop":
+                self.read_body()
+                self.check_admin()
+                return self.send_json(HTTPStatus.OK, profiler.stop())
+            else:
+                self.read_body()  # keep the connection usable
+                raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {self.path}")
+            metrics.observe("end_to_end", time.perf_counter() - started)
+            return self.send_json(HTTPStatus.OK, response)
+        except RequestError as e:
+            return self.send_json(e.status, {"error": str(e)})
+        except InferenceRejected as e:
+            retry_after = max(1, round(e.retry_after or 1))
+            return self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)},
+                                  headers={"Retry-After": str(retry_after)})
+        except ModelUnavailable as e:
+            return self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)})
+        except Exception as e:
+            print(f"❌ API request failed: {e}")
+            return self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Prediction failed"})
+
+    def read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            self.close_connection = True  # the body length is unknown
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # the body is not read
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Request body exceeds {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        return self.rfile.read(length)
+
+    def read_uploads(self):
+        body = self.read_body()
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            uploads = parse_multipart(content_type, body)
+        elif content_type.startswith("image/") or content_type == "application/octet-stream":
+            uploads = [Upload(self.headers.get("X-Filename", "upload"), body)]
+        else:
+            raise RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                               "Send multipart/form-data or an image/* body")
+        if not uploads:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "No image in request")
+        return uploads
+
+    def predict_one(self):
+        response = classify_uploads(self.read_uploads()[:1])[0]
+        if "error" in response:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, response["error"])
+        return response["result"]
+
+    def predict_many(self):
+        uploads = self.read_uploads()
+        if len(uploads) > MAX_BATCH_FILES:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"At most {MAX_BATCH_FILES} files per batch request")
+        return classify_uploads(uploads)
+
+    def check_admin(self):
+        if profiler.admin_token() is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, "Profiling is disabled (set ACCIDENT_ADMIN_TOKEN)")
+        sent = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not profiler.is_admin(sent):
+            raise RequestError(HTTPStatus.FORBIDDEN, "Invalid admin token")
+
+    def start_profile(self):
+        self.read_body()
+        self.check_admin()
+        query = parse_qs(self.path.partition("?")[2])
+        try:
+            seconds = float(query.get("seconds", ["30"])[0])
+            interval = float(query.get("interval", [str(profiler.DEFAULT_INTERVAL)])[0])
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "seconds and interval must be numbers")
+        memory = query.get("memory", ["0"])[0] not in ("0", "false", "")
+        try:
+            return profiler.start(seconds, interval, memory)
+        except RuntimeError as e:
+            raise RequestError(HTTPStatus.CONFLICT, str(e))
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.request_id:
+            self.send_header("X-Request-Id", self.request_id)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+
+def create_server(host="127.0.0.1", port=8000):
+    """Build the threaded HTTP server (one thread per connection)."""
+    server = ThreadingHTTPServer((host, port), InferenceHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve accident severity predictions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    args = parser.parse_args(argv)
+
+    # Load the model before accepting traffic so the first request is not slow
+    model.get_model_manager().model
+    model.start_history_compaction()
+    server = create_server(args.host, args.port)
+    print(f"🚀 Serving predictions on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
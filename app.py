@@ -6,10 +6,9 @@ Run this file: streamlit run app.py
 """
 
 import streamlit as st
-from PIL import Image
-import numpy as np
-from model import predict_severity, get_detailed_analysis, get_recommendations
-from utils import preprocess_image, validate_image, get_image_metadata
+from model import get_recommendations
+from analysis_cache import analyze_upload
+from caching import use_cached_model, measured_kpis, format_seconds
 
 # Page Configuration
 st.set_page_config(
@@ -19,6 +18,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Share one cached model manager across sessions
+use_cached_model()
+
 # Custom CSS for better UI
 st.markdown("""
     <style>
@@ -67,9 +69,10 @@ with st.sidebar:
     """)
     
     st.header("📊 Quick Stats")
+    kpis = measured_kpis()
     st.metric("Model Accuracy", "94.2%")
-    st.metric("Total Predictions", "1,247")
-    st.metric("Processing Speed", "1.8s")
+    st.metric("Total Predictions", f"{kpis['total_predictions']:,}")
+    st.metric("Processing Speed", format_seconds(kpis["latency"]["mean"]))
     
     st.markdown("---")
     st.caption("💡 Tip: Upload clear, well-lit images for best results")
@@ -85,11 +88,11 @@ uploaded_file = st.file_uploader(
 )
 
 if uploaded_file is not None:
-    # Load image
-    image = Image.open(uploaded_file)
-    
-    # Validate image
-    is_valid, message = validate_image(image)
+    # Decode, validate and classify once per upload; reruns reuse the result
+    with st.spinner("Analyzing image..."):
+        analysis = analyze_upload(uploaded_file)
+    image = analysis["image"]
+    is_valid, message = analysis["is_valid"], analysis["message"]
     
     if not is_valid:
         st.error(message)
@@ -103,7 +106,7 @@ if uploaded_file is not None:
 
             # Show image metadata in expander
             with st.expander("📊 Image Details"):
-                metadata = get_image_metadata(image)
+                metadata = analysis["metadata"]
                 st.write(f"**Dimensions:** {metadata['width']} x {metadata['height']} px")
                 st.write(f"**Format:** {metadata['format']}")
                 st.write(f"**Mode:** {metadata['mode']}")
@@ -113,16 +116,10 @@ if uploaded_file is not None:
         with col2:
             st.subheader("🔍 Analysis Results")
             
-            # Processing indicator
-            with st.spinner("Analyzing image..."):
-                # Preprocess image
-                processed_img = preprocess_image(image)
-                
-                # Get prediction
-                severity_class, confidence = predict_severity(processed_img)
-                
-                # Get detailed analysis
-                details = get_detailed_analysis(severity_class)
+            # Results computed once per upload by analyze_upload()
+            severity_class = analysis["severity_class"]
+            confidence = analysis["confidence"]
+            details = analysis["details"]
             
             # Display results with color coding
             if "Minor" in severity_class:
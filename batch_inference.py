@@ -0,0 +1,156 @@
+"""
+Batch Image Analysis
+Concurrent decoding and micro-batched inference for multi-image claims
+"""
+
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from model import SEVERITY_CLASSES, predict_batch
+from inference_queue import InferenceRejected
+import tracing
+
+# Images classified per model call; results are reported after each micro-batch
+BATCH_SIZE = 8
+
+# Threads decoding, validating and resizing images (Pillow releases the GIL)
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Status of images the inference queue turned away; they can be retried
+BUSY_STATUS = "⏳ Model busy, retry"
+
+
+def load_upload(uploaded_file):
+    """
+    Decode and validate one uploaded image
+
+    Returns:
+        dict: name, image (None when unreadable), is_valid, message, metadata
+    """
+
+    from utils import decode_image, validate_image, get_image_metadata
+
+    try:
+        image = decode_image(uploaded_file)
+    except Exception as e:
+        return {
+            "name": uploaded_file.name,
+            "image": None,
+            "is_valid": False,
+            "message": f"❌ Could not read image: {e}",
+            "metadata": None,
+        }
+
+    is_valid, message = validate_image(image, file_size=getattr(uploaded_file, "size", None))
+    return {
+        "name": uploaded_file.name,
+        "image": image,
+        "is_valid": is_valid,
+        "message": message,
+        "metadata": get_image_metadata(image),
+    }
+
+
+def _result_row(loaded, result=None, status=None):
+    return {
+        "file": loaded["name"],
+        "status": status or ("✅ Analyzed" if result is not None else loaded["message"]),
+        "severity": result.severity if result is not None else None,
+        "class_id": result.class_id if result is not None else None,
+        "confidence": round(result.confidence, 1) if result is not None else None,
+        "megapixels": loaded["metadata"]["megapixels"] if loaded["metadata"] else None,
+    }
+
+
+def analyze_files(files, batch_size=BATCH_SIZE, session_id=None):
+    """
+    Classify uploaded images micro-batch by micro-batch
+
+    Each micro-batch is decoded, validated and preprocessed concurrently,
+    then classified with a single `model.predict_batch` call. Full-size
+    images are released before the next micro-batch is read, so memory is
+    bounded by the batch size rather than the number of files.
+
+    Args:
+        files (list): Uploaded files (anything `PIL.Image.open` accepts with a `name`)
+        batch_size (int): Images per model call
+        session_id (str): History session (defaults to the current one)
+
+    Yields:
+        list: Result rows for one micro-batch, in upload order (valid images
+              the inference queue turned away get BUSY_STATUS)
+    """
+
+    from utils import preprocess_batch
+
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as executor:
+        for start in range(0, len(files), batch_size):
+            with tracing.span("batch.analyze", files=len(files[start:start + batch_size])):
+                loaded = list(executor.map(tracing.bind(load_upload), files[start:start + batch_size]))
+                valid = [item for item in loaded if item["is_valid"]]
+
+                results, status = [], None
+                if valid:
+                    batch = preprocess_batch([item["image"] for item in valid], executor=executor)
+                    try:
+                        results = predict_batch(batch, session_id=session_id)
+                    except InferenceRejected:
+                        status = BUSY_STATUS
+            for item in loaded:
+                item["image"] = None
+
+            if status is not None:
+                yield [_result_row(item, status=status if item["is_valid"] else None) for item in loaded]
+                continue
+
+            results = iter(results)
+            yield [_result_row(item, next(results) if item["is_valid"] else None) for item in loaded]
+
+
+def summarize_claim(rows):
+    """
+    Summarize the analyzed images of one claim
+
+    Args:
+        rows (list): Result rows from `analyze_files`
+
+    Returns:
+        dict: images, analyzed, failed, worst_severity, worst_class_id,
+              severity_counts, min/max/mean confidence, confidence_spread
+              (max - min) and confidence_stdev
+    """
+
+    analyzed = [row for row in rows if row["class_id"] is not None]
+    counts = [0] * len(SEVERITY_CLASSES)
+    for row in analyzed:
+        counts[row["class_id"]] += 1
+
+    summary = {
+        "images": len(rows),
+        "analyzed": len(analyzed),
+        "failed": len(rows) - len(analyzed),
+        "severity_counts": dict(zip(SEVERITY_CLASSES, counts)),
+        "worst_severity": None,
+        "worst_class_id": None,
+        "min_confidence": None,
+        "max_confidence": None,
+        "mean_confidence": None,
+        "confidence_spread": None,
+        "confidence_stdev": None,
+    }
+    if not analyzed:
+        return summary
+
+    worst = max(row["class_id"] for row in analyzed)
+    confidences = [row["confidence"] for row in analyzed]
+    summary.update({
+        "worst_severity": SEVERITY_CLASSES[worst],
+        "worst_class_id": worst,
+        "min_confidence": min(confidences),
+        "max_confidence": max(confidences),
+        "mean_confidence": statistics.fmean(confidences),
+        "confidence_spread": max(confidences) - min(confidences),
+        "confidence_stdev": statistics.pstdev(confidences),
+    })
+    return summary
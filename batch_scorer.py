@@ -0,0 +1,316 @@
+"""
+Resumable Batch Scorer
+Command-line severity scoring for directories or manifests of images
+
+Images are decoded, validated and preprocessed in a process pool, classified
+in batches with `model.predict_batch` (one model call per batch) and recorded
+in the history database (and the global totals) under the "batch" session;
+no in-memory session log is kept for them. Every scored image is
+appended to an NDJSON file as soon as its batch finishes; that file is also
+the checkpoint, so an interrupted run picks up where it stopped when started
+again with the same arguments. A batch is recorded in the history only after
+its rows are flushed to the checkpoint, so a resumed run never records an
+image twice. Parquet output is written from the NDJSON checkpoint once every
+image has been scored.
+
+Scoring needs the trained model: without it (or when it fails) the run stops
+with exit status 1 instead of writing dummy predictions.
+
+Usage:
+    python -m batch_scorer SOURCE [--output scores.ndjson] [--batch-size 32]
+                                  [--workers N] [--session batch] [--restart]
+
+SOURCE is a directory (searched recursively for JPG/PNG files) or a manifest:
+a text file with one image path per line, relative to the manifest's folder;
+blank lines and lines starting with "#" are skipped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# File extensions picked up when SOURCE is a directory
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Images per model call
+DEFAULT_BATCH_SIZE = 32
+
+# History session the scored images are recorded under
+DEFAULT_SESSION = "batch"
+
+# Scheduling class: backfills use the capacity interactive uploads leave idle
+SCORER_PRIORITY = "bulk"
+
+# Batches being preprocessed ahead of the model, per worker process
+PREFETCH_PER_WORKER = 2
+
+# Batches between progress reports
+PROGRESS_EVERY = 20
+
+# Longest pause before retrying a batch the inference queue turned away
+MAX_BACKOFF_SECONDS = 30
+
+# Columns of every output row, in order
+OUTPUT_FIELDS = [
+    "path", "status", "error", "severity", "class_id", "confidence",
+    "model_version", "timestamp", "width", "height",
+]
+
+
+def find_images(source):
+    """
+    List the images to score, in a stable order
+
+    Args:
+        source (str): Directory or manifest file
+
+    Returns:
+        list: Image paths (sorted for a directory, manifest order otherwise)
+    """
+
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            paths.extend(
+                os.path.join(root, name) for name in sorted(files)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        return paths
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+
+def load_checkpoint(path):
+    """
+    Return the image paths already present in an NDJSON output file
+
+    A trailing partial line (a run killed mid-write) is cut off so that
+    appending can continue from a clean line boundary.
+    """
+
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "rb+") as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                done.add(json.loads(line)["path"])
+            except (ValueError, KeyError):
+                break
+            complete += len(line)
+        f.truncate(complete)
+    return done
+
+
+def prepare_batch(paths):
+    """
+    Decode, validate and preprocess one batch of images (runs in a worker process)
+
+    Returns:
+        tuple: (rows, array) where rows has one output row per path (status
+               "ok" for images in `array`, "error" otherwise) and array is the
+               (N, 224, 224, 3) batch of the valid images, or None
+    """
+
+    from utils import decode_image, preprocess_batch, validate_image
+
+    rows, images = [], []
+    for path in paths:
+        row = dict.fromkeys(OUTPUT_FIELDS)
+        row["path"] = path
+        try:
+            image = decode_image(path)
+            row["width"], row["height"] = image.size
+            is_valid, message = validate_image(image, file_size=os.path.getsize(path))
+        except Exception as e:
+            is_valid, message = False, f"❌ Could not read image: {e}"
+
+        if is_valid:
+            row["status"] = "ok"
+            images.append(image)
+        else:
+            row["status"] = "error"
+            row["error"] = message
+        rows.append(row)
+
+    return rows, preprocess_batch(images) if images else None
+
+
+def _batches(paths, size):
+    paths = iter(paths)
+    while True:
+        batch = list(islice(paths, size))
+        if not batch:
+            return
+        yield batch
+
+
+def score(paths, output, batch_size=DEFAULT_BATCH_SIZE, workers=None, session_id=DEFAULT_SESSION):
+    """
+    Score images and append one NDJSON row per image to `output`
+
+    Preprocessing runs in a process pool a few batches ahead of the model so
+    the model is never waiting on decoding. Rows are flushed to disk after
+    every batch.
+
+    Args:
+        paths (list): Images to score
+        output (str): NDJSON file to append to
+        batch_size (int): Images per model call
+        workers (int): Preprocessing processes (defaults to the CPU count)
+        session_id (str): History session for the predictions
+
+    Returns:
+        dict: scored, failed and seconds
+
+    Raises:
+        ModelUnavailable: The trained model is not available; rows of the
+                          batches scored so far are kept
+    """
+
+    from model import predict_batch, record_predictions
+    from inference_queue import InferenceRejected
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    scored = failed = batches_done = 0
+
+    batches = _batches(paths, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output, "a", encoding="utf-8") as out:
+        pending = deque(pool.submit(prepare_batch, batch)
+                        for batch in islice(batches, workers * PREFETCH_PER_WORKER))
+        while pending:
+            rows, array = pending.popleft().result()
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(pool.submit(prepare_batch, batch))
+
+            results = []
+            backoff = 1
+            while array is not None:
+                try:
+                    results = predict_batch(array, session_id=session_id, priority=SCORER_PRIORITY,
+                                            allow_fallback=False, record=False)
+                    break
+                except InferenceRejected as e:
+                    # Shared model under load: back off instead of adding to it
+                    time.sleep(min(max(e.retry_after or 0, backoff), MAX_BACKOFF_SECONDS))
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+            scored_results = iter(results)
+            for row in rows:
+                if row["status"] == "ok":
+                    result = next(scored_results)
+                    row.update({
+                        "severity": result.severity,
+                        "class_id": result.class_id,
+                        "confidence": round(result.confidence, 2),
+                        "model_version": result.model_version,
+                        "timestamp": result.timestamp.isoformat(),
+                    })
+                    scored += 1
+                else:
+                    failed += 1
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            if results:
+                # Only the database and the totals: nothing reads a CLI run's session log
+                record_predictions(results, session_id, session_log=False)
+
+            batches_done += 1
+            if batches_done % PROGRESS_EVERY == 0 or not pending:
+                done = scored + failed
+                elapsed = time.perf_counter() - started
+                print(f"📊 {done}/{len(paths)} images ({done / elapsed:.1f}/s), {failed} failed",
+                      file=sys.stderr)
+
+    return {"scored": scored, "failed": failed, "seconds": time.perf_counter() - started}
+
+
+def write_parquet(ndjson_path, parquet_path):
+    """Convert a finished NDJSON checkpoint into a Parquet file, chunk by chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from export import CHUNK_SIZE
+
+    schema = pa.schema([
+        ("path", pa.string()),
+        ("status", pa.string()),
+        ("error", pa.string()),
+        ("severity", pa.string()),
+        ("class_id", pa.int8()),
+        ("confidence", pa.float64()),
+        ("model_version", pa.string()),
+        ("timestamp", pa.string()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+    ])
+    with open(ndjson_path, encoding="utf-8") as f, \
+            pq.ParquetWriter(parquet_path, schema, compression="zstd") as writer:
+        for lines in _batches(f, CHUNK_SIZE):
+            writer.write_table(pa.Table.from_pylist([json.loads(line) for line in lines], schema=schema))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a directory or manifest of accident images")
+    parser.add_argument("source", help="Image directory or manifest file (one path per line)")
+    parser.add_argument("--output", default="scores.ndjson",
+                        help="Output file; .parquet writes Parquet, anything else NDJSON")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Images per model call")
+    parser.add_argument("--workers", type=int, default=None, help="Preprocessing processes")
+    parser.add_argument("--session", default=DEFAULT_SESSION, help="History session for the predictions")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and score everything")
+    args = parser.parse_args(argv)
+
+    parquet = args.output.endswith(".parquet")
+    checkpoint = args.output + ".partial.ndjson" if parquet else args.output
+
+    if parquet:
+        from export import parquet_available
+        if not parquet_available():
+            parser.error("Parquet output requires pyarrow (pip install pyarrow)")
+        if os.path.exists(args.output) and not os.path.exists(checkpoint) and not args.restart:
+            print(f"✅ {args.output} is already complete (use --restart to score again)", file=sys.stderr)
+            return 0
+
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    paths = find_images(args.source)
+    done = load_checkpoint(checkpoint)
+    remaining = [path for path in paths if path not in done]
+    print(f"🗂️ {len(paths)} images found, {len(paths) - len(remaining)} already scored, "
+          f"{len(remaining)} to go", file=sys.stderr)
+
+    if remaining:
+        from model import ModelUnavailable
+        try:
+            summary = score(remaining, checkpoint, args.batch_size, args.workers, args.session)
+        except ModelUnavailable as e:
+            print(f"❌ {e}; nothing more was scored (re-run once the model is available)", file=sys.stderr)
+            return 1
+        print(f"✅ Scored {summary['scored']} images, {summary['failed']} failed, "
+              f"in {summary['seconds']:.1f}s", file=sys.stderr)
+
+    if parquet:
+        write_parquet(checkpoint, args.output)
+        os.remove(checkpoint)
+        print(f"📦 Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
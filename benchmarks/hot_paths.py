@@ -0,0 +1,259 @@
+"""
+Hot-Path Micro-Benchmarks
+Times the image utilities, prediction and statistics on synthetic inputs
+
+Images are generated deterministically (gradients, a periodic pattern and
+seeded noise, so JPEG and PNG compress like photographs rather than like
+flat colour or pure noise), encoded once per format and decoded before the
+image benchmarks run. Every case runs once to warm up, then `--repeat`
+times; reported per case:
+
+- median_ms / min_ms: Wall time of one call
+- mp_per_s: Megapixels processed per second at the median (image cases)
+
+Benchmarks and their cases:
+- decode_image, validate_image (PNG re-encode size check),
+  validate_image_with_size (upload size given), preprocess_image,
+  calculate_image_stats, enhance_image, create_thumbnail: one case per
+  image size and format, e.g. "12mp-jpeg"
+- predict_severity: "dummy" (fallback model) and "real" (the TensorFlow
+  model, reported as skipped when it or TensorFlow is missing); the
+  input is a preprocessed image, so the size does not matter
+- get_statistics: session and global scope at each history size
+
+History is kept in memory for the run (no database or shared counters).
+
+Usage:
+    python benchmarks/hot_paths.py [--repeat 5] [--output results.json]
+                                   [--sizes 0.3 2 12 48] [--formats jpeg png]
+                                   [--history-sizes 100 10000 100000] [benchmark ...]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the benchmark away from the real history database and shared counters
+os.environ["ACCIDENT_HISTORY_DB"] = ""
+os.environ["ACCIDENT_SHARED_STATS"] = ""
+
+# Megapixels -> (width, height), 4:3 like most camera sensors
+IMAGE_SIZES = {
+    0.3: (640, 480),
+    2: (1600, 1200),
+    12: (4000, 3000),
+    24: (5600, 4200),
+    48: (8000, 6000),
+}
+FORMATS = ["jpeg", "png"]
+HISTORY_SIZES = [100, 10_000, 100_000]
+
+IMAGE_BENCHMARKS = [
+    "decode_image", "validate_image", "validate_image_with_size", "preprocess_image",
+    "calculate_image_stats", "enhance_image", "create_thumbnail",
+]
+BENCHMARKS = IMAGE_BENCHMARKS + ["predict_severity", "get_statistics"]
+
+SEED = 20240601
+
+
+def synthetic_image(width, height, seed=SEED):
+    """Deterministic RGB test image of the given size."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 200, width, dtype=np.float32)
+    ys = np.linspace(0, 200, height, dtype=np.float32)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = xs[None, :]
+    pixels[..., 1] = ys[:, None]
+    pixels[..., 2] = (np.sin(xs / 9)[None, :] + np.cos(ys / 13)[:, None]) * 50 + 100
+    pixels += rng.integers(0, 32, size=pixels.shape, dtype=np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def encode(image, format):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format.upper(), **({"quality": 90} if format == "jpeg" else {}))
+    return buffer.getvalue()
+
+
+def time_call(function, repeat, number=1):
+    """
+    Median and minimum milliseconds per call after one warm-up call
+
+    Each of the `repeat` timings covers `number` back-to-back calls, so
+    calls far shorter than the timer resolution can still be measured.
+    """
+
+    function()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        runs.append((time.perf_counter() - started) * 1000 / number)
+    digits = 3 if number == 1 else 6
+    return {"median_ms": round(statistics.median(runs), digits), "min_ms": round(min(runs), digits)}
+
+
+def image_cases(image, data, file_size):
+    """Benchmark name -> callable for one decoded image."""
+    import utils
+
+    return {
+        "decode_image": lambda: utils.decode_image(io.BytesIO(data)),
+        "validate_image": lambda: utils.validate_image(image),
+        "validate_image_with_size": lambda: utils.validate_image(image, file_size=file_size),
+        "preprocess_image": lambda: utils.preprocess_image(image),
+        "calculate_image_stats": lambda: utils.calculate_image_stats(image),
+        "enhance_image": lambda: utils.enhance_image(image, brightness=1.1, contrast=1.2, sharpness=1.5),
+        "create_thumbnail": lambda: utils.create_thumbnail(image),
+    }
+
+
+def run_images(selected, sizes, formats, repeat, results):
+    import utils
+
+    for megapixels in sizes:
+        width, height = IMAGE_SIZES[megapixels]
+        source = synthetic_image(width, height)
+        for format in formats:
+            case = f"{megapixels:g}mp-{format}"
+            data = encode(source, format)
+            image = utils.decode_image(io.BytesIO(data))
+            for name, function in image_cases(image, data, len(data)).items():
+                if name not in selected:
+                    continue
+                timing = time_call(function, repeat)
+                timing["mp_per_s"] = round(width * height / 1e6 / (timing["median_ms"] / 1000), 1)
+                timing["bytes"] = len(data)
+                results.setdefault(name, {})[case] = timing
+                print(f"⏱️ {name} {case}: {timing['median_ms']:.1f} ms", file=sys.stderr)
+            del image, data
+        del source
+
+
+def run_predict(repeat, results):
+    import importlib.util
+    import numpy as np
+    import model
+    from fallback.model import get_dummy_model
+
+    batch = np.random.default_rng(SEED).random((1, 224, 224, 3), dtype=np.float32)
+    cases = results.setdefault("predict_severity", {})
+    managers = {"dummy": model.ModelManager(loader=get_dummy_model)}
+    if not model.model_exists():
+        cases["real"] = {"skipped": "models/accident_severity_model.h5 not found"}
+    elif importlib.util.find_spec("tensorflow") is None:
+        cases["real"] = {"skipped": "tensorflow is not installed"}
+    else:
+        managers["real"] = model.ModelManager()
+
+    previous = model.get_model_manager()
+    try:
+        for case, manager in managers.items():
+            model.set_model_manager(manager)
+            manager.model  # load outside the timed calls
+            cases[case] = time_call(lambda: model.predict_severity(batch), repeat)
+            print(f"⏱️ predict_severity {case}: {cases[case]['median_ms']:.2f} ms", file=sys.stderr)
+    finally:
+        model.set_model_manager(previous)
+
+
+def run_statistics(history_sizes, repeat, results):
+    import random
+    from datetime import datetime
+    import model
+
+    session_id = "benchmark-statistics"
+    rng = random.Random(SEED)
+    cases = results.setdefault("get_statistics", {})
+    recorded = len(model.HISTORY.session(session_id))
+    for size in sorted(history_sizes):
+        records = []
+        for _ in range(size - recorded):
+            class_id = rng.randrange(len(model.SEVERITY_CLASSES))
+            records.append({
+                "severity": model.SEVERITY_CLASSES[class_id],
+                "class_id": class_id,
+                "confidence": rng.uniform(60.0, 99.0),
+                "model_version": model.MODEL_VERSION,
+                "timestamp": datetime.now(),
+            })
+        model.HISTORY.record_many(records, session_id)
+        recorded = size
+
+        for scope in ("session", "global"):
+            case = f"{scope}-{size}"
+            cases[case] = time_call(lambda: model.get_statistics(scope, session_id), repeat, number=1000)
+            print(f"⏱️ get_statistics {case}: {cases[case]['median_ms'] * 1000:.1f} µs", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing, inference and statistics hot paths")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per case; the median is reported")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--sizes", type=float, nargs="+", default=sorted(IMAGE_SIZES),
+                        help=f"Image sizes in megapixels (from {', '.join(f'{s:g}' for s in IMAGE_SIZES)})")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Encoded image formats")
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=HISTORY_SIZES,
+                        help="Recorded predictions for get_statistics")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    unknown = [size for size in args.sizes if size not in IMAGE_SIZES]
+    if unknown:
+        parser.error(f"unknown image sizes: {', '.join(f'{s:g}' for s in unknown)}")
+    selected = args.benchmarks or BENCHMARKS
+
+    import numpy
+    import PIL
+
+    results = {}
+    if any(name in IMAGE_BENCHMARKS for name in selected):
+        run_images(selected, args.sizes, args.formats, args.repeat, results)
+    if "predict_severity" in selected:
+        run_predict(args.repeat, results)
+    if "get_statistics" in selected:
+        run_statistics(args.history_sizes, args.repeat, results)
+
+    report = {
+        "benchmark": "hot_paths",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pillow": PIL.__version__,
+        "repeat": args.repeat,
+        "images": {
+            f"{size:g}mp": {"width": IMAGE_SIZES[size][0], "height": IMAGE_SIZES[size][1]}
+            for size in args.sizes
+        },
+        "results": results,
+    }
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
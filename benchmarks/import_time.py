@@ -0,0 +1,168 @@
+"""
+Import-Time Benchmark
+Measures the cold start of every page script with `python -X importtime`
+
+Each page runs in a fresh interpreter (Streamlit bare mode) so the numbers
+match a new worker serving that page first. Reported per page, as the median
+of the runs:
+
+- first_command_ms: Process start to the page's first Streamlit command,
+  i.e. the work done before anything can be drawn
+- wall_ms: Process wall time, start to exit
+- import_ms: Time spent importing modules
+- modules: Number of modules imported
+- heavy: Cumulative import time of each heavy package the page loaded
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--output results.json] [page ...]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages whose import cost is tracked separately
+HEAVY_PACKAGES = ["streamlit", "numpy", "pandas", "pyarrow", "plotly", "PIL", "tensorflow"]
+
+# Runs a page and reports when it issues its first Streamlit command
+RUNNER = """
+import runpy, sys, time
+import streamlit as st
+
+def _first_command(command):
+    def wrapper(*args, **kwargs):
+        if not getattr(st, "_bench_seen", False):
+            st._bench_seen = True
+            sys.stderr.write(f"first_command_at: {time.time()}\\n")
+        return command(*args, **kwargs)
+    return wrapper
+
+st.set_page_config = _first_command(st.set_page_config)
+st.markdown = _first_command(st.markdown)
+runpy.run_path(sys.argv[1], run_name="__main__")
+"""
+
+
+def default_pages():
+    """Entry scripts and multipage pages, relative to the repository root."""
+    pages = ["home.py", "app.py"]
+    pages += sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py")))
+    return pages
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output
+
+    Returns:
+        tuple: (total import microseconds, module count,
+                {package: cumulative microseconds} for HEAVY_PACKAGES)
+    """
+
+    total = 0
+    modules = 0
+    heavy = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        modules += 1
+        if not name.startswith("  "):  # top level: one space of indentation
+            total += int(cumulative_us)
+        package = name.strip()
+        if package in HEAVY_PACKAGES and package not in heavy:
+            heavy[package] = int(cumulative_us)
+    return total, modules, heavy
+
+
+def measure(page, env):
+    """Run one page once in a fresh interpreter."""
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER, page],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.time() - started
+    total, modules, heavy = parse_importtime(result.stderr)
+
+    first_command = wall
+    for line in result.stderr.splitlines():
+        if line.startswith("first_command_at:"):
+            first_command = float(line.split(":", 1)[1]) - started
+            break
+
+    return {
+        "first_command_ms": first_command * 1000,
+        "wall_ms": wall * 1000,
+        "import_ms": total / 1000,
+        "modules": modules,
+        "heavy": {package: us / 1000 for package, us in heavy.items()},
+        "returncode": result.returncode,
+    }
+
+
+def run(pages, repeat):
+    # Keep the benchmark away from the real history database and shared counters
+    env = dict(os.environ, ACCIDENT_HISTORY_DB="", ACCIDENT_SHARED_STATS="", PYTHONDONTWRITEBYTECODE="1")
+
+    results = {}
+    for page in pages:
+        runs = [measure(page, env) for _ in range(repeat)]
+        packages = sorted({package for r in runs for package in r["heavy"]}, key=HEAVY_PACKAGES.index)
+        results[page] = {
+            "first_command_ms": round(statistics.median(r["first_command_ms"] for r in runs), 1),
+            "wall_ms": round(statistics.median(r["wall_ms"] for r in runs), 1),
+            "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+            "modules": int(statistics.median(r["modules"] for r in runs)),
+            "heavy": {
+                package: round(statistics.median(r["heavy"].get(package, 0.0) for r in runs), 1)
+                for package in packages
+            },
+            "failed_runs": sum(r["returncode"] != 0 for r in runs),
+        }
+        print(f"⏱️ {page}: {results[page]['first_command_ms']:.0f} ms to first command, "
+              f"{results[page]['wall_ms']:.0f} ms wall, "
+              f"{results[page]['import_ms']:.0f} ms imports ({', '.join(packages)})", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure page cold-start import time")
+    parser.add_argument("pages", nargs="*", help="Page scripts (default: every page)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page; the median is reported")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        import streamlit
+        streamlit_version = streamlit.__version__
+    except ImportError:
+        streamlit_version = None
+
+    report = {
+        "benchmark": "import_time",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "streamlit": streamlit_version,
+        "repeat": args.repeat,
+        "pages": run(args.pages or default_pages(), args.repeat),
+    }
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Streamlit Caching Layer
+Resource cache for the model manager and versioned data caches for pages
+
+Lookups of the data caches are counted in `metrics` (misses inside the
+cached bodies, which only run on a miss).
+"""
+
+from datetime import date, datetime, timedelta
+
+import streamlit as st
+
+import metrics
+import model
+from history import current_session_id
+
+
+@st.cache_resource(show_spinner="📦 Loading model...")
+def cached_model_manager():
+    """Process-wide model manager, loaded once and shared by all sessions."""
+    manager = model.ModelManager()
+    if model.get_model_client() is None:
+        manager.model  # load eagerly so the spinner covers it
+    # With a model server the local copy is only loaded if the server is unreachable
+    return manager
+
+
+@st.cache_resource(show_spinner=False)
+def metrics_server():
+    """Metrics endpoint of this Streamlit process (None unless ACCIDENT_METRICS_PORT is set)."""
+    return metrics.start_http_server()
+
+
+@st.cache_resource(show_spinner=False)
+def history_compaction():
+    """Background compaction of the history database for this Streamlit process."""
+    return model.start_history_compaction()
+
+
+def use_cached_model():
+    """Route model.py predictions through the Streamlit-cached model manager."""
+    model.set_model_manager(cached_model_manager())
+    metrics_server()
+    history_compaction()
+
+
+def history_version(scope="session", session_id=None):
+    """
+    Return the history version counter used as the cache key
+
+    Args:
+        scope (str): "session" or "global"
+        session_id (str): Session id (defaults to the current session)
+    """
+
+    return model.get_history_version(scope, session_id)
+
+
+@st.cache_data(show_spinner=False)
+def cached_model_info():
+    """Static model metadata."""
+    return model.model_info()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _statistics(scope, session_id, version):
+    metrics.cache_miss("statistics")
+    return model.get_statistics(scope=scope, session_id=session_id)
+
+
+def cached_statistics(scope, session_id, version):
+    """
+    Statistics for a scope, recomputed only when `version` changes
+
+    `version` is not used in the body; it is the explicit invalidation key
+    (see `history_version`).
+    """
+
+    metrics.cache_lookup("statistics", True)
+    return _statistics(scope, session_id, version)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _history_frame(session_id, version, limit):
+    metrics.cache_miss("history_frame")
+    return model.get_history_frame(limit=limit, session_id=session_id)
+
+
+def cached_history_frame(session_id, version, limit=100):
+    """A session's most recent records as a DataFrame, rebuilt only when `version` changes."""
+    metrics.cache_lookup("history_frame", True)
+    return _history_frame(session_id, version, limit)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_prediction_count(since, version):
+    """Predictions across all sessions since the start of day `since`, per global `version`."""
+    return model.count_predictions(datetime.combine(since, datetime.min.time()))
+
+
+def measured_kpis():
+    """
+    Measured values for the KPI cards
+
+    Returns:
+        dict: total_predictions and week_predictions (all sessions; the week
+              count is None without the history database), plus latency (the
+              `metrics.latency_summary` of uploads analysed by this process)
+              and per_minute
+    """
+
+    version = history_version("global")
+    return {
+        "total_predictions": cached_statistics("global", None, version)["total_predictions"],
+        "week_predictions": cached_prediction_count(date.today() - timedelta(days=6), version),
+        "latency": metrics.latency_summary("end_to_end"),
+        "per_minute": metrics.throughput(),
+    }
+
+
+def format_seconds(seconds):
+    """Latency for a KPI card: "1.8s", "240ms" or "—" before the first measurement."""
+    if seconds is None:
+        return "—"
+    return f"{seconds:.1f}s" if seconds >= 1 else f"{seconds * 1000:.0f}ms"
+
+
+def session_key():
+    """
+    Return (session id, session history version) for the current session
+
+    Page-level `st.cache_data` functions take both so entries are never
+    shared between sessions and are rebuilt after a new prediction.
+    """
+
+    session_id = current_session_id()
+    return session_id, history_version("session", session_id)
@@ -0,0 +1,78 @@
+"""
+Time-Series Downsampling
+Largest-Triangle-Three-Buckets (LTTB) reduction for chart payloads
+"""
+
+import numpy as np
+
+# Points sent to the browser for a trend chart, whatever the history size
+DEFAULT_CHART_POINTS = 1000
+
+
+def lttb_indices(y, n_out=DEFAULT_CHART_POINTS, x=None):
+    """
+    Select the indices of the points that best preserve a series' shape
+
+    The first and last points are always kept. The points in between are
+    split into `n_out - 2` equal buckets and, walking left to right, each
+    bucket keeps the point forming the largest triangle with the point kept
+    in the previous bucket and the mean of the next bucket, so peaks and
+    dips survive the reduction.
+
+    Args:
+        y (array-like): Series values
+        n_out (int): Number of points to keep
+        x (array-like): Series positions (defaults to 0..len(y)-1)
+
+    Returns:
+        numpy.ndarray: Sorted indices into `y`, at most `n_out` of them
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Bucket i covers points [edges[i], edges[i + 1]); the last edge is n - 1
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+
+    # Mean of every bucket in one pass, then the "next bucket" mean for each
+    # bucket (the final bucket looks ahead to the last point)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / sizes
+    next_x = np.append(mean_x[1:], x[n - 1])
+    next_y = np.append(mean_y[1:], y[n - 1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        # Twice the triangle area; the constant factor does not change argmax
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample(x, y, n_out=DEFAULT_CHART_POINTS):
+    """
+    Reduce a series to at most `n_out` points with LTTB
+
+    Args:
+        x (array-like): Series positions (numeric)
+        y (array-like): Series values
+        n_out (int): Number of points to keep
+
+    Returns:
+        tuple: (x, y) NumPy arrays of the kept points
+    """
+
+    x, y = np.asarray(x), np.asarray(y)
+    keep = lttb_indices(y, n_out, x)
+    return x[keep], y[keep]
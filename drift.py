@@ -0,0 +1,278 @@
+"""
+Prediction Drift Monitor
+Rolling-window class and confidence histograms compared to a reference
+
+The reference is read from models/reference_distribution.json when it
+exists. Without it, the first `window` predictions a process makes become
+its baseline, and later windows are compared with that. Write a reference
+file from the recorded history with:
+
+    python drift.py [--output models/reference_distribution.json] [--limit 10000]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("accident.drift")
+
+# Confidence histogram: equal-width bins over 0-100%
+CONFIDENCE_BINS = 10
+
+# Reference distribution file (see `write_reference`)
+REFERENCE_PATH = os.path.join("models", "reference_distribution.json")
+
+# Small probability mass substituted for empty bins so PSI/KL stay finite
+EPSILON = 1e-4
+
+
+def load_reference(path=REFERENCE_PATH):
+    """
+    Load the reference distribution
+
+    Args:
+        path (str): JSON file with "class_mix" and "confidence_histogram" lists
+
+    Returns:
+        dict: Reference distribution, or None when the file is missing or invalid
+    """
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        return {
+            "class_mix": list(reference["class_mix"]),
+            "confidence_histogram": list(reference["confidence_histogram"]),
+        }
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        print(f"⚠️ Invalid reference distribution ({e}). Using a live baseline.")
+        return None
+
+
+def reference_from_counts(class_counts, confidence_counts):
+    """Reference distribution from class and confidence-bin counts."""
+    total = sum(class_counts)
+    return {
+        "class_mix": [c / total for c in class_counts],
+        "confidence_histogram": [c / total for c in confidence_counts],
+    }
+
+
+def reference_from_records(records, num_classes=3):
+    """
+    Reference distribution of prediction records
+
+    Args:
+        records (iterable): Records with class_id and confidence
+        num_classes (int): Number of model classes
+
+    Returns:
+        dict: Reference distribution, or None without records
+    """
+
+    class_counts = [0] * num_classes
+    confidence_counts = [0] * CONFIDENCE_BINS
+    for record in records:
+        class_counts[record["class_id"]] += 1
+        confidence_counts[confidence_bin(record["confidence"])] += 1
+    if not sum(class_counts):
+        return None
+    return reference_from_counts(class_counts, confidence_counts)
+
+
+def _normalize(counts):
+    total = sum(counts)
+    return [max(c / total if total else 0.0, EPSILON) for c in counts]
+
+
+def population_stability_index(actual, expected):
+    """PSI between two probability vectors."""
+    actual, expected = _normalize(actual), _normalize(expected)
+    return sum((a - e) * math.log(a / e) for a, e in zip(actual, expected))
+
+
+def kl_divergence(actual, expected):
+    """KL(actual || expected) between two probability vectors."""
+    actual, expected = _normalize(actual), _normalize(expected)
+    return sum(a * math.log(a / e) for a, e in zip(actual, expected))
+
+
+def confidence_bin(confidence):
+    """Histogram bin for a confidence percentage."""
+    return min(max(int(confidence / (100 / CONFIDENCE_BINS)), 0), CONFIDENCE_BINS - 1)
+
+
+class DriftMonitor:
+    """
+    Incremental drift detector fed one prediction at a time
+
+    Keeps class and confidence histograms over the last `window`
+    predictions, updated in O(1) per observation, and compares them with
+    the reference using PSI and KL divergence. Crossing `psi_threshold`
+    writes a structured alert to the "accident.drift" logger.
+
+    Without a reference, the first `window` observations are counted into
+    a baseline instead of the window; once it is full it becomes the
+    reference (reference_source "baseline").
+
+    Args:
+        reference (dict): Reference distribution (defaults to `load_reference()`)
+        window (int): Number of recent predictions compared
+        min_samples (int): Observations needed before drift is evaluated
+        psi_threshold (float): PSI above which drift is reported
+        alert_cooldown (float): Minimum seconds between repeated alerts
+        num_classes (int): Number of model classes
+    """
+
+    def __init__(self, reference=None, window=500, min_samples=100,
+                 psi_threshold=0.2, alert_cooldown=300, num_classes=3):
+        self.reference = reference if reference is not None else load_reference()
+        self.reference_source = "file" if self.reference is not None else None
+        self.window = window
+        self.min_samples = min_samples
+        self.psi_threshold = psi_threshold
+        self.alert_cooldown = alert_cooldown
+
+        self._lock = threading.Lock()
+        self._samples = deque()
+        self._class_counts = [0] * num_classes
+        self._confidence_counts = [0] * CONFIDENCE_BINS
+        self._baseline_class_counts = [0] * num_classes
+        self._baseline_confidence_counts = [0] * CONFIDENCE_BINS
+        self._last_alert = 0.0
+        self.observed = 0
+
+    def observe(self, record):
+        """Add one prediction record to the rolling window (or the baseline while it fills)."""
+        sample = (record["class_id"], confidence_bin(record["confidence"]))
+        with self._lock:
+            self.observed += 1
+            if self.reference is None:
+                self._baseline_class_counts[sample[0]] += 1
+                self._baseline_confidence_counts[sample[1]] += 1
+                if sum(self._baseline_class_counts) >= self.window:
+                    self.reference = reference_from_counts(
+                        self._baseline_class_counts, self._baseline_confidence_counts)
+                    self.reference_source = "baseline"
+                return
+            self._samples.append(sample)
+            self._class_counts[sample[0]] += 1
+            self._confidence_counts[sample[1]] += 1
+            if len(self._samples) > self.window:
+                old_class, old_bin = self._samples.popleft()
+                self._class_counts[old_class] -= 1
+                self._confidence_counts[old_bin] -= 1
+            report = self._report()
+
+        if report["drifting"] and time.time() - self._last_alert >= self.alert_cooldown:
+            self._last_alert = time.time()
+            logger.warning(json.dumps({
+                "event": "prediction_drift",
+                "window": report["samples"],
+                "class_psi": round(report["class_psi"], 4),
+                "class_kl": round(report["class_kl"], 4),
+                "confidence_psi": round(report["confidence_psi"], 4),
+                "confidence_kl": round(report["confidence_kl"], 4),
+                "threshold": self.psi_threshold,
+                "class_mix": [round(p, 4) for p in report["class_mix"]],
+            }))
+
+    def report(self):
+        """
+        Return the current drift metrics
+
+        Returns:
+            dict: observed, samples, baseline_samples (observations counted
+                  into the baseline), class_mix, confidence_histogram,
+                  class_psi, class_kl, confidence_psi, confidence_kl,
+                  ready, drifting
+        """
+
+        with self._lock:
+            return self._report()
+
+    def _report(self):
+        samples = len(self._samples)
+        class_mix = [c / samples if samples else 0.0 for c in self._class_counts]
+        confidence_histogram = [c / samples if samples else 0.0 for c in self._confidence_counts]
+        ready = self.reference is not None and samples >= self.min_samples
+
+        if ready:
+            class_psi = population_stability_index(self._class_counts, self.reference["class_mix"])
+            class_kl = kl_divergence(self._class_counts, self.reference["class_mix"])
+            confidence_psi = population_stability_index(
+                self._confidence_counts, self.reference["confidence_histogram"])
+            confidence_kl = kl_divergence(self._confidence_counts, self.reference["confidence_histogram"])
+        else:
+            class_psi = class_kl = confidence_psi = confidence_kl = 0.0
+
+        return {
+            "observed": self.observed,
+            "samples": samples,
+            "baseline_samples": sum(self._baseline_class_counts),
+            "class_mix": class_mix,
+            "confidence_histogram": confidence_histogram,
+            "class_psi": class_psi,
+            "class_kl": class_kl,
+            "confidence_psi": confidence_psi,
+            "confidence_kl": confidence_kl,
+            "ready": ready,
+            "drifting": ready and max(class_psi, confidence_psi) > self.psi_threshold,
+        }
+
+
+def write_reference(path=REFERENCE_PATH, limit=10000):
+    """
+    Write the distribution of the newest `limit` recorded predictions as the reference file
+
+    Needs the history database (every session is included). Only predictions
+    of the current model version count: dummy fallback predictions (model
+    version "fallback") are not observed by the live monitor either.
+
+    Returns:
+        dict: The written reference
+    """
+
+    from itertools import islice
+    import model
+
+    if not model.history_persisted():
+        raise ValueError("Building a reference needs the history database (ACCIDENT_HISTORY_DB)")
+    records = islice(model.iter_history(scope="global", model_version=model.MODEL_VERSION), limit)
+    reference = reference_from_records(records, len(model.SEVERITY_CLASSES))
+    if reference is None:
+        raise ValueError(f"No recorded predictions of model {model.MODEL_VERSION} to build a reference from")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(reference, f, indent=2)
+    return reference
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the drift reference from the recorded predictions")
+    parser.add_argument("--output", default=REFERENCE_PATH, help="Reference file to write")
+    parser.add_argument("--limit", type=int, default=10000, help="Newest predictions included")
+    args = parser.parse_args(argv)
+
+    try:
+        reference = write_reference(args.output, args.limit)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Reference written to {args.output}: class mix "
+          f"{', '.join(f'{p:.1%}' for p in reference['class_mix'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Streaming History Export
+Writes prediction records to CSV, NDJSON, JSON or Parquet in fixed-size chunks
+"""
+
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import tempfile
+from itertools import islice
+
+# Columns written for every prediction record, in order
+EXPORT_FIELDS = ["timestamp", "session_id", "severity", "class_id", "confidence", "model_version"]
+
+# Records converted and written per chunk
+CHUNK_SIZE = 5000
+
+# Format name -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "ndjson": ("ndjson", "application/x-ndjson"),
+    "json": ("json", "application/json"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def parquet_available():
+    """Return True when pyarrow is installed, so Parquet export can be offered (without importing it)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _row(record):
+    return [
+        record["timestamp"].isoformat(timespec="seconds"),
+        record.get("session_id", ""),
+        record["severity"],
+        record["class_id"],
+        round(record["confidence"], 2),
+        record.get("model_version", ""),
+    ]
+
+
+def iter_csv(records, chunk_size=CHUNK_SIZE):
+    """Yield a CSV document (header first) as text chunks of `chunk_size` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in _chunks(records, chunk_size):
+        writer.writerows(_row(record) for record in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(records, chunk_size=CHUNK_SIZE):
+    """Yield newline-delimited JSON, one record per line, as text chunks."""
+    for chunk in _chunks(records, chunk_size):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, _row(record))), ensure_ascii=False) + "\n"
+            for record in chunk
+        )
+
+
+def iter_json(records, metadata=None, key="prediction_history", chunk_size=CHUNK_SIZE):
+    """
+    Yield a single JSON object whose `key` array holds the records
+
+    Args:
+        records (iterable): Prediction records
+        metadata (dict): Extra top-level fields written before the records
+        key (str): Name of the records array
+        chunk_size (int): Records per yielded chunk
+    """
+
+    head = json.dumps(metadata or {}, indent=2, default=str, ensure_ascii=False)
+    head = head[:-1].rstrip() + ("," if metadata else "") + f'\n  "{key}": ['
+    yield head
+
+    separator = "\n    "
+    for chunk in _chunks(records, chunk_size):
+        yield separator + ",\n    ".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, _row(record))), ensure_ascii=False)
+            for record in chunk
+        )
+        separator = ",\n    "
+    yield "\n  ]\n}\n"
+
+
+def _write_parquet(records, output, chunk_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("session_id", pa.string()),
+        ("severity", pa.string()),
+        ("class_id", pa.int8()),
+        ("confidence", pa.float64()),
+        ("model_version", pa.string()),
+    ])
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for chunk in _chunks(records, chunk_size):
+            writer.write_table(pa.table({
+                "timestamp": [record["timestamp"] for record in chunk],
+                "session_id": [record.get("session_id", "") for record in chunk],
+                "severity": [record["severity"] for record in chunk],
+                "class_id": [record["class_id"] for record in chunk],
+                "confidence": [record["confidence"] for record in chunk],
+                "model_version": [record.get("model_version", "") for record in chunk],
+            }, schema=schema))
+
+
+def write_export(records, format="csv", compress=False, metadata=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream records into a temporary file and return it ready for reading
+
+    Records are pulled from the iterable one chunk at a time, so memory use
+    does not depend on the number of records exported. The file is deleted
+    when closed.
+
+    Args:
+        records (iterable): Prediction records, e.g. `model.iter_history(...)`
+        format (str): "csv", "ndjson", "json" or "parquet"
+        compress (bool): Gzip the text formats (Parquet is compressed internally)
+        metadata (dict): Top-level fields for the "json" format
+        chunk_size (int): Records per chunk
+
+    Returns:
+        io.FileIO: Unbuffered binary temporary file positioned at the start
+    """
+
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
+
+    # Unbuffered handle so Streamlit's download_button accepts it; writes go
+    # through a buffered writer that is detached once the export is complete
+    output = tempfile.TemporaryFile(mode="w+b", buffering=0)
+    buffered = io.BufferedWriter(output, buffer_size=1 << 20)
+    try:
+        if format == "parquet":
+            _write_parquet(records, buffered, chunk_size)
+        else:
+            if format == "csv":
+                chunks = iter_csv(records, chunk_size)
+            elif format == "ndjson":
+                chunks = iter_ndjson(records, chunk_size)
+            else:
+                chunks = iter_json(records, metadata, chunk_size=chunk_size)
+
+            sink = gzip.GzipFile(fileobj=buffered, mode="wb") if compress else buffered
+            for chunk in chunks:
+                sink.write(chunk.encode("utf-8"))
+            if compress:
+                sink.close()  # writes the gzip trailer; `buffered` stays open
+        buffered.flush()
+        buffered.detach()
+    except BaseException:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output
+
+
+def export_filename(stem, format="csv", compress=False):
+    """File name for an export, e.g. "predictions.csv.gz"."""
+    extension = EXPORT_FORMATS[format][0]
+    return f"{stem}.{extension}.gz" if compress and format != "parquet" else f"{stem}.{extension}"
+
+
+def export_mime(format="csv", compress=False):
+    """MIME type for an export."""
+    return "application/gzip" if compress and format != "parquet" else EXPORT_FORMATS[format][1]
@@ -3,6 +3,8 @@ Fallback Export Module
 Provides dummy export functionality when using the fallback model
 """
 
+import csv
+import io
 import json
 from datetime import datetime
 
@@ -19,10 +21,11 @@ def export_fallback_data(format="json"):
     if format.lower() == "json":
         return json.dumps(data, indent=2)
     elif format.lower() == "csv":
-        csv_lines = ["key,value"]
-        for key, value in data.items():
-            csv_lines.append(f'"{key}","{value}"')
-        return "\n".join(csv_lines)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+        writer.writerow(["key", "value"])
+        writer.writerows(data.items())
+        return buffer.getvalue()
     else:
         return str(data)
 
@@ -9,16 +9,19 @@ from datetime import datetime
 SEVERITY_CLASSES = ["🟢 Minor Damage", "🟡 Moderate Damage", "🔴 Severe Crash"]
 
 class DummyModel:
+    # Marks predictions from this model as fallback results (see model.ModelManager)
+    is_fallback = True
+
     def __init__(self):
         # Any initialization logic can go here
         self.loaded_at = datetime.now()
 
     def predict(self, image_array):
         """Return dummy probability distribution for three classes.
-        The output mimics TensorFlow's `model.predict` shape: (1, 3).
+        The output mimics TensorFlow's `model.predict` shape: (N, 3).
         """
         # Generate a random Dirichlet distribution to simulate probabilities
-        probs = np.random.dirichlet(np.ones(3), size=1)
+        probs = np.random.dirichlet(np.ones(3), size=len(image_array))
         return probs
 
 def get_dummy_model():
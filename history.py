@@ -0,0 +1,454 @@
+"""
+Prediction History Store
+Per-session prediction history with a process-wide aggregate view
+"""
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+# Fallback key used outside a Streamlit script run (CLI, tests, API)
+DEFAULT_SESSION = "default"
+
+# Distribution buckets, indexed by model class id
+SEVERITY_BUCKETS = ("Minor", "Moderate", "Severe")
+
+# Timezone used to display stored epoch timestamps
+LOCAL_TIMEZONE = datetime.now().astimezone().tzinfo
+
+# In-memory session histories unused for this long are dropped once their
+# Streamlit session has ended (records stay in the history database)
+SESSION_IDLE_SECONDS = float(os.environ.get("ACCIDENT_SESSION_IDLE_MINUTES", "30")) * 60
+
+# Newest records kept in memory per session; older ones are dropped from the
+# session log (totals, and the history database, keep them). 0 keeps all.
+SESSION_MAX_RECORDS = int(os.environ.get("ACCIDENT_SESSION_MAX_RECORDS", "10000"))
+
+
+def current_session_id():
+    """
+    Return the id of the Streamlit session running the current script
+
+    Returns:
+        str: Streamlit session id, or DEFAULT_SESSION when called outside
+             a Streamlit script run
+    """
+
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return DEFAULT_SESSION
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else DEFAULT_SESSION
+
+
+def session_active(session_id):
+    """
+    Return True while a Streamlit session with this id is connected
+
+    Returns:
+        bool: False when no Streamlit runtime runs in this process (CLI,
+              API), so only idleness decides there
+    """
+
+    try:
+        from streamlit.runtime import Runtime
+    except ImportError:
+        return False
+
+    if not Runtime.exists():
+        return False
+    try:
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return False
+
+
+def record_matches(record, class_ids=None, min_confidence=None,
+                   max_confidence=None, model_version=None):
+    """Return True if a record passes the non-time query filters."""
+    if class_ids is not None and record["class_id"] not in class_ids:
+        return False
+    if min_confidence is not None and record["confidence"] < min_confidence:
+        return False
+    if max_confidence is not None and record["confidence"] > max_confidence:
+        return False
+    if model_version is not None and record.get("model_version") != model_version:
+        return False
+    return True
+
+
+def records_to_columns(records):
+    """
+    Convert prediction records to NumPy columns
+
+    Returns:
+        dict: timestamp (float64 epoch seconds), class_id (int8),
+              confidence (float64), model_version (object)
+    """
+
+    import numpy as np
+
+    return {
+        "timestamp": np.fromiter((r["timestamp"].timestamp() for r in records), dtype=np.float64, count=len(records)),
+        "class_id": np.fromiter((r["class_id"] for r in records), dtype=np.int8, count=len(records)),
+        "confidence": np.fromiter((r["confidence"] for r in records), dtype=np.float64, count=len(records)),
+        "model_version": np.array([r.get("model_version", "") for r in records], dtype=object),
+    }
+
+
+def history_frame(columns, class_labels):
+    """
+    Build a DataFrame from history columns
+
+    Args:
+        columns (dict): Columns from `records_to_columns` or `SessionHistory.columns`
+        class_labels (list): Severity label for each class id
+
+    Returns:
+        pd.DataFrame: timestamp (local datetime64), severity (categorical),
+                      class_id, confidence, model_version
+    """
+
+    import pandas as pd
+
+    timestamps = (
+        pd.to_datetime(columns["timestamp"], unit="s", utc=True)
+        .tz_convert(LOCAL_TIMEZONE)
+        .tz_localize(None)
+    )
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "severity": pd.Categorical.from_codes(columns["class_id"], categories=list(class_labels)),
+        "class_id": columns["class_id"],
+        "confidence": columns["confidence"],
+        "model_version": columns["model_version"],
+    })
+
+
+class HistoryAggregate:
+    """Running totals so statistics never iterate over the history."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.confidence_sum = 0.0
+        self.class_counts = [0] * len(SEVERITY_BUCKETS)
+        self.revision = 0
+
+    def add(self, record):
+        """Fold one prediction record into the totals."""
+        with self._lock:
+            self.total += 1
+            self.confidence_sum += record["confidence"]
+            self.class_counts[record["class_id"]] += 1
+
+    def bump(self):
+        """Change the version without adding a record (e.g. after compaction)."""
+        with self._lock:
+            self.revision += 1
+
+    @property
+    def version(self):
+        """Records folded in plus bumps; changes on every append."""
+        return self.total + self.revision
+
+    def summary(self):
+        """Return the totals in the shape of `model.get_statistics()`."""
+        with self._lock:
+            total = self.total
+            confidence_sum = self.confidence_sum
+            counts = list(self.class_counts)
+
+        return {
+            "total_predictions": total,
+            "average_confidence": confidence_sum / total if total else 0,
+            "severity_distribution": dict(zip(SEVERITY_BUCKETS, counts)),
+        }
+
+
+class SessionHistory:
+    """
+    Append-only prediction log owned by a single session
+
+    At most `max_records` of the newest records are kept: once the log is an
+    eighth over the limit, the oldest are dropped in one step. Positions
+    (cursors, `since`) count every record ever appended, so they stay valid
+    after a trim.
+    """
+
+    def __init__(self, session_id, max_records=SESSION_MAX_RECORDS):
+        self.session_id = session_id
+        self.max_records = max_records
+        self._dropped = 0
+        self.aggregate = HistoryAggregate()
+        self._lock = threading.Lock()
+        self._records = []
+        # Columns parallel to _records; _timestamps doubles as the sorted time index
+        self._timestamps = array("d")
+        self._class_ids = array("b")
+        self._confidences = array("d")
+        self._model_versions = []
+        self.last_used = time.monotonic()
+
+    def append(self, record):
+        """Append a record and update the session totals."""
+        self.last_used = time.monotonic()
+        with self._lock:
+            self._records.append(record)
+            self._timestamps.append(record["timestamp"].timestamp())
+            self._class_ids.append(record["class_id"])
+            self._confidences.append(record["confidence"])
+            self._model_versions.append(record.get("model_version", ""))
+            if self.max_records and len(self._records) > self.max_records + max(self.max_records // 8, 1):
+                self._trim(len(self._records) - self.max_records)
+        self.aggregate.add(record)
+
+    def _trim(self, count):
+        """Drop the oldest `count` records (caller holds the lock)."""
+        del self._records[:count]
+        del self._timestamps[:count]
+        del self._class_ids[:count]
+        del self._confidences[:count]
+        del self._model_versions[:count]
+        self._dropped += count
+
+    def columns(self, limit=None, since=None):
+        """
+        Return the newest `limit` records (all when None) as NumPy columns
+
+        Args:
+            limit (int): Maximum number of newest records
+            since (int): Only records appended after this many records,
+                         i.e. after the session's history version `since`
+
+        Returns:
+            dict: Same layout as `records_to_columns`, oldest first
+        """
+
+        import numpy as np
+
+        with self._lock:
+            start = 0 if limit is None else max(len(self._records) - limit, 0)
+            if since is not None:
+                start = max(start, since - self._dropped)
+            timestamps = self._timestamps[start:]
+            class_ids = self._class_ids[start:]
+            confidences = self._confidences[start:]
+            model_versions = self._model_versions[start:]
+
+        return {
+            "timestamp": np.frombuffer(timestamps, dtype=np.float64),
+            "class_id": np.frombuffer(class_ids, dtype=np.int8),
+            "confidence": np.frombuffer(confidences, dtype=np.float64),
+            "model_version": np.array(model_versions, dtype=object),
+        }
+
+    def query(self, cursor=None, limit=50, newest_first=True, start=None, end=None,
+              session_id=None, **filters):
+        """
+        Return one page of records matching the filters
+
+        The time range is resolved by binary search over the timestamp
+        index; remaining filters are applied while scanning that range.
+        Cursors are record positions within this session's log (counting
+        records already trimmed).
+
+        Returns:
+            dict: {"records": [...], "next_cursor": str or None}
+        """
+
+        with self._lock:
+            lo, hi = self._bounds(cursor, newest_first, start, end)
+            positions = range(hi - 1, lo - 1, -1) if newest_first else range(lo, hi)
+            records, next_cursor = [], None
+            previous = hi if newest_first else lo - 1
+            for i in positions:
+                record = self._records[i]
+                if not record_matches(record, **filters):
+                    continue
+                if len(records) == limit:
+                    next_cursor = str(previous + self._dropped)
+                    break
+                records.append(record)
+                previous = i
+
+        return {"records": records, "next_cursor": next_cursor}
+
+    def query_columns(self, cursor=None, limit=50, newest_first=True, start=None, end=None,
+                      session_id=None, class_ids=None, min_confidence=None,
+                      max_confidence=None, model_version=None):
+        """
+        Vectorized `query` returning NumPy columns instead of records
+
+        Returns:
+            dict: {"columns": {...}, "next_cursor": str or None}
+        """
+
+        import numpy as np
+
+        with self._lock:
+            lo, hi = self._bounds(cursor, newest_first, start, end)
+            class_column = np.frombuffer(self._class_ids[lo:hi], dtype=np.int8)
+            confidence_column = np.frombuffer(self._confidences[lo:hi], dtype=np.float64)
+            version_column = np.array(self._model_versions[lo:hi], dtype=object)
+            timestamp_column = np.frombuffer(self._timestamps[lo:hi], dtype=np.float64)
+
+        mask = np.ones(hi - lo, dtype=bool)
+        if class_ids is not None:
+            mask &= np.isin(class_column, list(class_ids))
+        if min_confidence is not None:
+            mask &= confidence_column >= min_confidence
+        if max_confidence is not None:
+            mask &= confidence_column <= max_confidence
+        if model_version is not None:
+            mask &= version_column == model_version
+
+        positions = np.flatnonzero(mask)
+        if newest_first:
+            positions = positions[::-1]
+        next_cursor = str(int(positions[limit - 1]) + lo + self._dropped) if len(positions) > limit else None
+        positions = positions[:limit]
+
+        return {
+            "columns": {
+                "timestamp": timestamp_column[positions],
+                "class_id": class_column[positions],
+                "confidence": confidence_column[positions],
+                "model_version": version_column[positions],
+            },
+            "next_cursor": next_cursor,
+        }
+
+    def _bounds(self, cursor, newest_first, start, end):
+        """Index range [lo, hi) selected by the time filters and cursor."""
+        lo = bisect_left(self._timestamps, start.timestamp()) if start is not None else 0
+        hi = bisect_left(self._timestamps, end.timestamp()) if end is not None else len(self._timestamps)
+        if cursor is not None:
+            position = int(cursor) - self._dropped
+            if newest_first:
+                hi = min(hi, position)
+            else:
+                lo = max(lo, position + 1)
+        return lo, max(hi, lo)
+
+    def recent(self, limit=None):
+        """Return a copy of the newest `limit` records (all when None)."""
+        with self._lock:
+            if limit is None:
+                return list(self._records)
+            return self._records[-limit:] if limit > 0 else []
+
+    def __len__(self):
+        return len(self._records)
+
+
+class HistoryStore:
+    """
+    Registry of per-session histories plus a global aggregate
+
+    Each session appends under its own lock, so concurrent reruns in
+    different sessions never contend. The global aggregate is maintained
+    alongside and only ever holds totals, not records; pass a
+    `shared_stats.SharedStatistics` to share it between worker processes.
+    When a database is attached, every record is also persisted for
+    querying across sessions.
+
+    Streamlit does not report when a session ends, so a session history
+    left unused for `idle_seconds` is dropped (see `expire_idle_sessions`)
+    unless its browser session is still connected.
+    """
+
+    def __init__(self, database=None, aggregate=None, idle_seconds=SESSION_IDLE_SECONDS):
+        self._registry_lock = threading.Lock()
+        self._sessions = {}
+        self.aggregate = aggregate if aggregate is not None else HistoryAggregate()
+        self.database = database
+        self.idle_seconds = idle_seconds
+
+    def after_fork(self):
+        """Reset connections and locks inherited by a forked child process."""
+        self._registry_lock = threading.Lock()
+        if self.database is not None:
+            self.database.after_fork()
+        if hasattr(self.aggregate, "after_fork"):
+            self.aggregate.after_fork()
+
+    def session(self, session_id=None):
+        """Return (creating on first use) the history for a session."""
+        if session_id is None:
+            session_id = current_session_id()
+
+        history = self._sessions.get(session_id)
+        if history is None:
+            self.expire_idle_sessions()  # sessions come and go together, so sweep as new ones arrive
+            with self._registry_lock:
+                history = self._sessions.setdefault(session_id, SessionHistory(session_id))
+        history.last_used = time.monotonic()
+        return history
+
+    def record(self, record, session_id=None):
+        """Record a prediction for a session, the global aggregate and the database."""
+        history = self.session(session_id)
+        history.append(record)
+        self.aggregate.add(record)
+        if self.database is not None:
+            try:
+                self.database.insert(record, history.session_id)
+            except Exception as e:
+                print(f"❌ Failed to persist prediction: {e}")
+
+    def record_many(self, records, session_id=None, session_log=True):
+        """
+        Record several predictions for a session, persisted in one transaction
+
+        Pass session_log=False for service callers (API, batch scorer) whose
+        session log nobody reads: the records then only reach the global
+        aggregate and the database.
+        """
+        if session_log:
+            history = self.session(session_id)
+            session_id = history.session_id
+            for record in records:
+                history.append(record)
+        elif session_id is None:
+            session_id = current_session_id()
+        for record in records:
+            self.aggregate.add(record)
+        if self.database is not None and records:
+            try:
+                self.database.insert_many(records, session_id)
+            except Exception as e:
+                print(f"❌ Failed to persist predictions: {e}")
+
+    def drop_session(self, session_id):
+        """Forget a session's records; global totals are kept."""
+        with self._registry_lock:
+            self._sessions.pop(session_id, None)
+
+    def expire_idle_sessions(self):
+        """
+        Drop the histories of sessions idle for `idle_seconds` that are no longer connected
+
+        Returns:
+            list: Ids of the dropped sessions
+        """
+
+        if not self.idle_seconds:
+            return []
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._registry_lock:
+            idle = [sid for sid, history in self._sessions.items() if history.last_used < cutoff]
+        expired = [sid for sid in idle if not session_active(sid)]
+        for session_id in expired:
+            self.drop_session(session_id)
+        return expired
+
+    def session_ids(self):
+        """Return the ids of all sessions with a history."""
+        with self._registry_lock:
+            return list(self._sessions)
@@ -0,0 +1,195 @@
+"""
+History Compaction
+Retention policy that folds old raw predictions into hourly rollups
+"""
+
+import os
+import threading
+import time
+
+# Length of one rollup bucket in seconds
+ROLLUP_SECONDS = 3600
+
+
+class RetentionPolicy:
+    """
+    How long raw predictions are kept and how compaction paces itself
+
+    Args:
+        raw_days (float): Raw records older than this are rolled up and deleted
+        batch_size (int): Raw records compacted per transaction
+        interval_seconds (float): Pause between background compaction runs
+        batch_pause (float): Pause between batches so writers can get in
+    """
+
+    def __init__(self, raw_days=30, batch_size=500, interval_seconds=3600, batch_pause=0.05):
+        self.raw_days = raw_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.batch_pause = batch_pause
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a policy from environment variables
+
+        ACCIDENT_HISTORY_RETENTION_DAYS (default 30, 0 disables compaction),
+        ACCIDENT_HISTORY_COMPACTION_BATCH (default 500) and
+        ACCIDENT_HISTORY_COMPACTION_INTERVAL in seconds (default 3600).
+        """
+
+        return cls(
+            raw_days=float(os.environ.get("ACCIDENT_HISTORY_RETENTION_DAYS", 30)),
+            batch_size=int(os.environ.get("ACCIDENT_HISTORY_COMPACTION_BATCH", 500)),
+            interval_seconds=float(os.environ.get("ACCIDENT_HISTORY_COMPACTION_INTERVAL", 3600)),
+        )
+
+
+def _live_bytes(conn):
+    """Bytes of the database file in use (excluding free pages)."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (page_count - freelist) * page_size, page_count * page_size
+
+
+def compact_batch(conn, cutoff, batch_size):
+    """
+    Roll up and delete one batch of raw records older than `cutoff`
+
+    Runs in its own short write transaction.
+
+    Returns:
+        int: Number of raw records compacted (0 when nothing is left)
+    """
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM predictions WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?",
+            (cutoff, batch_size),
+        )]
+        if ids:
+            placeholders = ", ".join("?" * len(ids))
+            conn.execute(
+                "INSERT INTO prediction_rollups "
+                "(hour, class_id, model_version, count, confidence_sum, confidence_min, confidence_max) "
+                f"SELECT CAST(timestamp / {ROLLUP_SECONDS} AS INTEGER) * {ROLLUP_SECONDS}, "
+                "class_id, model_version, COUNT(*), SUM(confidence), MIN(confidence), MAX(confidence) "
+                f"FROM predictions WHERE id IN ({placeholders}) "
+                "GROUP BY 1, 2, 3 "
+                "ON CONFLICT (hour, class_id, model_version) DO UPDATE SET "
+                "count = count + excluded.count, "
+                "confidence_sum = confidence_sum + excluded.confidence_sum, "
+                "confidence_min = MIN(confidence_min, excluded.confidence_min), "
+                "confidence_max = MAX(confidence_max, excluded.confidence_max)",
+                ids,
+            )
+            conn.execute(f"DELETE FROM predictions WHERE id IN ({placeholders})", ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+
+def compact_history(database, policy, now=None, on_batch=None):
+    """
+    Fold raw records older than the retention window into hourly rollups
+
+    Args:
+        database (history_db.HistoryDatabase): Database to compact
+        policy (RetentionPolicy): Retention settings
+        now (float): Current epoch time (defaults to time.time())
+        on_batch (callable): Called after each committed batch that deleted
+            records, e.g. to invalidate views cached on the history version
+
+    Returns:
+        dict: rows_compacted, batches, bytes_reclaimed, file_bytes_before,
+              file_bytes_after, duration_seconds
+    """
+
+    started = time.perf_counter()
+    now = time.time() if now is None else now
+    cutoff = now - policy.raw_days * 86400
+    conn = database.connect()
+    live_before, file_before = _live_bytes(conn)
+
+    rows_compacted = batches = 0
+    while True:
+        compacted = compact_batch(conn, cutoff, policy.batch_size)
+        if not compacted:
+            break
+        rows_compacted += compacted
+        batches += 1
+        if on_batch is not None:
+            on_batch()
+        if policy.batch_pause:
+            time.sleep(policy.batch_pause)
+
+    # Release free pages back to the filesystem, a few at a time
+    if rows_compacted and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            conn.execute("PRAGMA incremental_vacuum(256)").fetchall()
+            if policy.batch_pause:
+                time.sleep(policy.batch_pause)
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+
+    live_after, file_after = _live_bytes(conn)
+    return {
+        "rows_compacted": rows_compacted,
+        "batches": batches,
+        "bytes_reclaimed": max(live_before - live_after, 0),
+        "file_bytes_before": file_before,
+        "file_bytes_after": file_after,
+        "duration_seconds": time.perf_counter() - started,
+    }
+
+
+class CompactionWorker(threading.Thread):
+    """Daemon thread that compacts the history database on an interval."""
+
+    def __init__(self, database, policy, on_batch=None):
+        super().__init__(name="history-compaction", daemon=True)
+        self.database = database
+        self.policy = policy
+        self.on_batch = on_batch
+        self.last_report = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.last_report = compact_history(self.database, self.policy, on_batch=self.on_batch)
+                if self.last_report["rows_compacted"]:
+                    print(
+                        f"🧹 Compacted {self.last_report['rows_compacted']} predictions "
+                        f"in {self.last_report['batches']} batches, "
+                        f"reclaimed {self.last_report['bytes_reclaimed'] / 1024:.1f} KB"
+                    )
+            except Exception as e:
+                print(f"❌ History compaction failed: {e}")
+            self._stop_event.wait(self.policy.interval_seconds)
+
+    def stop(self):
+        """Ask the worker to exit after the current run."""
+        self._stop_event.set()
+
+
+def start_compaction(database, policy=None, on_batch=None):
+    """
+    Start background compaction for a history database
+
+    `on_batch` is passed to `compact_history`.
+
+    Returns:
+        CompactionWorker or None: None when there is no database or
+                                  retention is disabled
+    """
+
+    policy = policy or RetentionPolicy.from_env()
+    if database is None or policy.raw_days <= 0:
+        return None
+    worker = CompactionWorker(database, policy, on_batch)
+    worker.start()
+    return worker
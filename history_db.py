@@ -0,0 +1,312 @@
+"""
+Persistent Prediction History
+SQLite-backed prediction log with indexed, cursor-paginated queries
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# Default location of the history database (override with ACCIDENT_HISTORY_DB,
+# set it to an empty string to disable persistence)
+DEFAULT_DB_PATH = os.path.join("data", "history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    class_id INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    model_version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_time
+    ON predictions (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_predictions_session_time
+    ON predictions (session_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_predictions_class_time
+    ON predictions (class_id, timestamp, id);
+CREATE TABLE IF NOT EXISTS prediction_rollups (
+    hour REAL NOT NULL,
+    class_id INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    confidence_min REAL NOT NULL,
+    confidence_max REAL NOT NULL,
+    PRIMARY KEY (hour, class_id, model_version)
+);
+"""
+
+
+def encode_cursor(timestamp, record_id):
+    """Encode a (timestamp, id) keyset position as an opaque cursor string."""
+    return f"{timestamp!r}:{record_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by `encode_cursor`
+
+    Returns:
+        tuple: (timestamp, record_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+
+    try:
+        timestamp, record_id = cursor.rsplit(":", 1)
+        return float(timestamp), int(record_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+
+
+def build_filters(start=None, end=None, class_ids=None, min_confidence=None,
+                  max_confidence=None, model_version=None, session_id=None):
+    """
+    Translate query filters into a SQL WHERE fragment
+
+    Returns:
+        tuple: (list of SQL conditions, list of parameters)
+    """
+
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(start.timestamp())
+    if end is not None:
+        conditions.append("timestamp < ?")
+        params.append(end.timestamp())
+    if class_ids is not None:
+        class_ids = list(class_ids)
+        if not class_ids:
+            conditions.append("0")
+        else:
+            conditions.append(f"class_id IN ({', '.join('?' * len(class_ids))})")
+            params.extend(int(c) for c in class_ids)
+    if min_confidence is not None:
+        conditions.append("confidence >= ?")
+        params.append(float(min_confidence))
+    if max_confidence is not None:
+        conditions.append("confidence <= ?")
+        params.append(float(max_confidence))
+    if model_version is not None:
+        conditions.append("model_version = ?")
+        params.append(model_version)
+    if session_id is not None:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    return conditions, params
+
+
+class HistoryDatabase:
+    """
+    Prediction log stored in SQLite
+
+    Each thread gets its own connection. The database runs in WAL mode so
+    dashboard reads never block prediction writes from other sessions or
+    worker processes.
+    """
+
+    def __init__(self, path, class_labels):
+        self.path = path
+        self.class_labels = list(class_labels)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._inherited = []
+
+    def connect(self):
+        """Return this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            # Only takes effect on a new database; lets compaction shrink the file
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        """
+        Give a forked child process its own connections
+
+        A connection inherited from the parent is kept referenced but never
+        used or closed in the child (SQLite connections must not cross a
+        fork); the child opens a fresh one on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._inherited.append(conn)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+
+    def insert(self, record, session_id):
+        """Persist one prediction record."""
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO predictions (timestamp, session_id, class_id, confidence, model_version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (record["timestamp"].timestamp(), session_id, record["class_id"],
+                 record["confidence"], record["model_version"]),
+            )
+        return cursor.lastrowid
+
+    def insert_many(self, records, session_id):
+        """Persist several prediction records in a single transaction."""
+        conn = self.connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO predictions (timestamp, session_id, class_id, confidence, model_version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(record["timestamp"].timestamp(), session_id, record["class_id"],
+                  record["confidence"], record["model_version"]) for record in records],
+            )
+
+    def query(self, cursor=None, limit=50, newest_first=True, **filters):
+        """
+        Return one page of records matching the filters
+
+        Args:
+            cursor (str): Cursor from a previous page (None for the first page)
+            limit (int): Maximum number of records in the page
+            newest_first (bool): Page backwards in time when True
+            **filters: start, end, class_ids, min_confidence, max_confidence,
+                       model_version, session_id (see `build_filters`)
+
+        Returns:
+            dict: {"records": [...], "next_cursor": str or None}
+        """
+
+        rows, next_cursor = self._select_page(cursor, limit, newest_first, filters)
+        return {"records": [self._to_record(row) for row in rows], "next_cursor": next_cursor}
+
+    def query_columns(self, cursor=None, limit=50, newest_first=True, **filters):
+        """
+        Return one page of matching records as NumPy columns
+
+        Same arguments as `query`.
+
+        Returns:
+            dict: {"columns": {...}, "next_cursor": str or None}; columns
+                  use the `history.records_to_columns` layout
+        """
+
+        import numpy as np
+
+        rows, next_cursor = self._select_page(cursor, limit, newest_first, filters)
+        _, timestamps, _, class_ids, confidences, model_versions = zip(*rows) if rows else ([],) * 6
+        columns = {
+            "timestamp": np.asarray(timestamps, dtype=np.float64),
+            "class_id": np.asarray(class_ids, dtype=np.int8),
+            "confidence": np.asarray(confidences, dtype=np.float64),
+            "model_version": np.asarray(model_versions, dtype=object),
+        }
+        return {"columns": columns, "next_cursor": next_cursor}
+
+    def _select_page(self, cursor, limit, newest_first, filters):
+        conditions, params = build_filters(**filters)
+        if cursor is not None:
+            timestamp, record_id = decode_cursor(cursor)
+            op = "<" if newest_first else ">"
+            conditions.append(f"(timestamp {op} ? OR (timestamp = ? AND id {op} ?))")
+            params.extend([timestamp, timestamp, record_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if newest_first else "ASC"
+        rows = self.connect().execute(
+            "SELECT id, timestamp, session_id, class_id, confidence, model_version "
+            f"FROM predictions {where} ORDER BY timestamp {order}, id {order} LIMIT ?",
+            params + [int(limit) + 1],
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return rows, next_cursor
+
+    def count(self, **filters):
+        """Return the number of records matching the filters."""
+        conditions, params = build_filters(**filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.connect().execute(f"SELECT COUNT(*) FROM predictions {where}", params).fetchone()[0]
+
+    def hourly_rollups(self, start=None, end=None):
+        """
+        Return the hourly rollups produced by history compaction
+
+        Returns:
+            list: dicts with hour, class_id, model_version, count,
+                  average_confidence, confidence_min, confidence_max
+        """
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("hour >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            conditions.append("hour < ?")
+            params.append(end.timestamp())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connect().execute(
+            "SELECT hour, class_id, model_version, count, confidence_sum, confidence_min, confidence_max "
+            f"FROM prediction_rollups {where} ORDER BY hour, class_id",
+            params,
+        ).fetchall()
+        return [
+            {
+                "hour": datetime.fromtimestamp(hour),
+                "class_id": class_id,
+                "model_version": model_version,
+                "count": count,
+                "average_confidence": confidence_sum / count,
+                "confidence_min": confidence_min,
+                "confidence_max": confidence_max,
+            }
+            for hour, class_id, model_version, count, confidence_sum, confidence_min, confidence_max in rows
+        ]
+
+    def model_versions(self):
+        """Return the distinct model versions present in the log."""
+        rows = self.connect().execute("SELECT DISTINCT model_version FROM predictions ORDER BY 1").fetchall()
+        return [row[0] for row in rows]
+
+    def _to_record(self, row):
+        record_id, timestamp, session_id, class_id, confidence, model_version = row
+        return {
+            "id": record_id,
+            "timestamp": datetime.fromtimestamp(timestamp),
+            "severity": self.class_labels[class_id],
+            "class_id": class_id,
+            "confidence": confidence,
+            "model_version": model_version,
+            "session_id": session_id,
+        }
+
+
+def open_history_database(class_labels, path=None):
+    """
+    Return the configured history database, or None when persistence is off
+
+    Args:
+        class_labels (list): Severity label for each class id
+        path (str): Database file (defaults to ACCIDENT_HISTORY_DB or DEFAULT_DB_PATH)
+    """
+
+    if path is None:
+        path = os.environ.get("ACCIDENT_HISTORY_DB", DEFAULT_DB_PATH)
+    if not path:
+        return None
+    return HistoryDatabase(path, class_labels)
@@ -8,6 +8,7 @@ Run this file: streamlit run home.py
 
 import streamlit as st
 from styles import inject_custom_css, create_hero_section, create_feature_card, create_stat_card, create_gradient_divider
+from caching import measured_kpis, format_seconds
 
 # Page Configuration
 st.set_page_config(
@@ -74,6 +75,9 @@ create_gradient_divider()
 # System Statistics
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 2rem 0; font-size: 2.5rem;">📈 Live System Statistics</h2>', unsafe_allow_html=True)
 
+kpis = measured_kpis()
+week = kpis["week_predictions"]
+
 stats_col1, stats_col2, stats_col3, stats_col4 = st.columns(4)
 
 with stats_col1:
@@ -87,17 +91,18 @@ with stats_col1:
 with stats_col2:
     st.metric(
         label="Total Predictions",
-        value="1,247",
-        delta="+89",
+        value=f"{kpis['total_predictions']:,}",
+        delta=f"+{week:,} this week" if week is not None else None,
         help="Total number of predictions made"
     )
 
 with stats_col3:
     st.metric(
         label="Avg Processing",
-        value="1.8s",
-        delta="-0.3s",
-        help="Average time per prediction"
+        value=format_seconds(kpis["latency"]["mean"]),
+        delta=f"p95 {format_seconds(kpis['latency']['p95'])}" if kpis["latency"]["count"] else None,
+        delta_color="off",
+        help="Average time from upload to result, measured by this server process"
     )
 
 with stats_col4:
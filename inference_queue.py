@@ -0,0 +1,384 @@
+"""
+Inference Admission Control
+Bounded, deadline-aware, priority-scheduled queue in front of the model
+
+Every model call goes through one scheduler thread. Requests from all
+sessions wait in per-priority queues bounded by image count and are merged
+into batches of up to `max_batch` images, so concurrent uploads share model
+calls instead of contending for the model. Each request carries a deadline:
+a request whose estimated wait (from the queue depth and the measured batch
+time) would miss it is turned away at submission instead of queueing, and a
+request that expires while queued is dropped before reaching the model.
+Turned-away requests go to the degraded predictor when one is configured
+and raise `InferenceRejected` otherwise.
+
+Priority classes share the model by weighted fair queuing: each batch is
+filled from the backlogged class with the smallest virtual time, and a
+class's virtual time advances by images served / weight. Requests larger
+than the space left in a batch are split, so a bulk backfill is preempted at
+every batch boundary and an interactive upload waits for at most the batch
+in progress.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import metrics
+import tracing
+
+# Defaults, overridable through the environment
+DEFAULT_MAX_DEPTH = int(os.environ.get("ACCIDENT_INFERENCE_QUEUE_DEPTH", "256"))
+DEFAULT_MAX_BATCH = int(os.environ.get("ACCIDENT_INFERENCE_MAX_BATCH", "32"))
+DEFAULT_DEADLINE = float(os.environ.get("ACCIDENT_INFERENCE_DEADLINE_MS", "10000")) / 1000
+
+# Priority class -> share of the model when every class is backlogged
+PRIORITY_WEIGHTS = {"interactive": 8, "api": 4, "bulk": 1}
+DEFAULT_PRIORITY = "interactive"
+
+# Priority class -> default seconds allowed per request (None: no deadline)
+PRIORITY_TIMEOUTS = {"interactive": DEFAULT_DEADLINE, "api": DEFAULT_DEADLINE, "bulk": None}
+
+# Weight of the newest batch in the batch-time moving average
+SERVICE_TIME_ALPHA = 0.2
+
+# Completed requests per class kept for the latency percentiles
+LATENCY_WINDOW = 1000
+
+_COUNTERS = ["submitted", "completed", "rejected", "degraded", "expired", "failed"]
+
+
+class InferenceRejected(Exception):
+    """Raised when a request is shed instead of being run by the model."""
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(f"Inference rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Request:
+    __slots__ = ("images", "priority", "deadline", "future", "enqueued", "scheduled", "done", "probs", "trace")
+
+    def __init__(self, images, priority, deadline):
+        self.images = images
+        self.priority = priority
+        self.deadline = deadline
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.scheduled = 0  # images handed to the model so far
+        self.done = 0       # images with results
+        self.probs = None
+        self.trace = tracing.current_context()  # the caller's span, for the model-call span
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class InferenceQueue:
+    """
+    Admission-controlled, micro-batching, priority-aware front end for a predict function
+
+    Args:
+        predict_fn (callable): Maps an (N, ...) batch to N probability rows
+        max_depth (int): Most images waiting per priority class; further
+                         requests of that class are shed (a request is always
+                         admitted into an empty class queue)
+        max_batch (int): Most images merged into one model call
+        default_timeout (float): Seconds a request may take when no timeout
+                                 is given (None: the class default from
+                                 PRIORITY_TIMEOUTS)
+        degraded_fn (callable): Optional fast predictor for shed requests
+        weights (dict): Priority class -> fair-queuing weight
+    """
+
+    def __init__(self, predict_fn, max_depth=DEFAULT_MAX_DEPTH, max_batch=DEFAULT_MAX_BATCH,
+                 default_timeout=None, degraded_fn=None, weights=None):
+        self.predict_fn = predict_fn
+        self.max_depth = max_depth
+        self.max_batch = max_batch
+        self.default_timeout = default_timeout
+        self.degraded_fn = degraded_fn
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+
+        self._queues = {priority: deque() for priority in self.weights}
+        self._depth = dict.fromkeys(self.weights, 0)
+        self._vtime = dict.fromkeys(self.weights, 0.0)  # per-class virtual time
+        self._system_vtime = 0.0
+        self._cond = threading.Condition()
+        self._worker = None
+        self._busy = False  # a model call is in progress
+        self._service_time = None  # seconds per model call (moving average)
+        self._counters = {priority: dict.fromkeys(_COUNTERS, 0) for priority in self.weights}
+        self._latency = {priority: deque(maxlen=LATENCY_WINDOW) for priority in self.weights}
+        self._batches = 0
+        self._images = 0
+
+    def after_fork(self):
+        """
+        Reset the queue in a forked child process
+
+        The scheduler thread does not survive a fork and requests queued in
+        the parent have no waiting caller in the child, so both are dropped.
+        """
+        self._cond = threading.Condition()
+        self._worker = None
+        self._busy = False
+        for queue in self._queues.values():
+            queue.clear()
+        self._depth = dict.fromkeys(self.weights, 0)
+
+    # -- submission ---------------------------------------------------------
+
+    def estimated_wait(self, images=0, priority=DEFAULT_PRIORITY):
+        """Seconds a request of `images` images in `priority` would wait given the current queues."""
+        with self._cond:
+            return self._estimated_wait(images, priority)
+
+    def _estimated_wait(self, images, priority):
+        if self._service_time is None:
+            return 0.0
+        # The class drains at its weighted share of the model, but never
+        # slower than the whole backlog would drain
+        active = sum(weight for p, weight in self.weights.items() if self._depth[p] or p == priority)
+        share = self.weights[priority] / active
+        own = (self._depth[priority] + images) / (self.max_batch * share)
+        everything = (sum(self._depth.values()) + images) / self.max_batch
+        batches = -(-min(own, everything) // 1) + self._busy
+        return batches * self._service_time
+
+    def submit(self, images, timeout=None, priority=DEFAULT_PRIORITY):
+        """
+        Queue a batch of images for prediction
+
+        Args:
+            images (np.ndarray): Preprocessed images, shape (N, ...)
+            timeout (float): Seconds allowed until the result (None for the default)
+            priority (str): "interactive", "api" or "bulk"
+
+        Returns:
+            Future: resolves to (probabilities, degraded)
+        """
+
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority class: {priority}")
+        if timeout is None:
+            timeout = self.default_timeout if self.default_timeout is not None else PRIORITY_TIMEOUTS.get(priority)
+        deadline = time.monotonic() + timeout if timeout is not None else float("inf")
+        request = _Request(images, priority, deadline)
+
+        with self._cond:
+            self._counters[priority]["submitted"] += 1
+            depth = self._depth[priority]
+            if depth and depth + len(images) > self.max_depth:
+                reason = f"{priority} queue full ({depth} images waiting)"
+            elif timeout is not None and self._estimated_wait(len(images), priority) > timeout:
+                reason = f"deadline of {timeout * 1000:.0f} ms cannot be met"
+            else:
+                reason = None
+                queue = self._queues[priority]
+                if not queue:
+                    # A class returning from idle starts at the current virtual
+                    # time instead of spending credit saved while it was idle
+                    self._vtime[priority] = max(self._vtime[priority], self._system_vtime)
+                queue.append(request)
+                self._depth[priority] += len(images)
+                self._ensure_worker()
+                self._cond.notify()
+            retry_after = self._estimated_wait(0, priority)
+
+        if reason is not None:
+            self._shed(request, reason, retry_after)
+        return request.future
+
+    def predict(self, images, timeout=None, priority=DEFAULT_PRIORITY):
+        """
+        Predict and wait for the result
+
+        Returns:
+            tuple: (probabilities, degraded)
+
+        Raises:
+            InferenceRejected: The request was shed and no degraded path is configured
+        """
+
+        return self.submit(images, timeout, priority).result()
+
+    def _shed(self, request, reason, retry_after=None):
+        counters = self._counters[request.priority]
+        if self.degraded_fn is not None:
+            try:
+                request.future.set_result((self.degraded_fn(request.images), True))
+                with self._cond:
+                    counters["degraded"] += 1
+                return
+            except Exception as e:
+                print(f"❌ Degraded prediction failed: {e}")
+        with self._cond:
+            counters["rejected"] += 1
+        request.future.set_exception(InferenceRejected(reason, retry_after))
+
+    # -- scheduling ---------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="inference-queue", daemon=True)
+            self._worker.start()
+
+    def _pick_class(self):
+        backlogged = [priority for priority, queue in self._queues.items() if queue]
+        if not backlogged:
+            return None
+        return min(backlogged, key=lambda priority: (self._vtime[priority], -self.weights[priority]))
+
+    def _next_batch(self):
+        """
+        Fill one model call by weighted fair queuing; expired requests are shed
+
+        Returns:
+            list: (request, start, stop) slices of queued requests
+        """
+
+        with self._cond:
+            while not any(self._queues.values()):
+                self._cond.wait()
+            now = time.monotonic()
+            batch, expired, size = [], [], 0
+            while size < self.max_batch:
+                priority = self._pick_class()
+                if priority is None:
+                    break
+                queue = self._queues[priority]
+                request = queue[0]
+                remaining = len(request.images) - request.scheduled
+                if request.future.done() or (request.scheduled == 0 and request.deadline <= now):
+                    # Failed part-way through, or expired before it started
+                    queue.popleft()
+                    self._depth[priority] -= remaining
+                    if not request.future.done():
+                        expired.append(request)
+                    continue
+
+                take = min(remaining, self.max_batch - size)
+                batch.append((request, request.scheduled, request.scheduled + take))
+                request.scheduled += take
+                size += take
+                self._depth[priority] -= take
+                self._system_vtime = self._vtime[priority]
+                self._vtime[priority] += take / self.weights[priority]
+                if request.scheduled == len(request.images):
+                    queue.popleft()
+
+            for request in expired:
+                self._counters[request.priority]["expired"] += 1
+            self._busy = bool(batch)
+
+        for request in expired:
+            self._shed(request, "deadline expired while queued")
+        return batch
+
+    def _run(self):
+        import numpy as np
+
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            traces = [request.trace for request, _, _ in batch if request.trace is not None]
+            started = time.monotonic()
+            # Everything that can raise fails the batch's futures: a dead
+            # scheduler thread would leave every waiting request hanging
+            try:
+                if len(batch) == 1 and batch[0][1] == 0 and batch[0][2] == len(batch[0][0].images):
+                    images = batch[0][0].images
+                else:
+                    images = np.concatenate([request.images[start:stop] for request, start, stop in batch])
+                with tracing.span("model.inference", parent=traces[0] if traces else None, links=traces[1:],
+                                  images=len(images), requests=len(batch)):
+                    probs = np.asarray(self.predict_fn(images))
+                    if len(probs) != len(images):
+                        raise ValueError(f"expected {len(images)} predictions, got {len(probs)}")
+                finished = time.monotonic()
+
+                completed = []
+                offset = 0
+                for request, start, stop in batch:
+                    if request.probs is None:
+                        request.probs = np.empty((len(request.images),) + probs.shape[1:], dtype=probs.dtype)
+                    request.probs[start:stop] = probs[offset:offset + stop - start]
+                    request.done += stop - start
+                    offset += stop - start
+                    if request.done == len(request.images):
+                        completed.append(request)
+            except Exception as e:
+                failed = {id(request): request for request, _, _ in batch if not request.future.done()}
+                with self._cond:
+                    self._busy = False
+                    for request in failed.values():
+                        self._counters[request.priority]["failed"] += 1
+                for request in failed.values():
+                    request.future.set_exception(e)
+                continue
+            metrics.observe("inference", finished - started)
+
+            with self._cond:
+                self._busy = False
+                elapsed = finished - started
+                self._service_time = elapsed if self._service_time is None else (
+                    SERVICE_TIME_ALPHA * elapsed + (1 - SERVICE_TIME_ALPHA) * self._service_time
+                )
+                self._batches += 1
+                self._images += len(images)
+                for request in completed:
+                    self._counters[request.priority]["completed"] += 1
+                    self._latency[request.priority].append(finished - request.enqueued)
+
+            for request in completed:
+                request.future.set_result((request.probs, False))
+
+    # -- reporting ----------------------------------------------------------
+
+    def metrics(self):
+        """
+        Queue health counters
+
+        Returns:
+            dict: queued_requests, queued_images, max_depth, batch_seconds
+                  (moving average, None before the first batch), mean_batch_size,
+                  the submitted/completed/rejected/degraded/expired/failed/
+                  batches/images totals, and per priority class ("classes")
+                  its queue, counters and p50/p95 latency in milliseconds
+        """
+
+        with self._cond:
+            classes = {}
+            for priority in self.weights:
+                latency = list(self._latency[priority])
+                p50, p95 = _percentile(latency, 0.50), _percentile(latency, 0.95)
+                classes[priority] = {
+                    "weight": self.weights[priority],
+                    "queued_requests": len(self._queues[priority]),
+                    "queued_images": self._depth[priority],
+                    **self._counters[priority],
+                    "p50_ms": p50 * 1000 if p50 is not None else None,
+                    "p95_ms": p95 * 1000 if p95 is not None else None,
+                }
+            totals = {name: sum(c[name] for c in self._counters.values()) for name in _COUNTERS}
+            return {
+                "queued_requests": sum(len(queue) for queue in self._queues.values()),
+                "queued_images": sum(self._depth.values()),
+                "max_depth": self.max_depth,
+                "batch_seconds": self._service_time,
+                "mean_batch_size": self._images / self._batches if self._batches else None,
+                **totals,
+                "batches": self._batches,
+                "images": self._images,
+                "classes": classes,
+            }
@@ -0,0 +1,332 @@
+"""
+Runtime Metrics
+Latency histograms, throughput, cache and queue health for this process
+
+Stage latencies are recorded with `timed(stage)` or `observe(stage, seconds)`:
+decode, validate, preprocess, inference (one model call), predict (queue
+wait plus model, per request) and end_to_end (upload or API request to
+result). Cache lookups are counted with `cache_lookup(cache, hit)`. Values
+owned by other modules (inference queue, model state) are read at render
+time through collectors registered with `register_collector`.
+
+`render_prometheus()` produces the Prometheus text exposition format; it is
+served on /metrics by api.py and, when ACCIDENT_METRICS_PORT is set, by a
+small HTTP server started with `start_http_server`. The Streamlit KPIs read
+the same numbers through `latency_summary()` and `throughput()`.
+
+Metrics are per process, like any Prometheus client: scrape each worker.
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds (Prometheus client defaults plus 30s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0)
+
+# Stages with a latency histogram, in reporting order
+STAGES = ("decode", "validate", "preprocess", "inference", "predict", "end_to_end")
+
+# Seconds of prediction history used for the throughput rate
+THROUGHPUT_WINDOW = 300
+
+STARTED_AT = time.time()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (thread-safe)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot: above every bound
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, sum, count)."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within its bucket (None when empty)."""
+        cumulative, _, count = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        lower = 0.0
+        for i, upper in enumerate(self.buckets):
+            below = cumulative[i - 1] if i else 0
+            if cumulative[i] >= rank:
+                in_bucket = cumulative[i] - below
+                return lower + (upper - lower) * ((rank - below) / in_bucket if in_bucket else 0)
+            lower = upper
+        return self.buckets[-1]
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.cache_lookups = {}
+        self.cache_misses = {}
+        self.predictions = deque()  # (monotonic time, images) inside THROUGHPUT_WINDOW
+        self.predictions_total = 0
+        self.collectors = []
+
+
+_REGISTRY = _Registry()
+
+
+# -- recording ----------------------------------------------------------------
+
+
+def observe(stage, seconds):
+    """Record one latency observation for a stage."""
+    histogram = _REGISTRY.stages.get(stage)
+    if histogram is None:
+        with _REGISTRY.lock:
+            histogram = _REGISTRY.stages.setdefault(stage, Histogram())
+    histogram.observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block into the stage's histogram (also when it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def instrumented(stage):
+    """Decorator timing every call of a function into the stage's histogram."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def cache_lookup(cache, hit):
+    """Count one lookup in a named cache."""
+    with _REGISTRY.lock:
+        _REGISTRY.cache_lookups[cache] = _REGISTRY.cache_lookups.get(cache, 0) + 1
+        if not hit:
+            _REGISTRY.cache_misses[cache] = _REGISTRY.cache_misses.get(cache, 0) + 1
+
+
+def cache_miss(cache):
+    """Count a miss for a cache whose lookups are counted separately (st.cache_data bodies)."""
+    with _REGISTRY.lock:
+        _REGISTRY.cache_misses[cache] = _REGISTRY.cache_misses.get(cache, 0) + 1
+
+
+def count_predictions(images):
+    """Count classified images for the throughput rate."""
+    now = time.monotonic()
+    with _REGISTRY.lock:
+        _REGISTRY.predictions_total += images
+        _REGISTRY.predictions.append((now, images))
+        while _REGISTRY.predictions and _REGISTRY.predictions[0][0] < now - THROUGHPUT_WINDOW:
+            _REGISTRY.predictions.popleft()
+
+
+def register_collector(collect):
+    """
+    Add a callable read on every render
+
+    `collect()` returns a list of (name, type, help, samples) where type is
+    "gauge" or "counter" and samples is a list of (labels dict, value).
+    """
+    with _REGISTRY.lock:
+        _REGISTRY.collectors.append(collect)
+
+
+# -- reading ------------------------------------------------------------------
+
+
+def latency_summary(stage="end_to_end"):
+    """
+    Latency of a stage in this process
+
+    Returns:
+        dict: count, mean, p50 and p95 in seconds (None before the first observation)
+    """
+
+    histogram = _REGISTRY.stages.get(stage) or Histogram()
+    _, total, count = histogram.snapshot()
+    return {
+        "count": count,
+        "mean": total / count if count else None,
+        "p50": histogram.quantile(0.50),
+        "p95": histogram.quantile(0.95),
+    }
+
+
+def throughput():
+    """Images classified per minute over the last THROUGHPUT_WINDOW seconds (or since start)."""
+    now = time.monotonic()
+    with _REGISTRY.lock:
+        images = sum(n for t, n in _REGISTRY.predictions if t >= now - THROUGHPUT_WINDOW)
+    window = min(THROUGHPUT_WINDOW, time.time() - STARTED_AT) or 1.0
+    return images * 60 / window
+
+
+def resident_memory():
+    """Resident set size of this process in bytes (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def uptime():
+    """Seconds since this process started."""
+    return time.time() - STARTED_AT
+
+
+def cache_hit_rates():
+    """Cache name -> (lookups, hit rate)."""
+    with _REGISTRY.lock:
+        return {
+            cache: (lookups, 1 - _REGISTRY.cache_misses.get(cache, 0) / lookups)
+            for cache, lookups in _REGISTRY.cache_lookups.items() if lookups
+        }
+
+
+def _escape(value):
+    """Escape a label value as the text format requires (backslash, quote, newline)."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Every metric of this process in the Prometheus text format (version 0.0.4)."""
+    lines = [
+        "# HELP accident_stage_seconds Latency of each processing stage",
+        "# TYPE accident_stage_seconds histogram",
+    ]
+    for stage, histogram in list(_REGISTRY.stages.items()):
+        stage = _escape(stage)
+        cumulative, total, count = histogram.snapshot()
+        for bound, value in zip(histogram.buckets + (float("inf"),), cumulative):
+            lines.append(f'accident_stage_seconds_bucket{{stage="{stage}",le="{_number(bound)}"}} {value}')
+        lines.append(f'accident_stage_seconds_sum{{stage="{stage}"}} {_number(total)}')
+        lines.append(f'accident_stage_seconds_count{{stage="{stage}"}} {count}')
+
+    with _REGISTRY.lock:
+        predictions_total = _REGISTRY.predictions_total
+        lookups = dict(_REGISTRY.cache_lookups)
+        misses = dict(_REGISTRY.cache_misses)
+        collectors = list(_REGISTRY.collectors)
+
+    families = [
+        ("accident_predictions_total", "counter", "Images classified by this process",
+         [({}, predictions_total)]),
+        ("accident_predictions_per_minute", "gauge", f"Images classified per minute over the last {THROUGHPUT_WINDOW}s",
+         [({}, throughput())]),
+        ("accident_cache_lookups_total", "counter", "Cache lookups by cache",
+         [({"cache": cache}, n) for cache, n in sorted(lookups.items())]),
+        ("accident_cache_misses_total", "counter", "Cache misses by cache",
+         [({"cache": cache}, misses.get(cache, 0)) for cache in sorted(lookups)]),
+        ("accident_process_start_time_seconds", "gauge", "Unix time the process started",
+         [({}, STARTED_AT)]),
+    ]
+    rss = resident_memory()
+    if rss is not None:
+        families.append(("accident_process_resident_memory_bytes", "gauge", "Resident memory of this process",
+                         [({}, rss)]))
+    for collect in collectors:
+        try:
+            families.extend(collect())
+        except Exception as e:
+            print(f"❌ Metrics collector failed: {e}")
+
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Content type of `render_prometheus()` output
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def start_http_server(port=None, host="127.0.0.1"):
+    """
+    Serve /metrics from a daemon thread
+
+    Args:
+        port (int): Port to listen on (defaults to ACCIDENT_METRICS_PORT)
+        host (str): Interface to listen on
+
+    Returns:
+        ThreadingHTTPServer or None: None when no port is configured or it is taken
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    port = port if port is not None else int(os.environ.get("ACCIDENT_METRICS_PORT") or 0)
+    if not port:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes are not worth a log line each
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{server.server_port}/metrics")
+    return server
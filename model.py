@@ -5,18 +5,47 @@ Handles ML model inference for accident severity classification
 
 # -*- coding: utf-8 -*-
 
+from __future__ import annotations
+
 import os
 import random
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime
-import numpy as np
+from typing import TYPE_CHECKING
 
-# Global placeholders
-MODEL = None
-PREDICTION_HISTORY = []
+# NumPy and TensorFlow are imported in the functions that need them, so pages
+# that only show model metadata or statistics do not pay for loading them
+if TYPE_CHECKING:
+    import numpy as np
+
+from history import HistoryStore, history_frame
+from history_db import open_history_database
+from shared_stats import open_shared_statistics
+from history_compaction import start_compaction
+from drift import DriftMonitor
+from inference_queue import DEFAULT_PRIORITY, InferenceQueue, InferenceRejected
+import metrics
+import tracing
 
 # Severity classes
 SEVERITY_CLASSES = ["🟢 Minor Damage", "🟡 Moderate Damage", "🔴 Severe Crash"]
 
+# Version stamped on every recorded prediction (see model_info())
+MODEL_VERSION = "v1.0.0"
+
+# Version stamped instead on predictions made without the trained model
+# (dummy fallback model, or a failed model call)
+FALLBACK_MODEL_VERSION = "fallback"
+
+# Global placeholders
+HISTORY = HistoryStore(
+    database=open_history_database(SEVERITY_CLASSES),
+    aggregate=open_shared_statistics(),
+)
+COMPACTION = None  # started by the entry points (see start_history_compaction)
+DRIFT = DriftMonitor(num_classes=len(SEVERITY_CLASSES))
+
 # Class descriptions
 CLASS_DESCRIPTIONS = {
     "🟢 Minor Damage": {
@@ -42,6 +71,9 @@ CLASS_DESCRIPTIONS = {
     },
 }
 
+class ModelUnavailable(Exception):
+    """The trained model is not available and the caller does not accept fallback predictions."""
+
 def model_exists() -> bool:
     """Check if the TensorFlow model file exists on disk."""
     return os.path.isfile(os.path.join("models", "accident_severity_model.h5"))
@@ -63,6 +95,286 @@ def load_model():
         from fallback.model import get_dummy_model
         return get_dummy_model()
 
+class ModelManager:
+    """Owns the classifier for a process and loads it on first use."""
+
+    def __init__(self, loader=None):
+        self._loader = loader or load_model
+        self._lock = threading.Lock()
+        self._model = None
+        self.loaded_at = None
+
+    @property
+    def model(self):
+        """The loaded model (loading it if needed)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._loader()
+                    self.loaded_at = datetime.now()
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def is_fallback(self) -> bool:
+        """True when the loaded model is the dummy fallback model."""
+        return getattr(self._model, "is_fallback", False)
+
+    def predict(self, image_batch: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a batch of preprocessed images."""
+        return self.model.predict(image_batch)
+
+    def after_fork(self):
+        """Replace the load lock in a forked child; the loaded model is kept (shared copy-on-write)."""
+        self._lock = threading.Lock()
+
+_manager = ModelManager()
+
+def get_model_manager() -> ModelManager:
+    """Return the model manager used for predictions in this process."""
+    return _manager
+
+def set_model_manager(manager: ModelManager):
+    """Replace the process model manager (e.g. with a Streamlit-cached one)."""
+    global _manager
+    _manager = manager
+
+# Every model call in the process goes through this queue (see inference_queue.py)
+INFERENCE = InferenceQueue(lambda image_batch: get_model_manager().predict(image_batch))
+
+def set_degraded_predictor(predict_fn):
+    """Serve shed requests with `predict_fn` (batch -> probabilities) instead of rejecting them.
+
+    Pass None to reject shed requests with InferenceRejected again.
+    """
+    INFERENCE.degraded_fn = predict_fn
+
+def start_history_compaction():
+    """Start compacting the history database in the background, once per process.
+
+    Called by the long-running entry points (Streamlit pages that record
+    predictions, api.py, prefork.py's compaction process) rather than on
+    import, so tools importing this module (batch scorer, benchmarks) start
+    no thread.
+
+    Returns:
+        CompactionWorker or None: None without a database or with retention disabled
+    """
+    global COMPACTION
+    with _compaction_lock:
+        if COMPACTION is None or not COMPACTION.is_alive():
+            # Rows rolled up and deleted change what global history views
+            # show, so bump the version they are cached on
+            COMPACTION = start_compaction(HISTORY.database, on_batch=HISTORY.aggregate.bump)
+    return COMPACTION
+
+def _after_fork_in_child():
+    """Reset connections, locks and threads a forked worker inherits (see prefork.py)."""
+    global _client, _client_lock, COMPACTION, _compaction_lock
+    HISTORY.after_fork()
+    INFERENCE.after_fork()
+    get_model_manager().after_fork()
+    _client, _client_lock = None, threading.Lock()
+    COMPACTION, _compaction_lock = None, threading.Lock()  # the parent keeps compacting
+
+_client = None
+_client_lock = threading.Lock()
+_compaction_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def get_model_client():
+    """Client for the out-of-process model server, or None when ACCIDENT_MODEL_SERVER is not set."""
+    global _client
+    socket_path = os.environ.get("ACCIDENT_MODEL_SERVER")
+    if not socket_path:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from model_server import ModelClient
+                _client = ModelClient(socket_path)
+    return _client
+
+def _predict_probabilities(image_batch: np.ndarray, timeout: float, priority: str):
+    """Class probabilities from the model server when configured, otherwise in-process.
+
+    Returns:
+        tuple: (probabilities or None when there is no model, degraded,
+                fallback: True when they come from the dummy model)
+    """
+    client = get_model_client()
+    if client is not None:
+        with tracing.span("model.remote", kind=tracing.KIND_CLIENT) as span:
+            result = client.predict(image_batch, timeout, priority)
+            span.set(reachable=result is not None)
+        if result is not None:
+            return result
+    manager = get_model_manager()
+    if manager.model is None:
+        return None, False, True
+    with tracing.span("model.queue") as span:
+        probs, degraded = INFERENCE.predict(image_batch, timeout, priority)
+        span.set(degraded=degraded)
+    return probs, degraded, manager.is_fallback
+
+def _collect_metrics():
+    """Inference queue and model state for metrics.render_prometheus()."""
+    queue = INFERENCE.metrics()
+    outcomes = ("submitted", "completed", "rejected", "degraded", "expired", "failed")
+    return [
+        ("accident_inference_queue_images", "gauge", "Images waiting for the model by priority class",
+         [({"priority": p}, c["queued_images"]) for p, c in queue["classes"].items()]),
+        ("accident_inference_requests_total", "counter", "Inference requests by priority class and outcome",
+         [({"priority": p, "outcome": o}, c[o]) for p, c in queue["classes"].items() for o in outcomes]),
+        ("accident_inference_batch_size", "gauge", "Mean images per model call",
+         [({}, queue["mean_batch_size"])]),
+        ("accident_model_loaded", "gauge", "1 when this process has the model loaded",
+         [({"version": MODEL_VERSION}, int(get_model_manager().is_loaded))]),
+        ("accident_model_server", "gauge", "1 when predictions go to the out-of-process model server",
+         [({}, int(bool(os.environ.get("ACCIDENT_MODEL_SERVER"))))]),
+    ]
+
+metrics.register_collector(_collect_metrics)
+
+def get_inference_metrics() -> dict:
+    """Queue depth, queued/rejected/degraded counts and per-priority latency of the inference queue."""
+    return INFERENCE.metrics()
+
+@dataclass
+class PredictionResult:
+    """One classified image."""
+    severity: str
+    class_id: int
+    confidence: float
+    probabilities: dict = field(default_factory=dict)
+    model_version: str = MODEL_VERSION
+    timestamp: datetime = field(default_factory=datetime.now)
+    degraded: bool = False
+    fallback: bool = False  # made without the trained model (model_version FALLBACK_MODEL_VERSION)
+
+    def to_record(self) -> dict:
+        """The history record stored for this prediction."""
+        return {
+            "timestamp": self.timestamp,
+            "severity": self.severity,
+            "class_id": self.class_id,
+            "confidence": self.confidence,
+            "model_version": self.model_version,
+        }
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form."""
+        return {
+            "severity": self.severity,
+            "class_id": self.class_id,
+            "confidence": round(self.confidence, 2),
+            "probabilities": {label: round(p, 2) for label, p in self.probabilities.items()},
+            "model_version": self.model_version,
+            "timestamp": self.timestamp.isoformat(),
+            "degraded": self.degraded,
+            "fallback": self.fallback,
+        }
+
+def _dummy_result() -> PredictionResult:
+    idx = random.randrange(len(SEVERITY_CLASSES))
+    return PredictionResult(SEVERITY_CLASSES[idx], idx, random.uniform(75.0, 98.5),
+                            model_version=FALLBACK_MODEL_VERSION, fallback=True)
+
+def predict_batch(image_batch: np.ndarray, session_id: str = None, timeout: float = None,
+                  priority: str = DEFAULT_PRIORITY, allow_fallback: bool = True,
+                  record: bool = True, session_log: bool = True) -> list:
+    """Classify a batch of preprocessed images with one model call and record every result.
+
+    Args:
+        image_batch (np.ndarray): Preprocessed images with shape (N, 224, 224, 3)
+        session_id (str): History session (defaults to the current one)
+        timeout (float): Seconds the caller can wait for the model (None for
+            the priority class default)
+        priority (str): Scheduling class: "interactive" (people waiting on
+            the page), "api" or "bulk" (backfills; uses idle capacity)
+        allow_fallback (bool): Accept dummy predictions (stamped with
+            FALLBACK_MODEL_VERSION) when the trained model is missing or fails;
+            when False, ModelUnavailable is raised and nothing is recorded
+        record (bool): Record the results in the history; pass False to
+            record them later with `record_predictions` (e.g. after a checkpoint)
+        session_log (bool): Also keep the results in the session's in-memory
+            log (see `HistoryStore.record_many`)
+    Returns:
+        list: One PredictionResult per image, in input order
+    Raises:
+        InferenceRejected: The inference queue shed the request (overload)
+        ModelUnavailable: allow_fallback is False and the trained model is not available
+    """
+    import numpy as np
+
+    if not isinstance(image_batch, np.ndarray):
+        raise TypeError("Input must be a numpy array")
+    if image_batch.ndim != 4 or image_batch.shape[1:] != (224, 224, 3):
+        raise ValueError("Images must be shape (N, 224, 224, 3)")
+    if len(image_batch) == 0:
+        return []
+
+    with tracing.span("model.predict_batch", images=len(image_batch), priority=priority) as span:
+        results = _classify(image_batch, timeout, priority, allow_fallback)
+        span.set(degraded=any(result.degraded for result in results))
+
+        metrics.count_predictions(len(results))
+        if record:
+            record_predictions(results, session_id, session_log)
+    return results
+
+def record_predictions(results: list, session_id: str = None, session_log: bool = True):
+    """Record PredictionResults in the history and the drift monitor."""
+    with tracing.span("history.record", records=len(results)):
+        records = [result.to_record() for result in results]
+        HISTORY.record_many(records, session_id, session_log)
+        for result, record in zip(results, records):
+            if not result.fallback:  # random outputs would only distort the drift windows
+                DRIFT.observe(record)
+
+def _classify(image_batch: np.ndarray, timeout: float, priority: str, allow_fallback: bool = True) -> list:
+    """PredictionResults for a batch; dummy results when there is no model or it fails."""
+    import numpy as np
+
+    # Served by the model server when one is configured, otherwise in-process
+    results = None
+    try:
+        with metrics.timed("predict"):
+            preds, degraded, fallback = _predict_probabilities(image_batch, timeout, priority)
+        if fallback and not allow_fallback:
+            raise ModelUnavailable("The trained model is not loaded (only the dummy fallback model is available)")
+        if preds is not None:
+            preds = np.asarray(preds)
+            if len(preds) != len(image_batch):
+                raise ValueError(f"expected {len(image_batch)} predictions, got {len(preds)}")
+            results = []
+            for probs in preds:
+                idx = int(np.argmax(probs))
+                results.append(PredictionResult(
+                    severity=SEVERITY_CLASSES[idx],
+                    class_id=idx,
+                    confidence=float(probs[idx] * 100),
+                    probabilities={label: float(p * 100) for label, p in zip(SEVERITY_CLASSES, probs)},
+                    model_version=FALLBACK_MODEL_VERSION if fallback else MODEL_VERSION,
+                    degraded=degraded,
+                    fallback=fallback,
+                ))
+    except (InferenceRejected, ModelUnavailable):
+        raise
+    except Exception as e:
+        print(f"❌ Model prediction failed: {e}")
+        if not allow_fallback:
+            raise ModelUnavailable(f"Model prediction failed: {e}") from e
+        print("🔄 Using dummy prediction")
+    if results is None:
+        results = [_dummy_result() for _ in range(len(image_batch))]
+    return results
+
 def predict_severity(image_array: np.ndarray):
     """Validate input, ensure model is loaded, and return severity and confidence.
 
@@ -70,37 +382,18 @@ def predict_severity(image_array: np.ndarray):
         image_array (np.ndarray): Preprocessed image array with shape (1, 224, 224, 3)
     Returns:
         tuple: (severity_class, confidence_score)
+    Raises:
+        InferenceRejected: The inference queue shed the request (overload)
     """
+    import numpy as np
+
     if not isinstance(image_array, np.ndarray):
         raise TypeError("Input must be a numpy array")
     if image_array.shape[1:] != (224, 224, 3):
         raise ValueError("Image must be shape (1, 224, 224, 3)")
 
-    global MODEL
-    if MODEL is None:
-        MODEL = load_model()
-
-    if MODEL is not None:
-        try:
-            preds = MODEL.predict(image_array)
-            idx = int(np.argmax(preds[0]))
-            confidence = float(preds[0][idx] * 100)
-            severity = SEVERITY_CLASSES[idx]
-        except Exception as e:
-            print(f"❌ Model prediction failed: {e}")
-            print("🔄 Using dummy prediction")
-            severity = random.choice(SEVERITY_CLASSES)
-            confidence = random.uniform(75.0, 98.5)
-    else:
-        severity = random.choice(SEVERITY_CLASSES)
-        confidence = random.uniform(75.0, 98.5)
-
-    PREDICTION_HISTORY.append({
-        "timestamp": datetime.now(),
-        "severity": severity,
-        "confidence": confidence,
-    })
-    return severity, confidence
+    result = predict_batch(image_array[:1])[0]
+    return result.severity, result.confidence
 
 def get_class_probabilities(image_array: np.ndarray):
     """Return class‑wise probability percentages.
@@ -110,10 +403,10 @@ def get_class_probabilities(image_array: np.ndarray):
     Returns:
         dict: Mapping of class name to probability (0‑100)
     """
-    global MODEL
-    if MODEL is not None:
+    manager = get_model_manager()
+    if manager.is_loaded:
         try:
-            probs = MODEL.predict(image_array)[0]
+            probs = manager.predict(image_array)[0]
             return {
                 "Minor Damage": float(probs[0] * 100),
                 "Moderate Damage": float(probs[1] * 100),
@@ -122,6 +415,7 @@ def get_class_probabilities(image_array: np.ndarray):
         except Exception as e:
             print(f"❌ Probability prediction failed: {e}")
             print("🔄 Falling back to dummy probabilities")
+    import numpy as np
     probs = np.random.dirichlet(np.ones(3), size=1)[0]
     return {
         "Minor Damage": float(probs[0] * 100),
@@ -143,33 +437,127 @@ def get_detailed_analysis(severity_class: str):
         "severity_level": 0,
     }
 
-def get_prediction_history(limit: int = 10):
-    """Return the most recent prediction records."""
-    return PREDICTION_HISTORY[-limit:]
+def get_prediction_history(limit: int = 10, session_id: str = None):
+    """Return the most recent prediction records of the current session."""
+    return HISTORY.session(session_id).recent(limit)
 
-def get_statistics():
-    """Aggregate statistics over all predictions."""
-    if not PREDICTION_HISTORY:
-        return {
-            "total_predictions": 0,
-            "average_confidence": 0,
-            "severity_distribution": {"Minor": 0, "Moderate": 0, "Severe": 0},
-        }
-    total = len(PREDICTION_HISTORY)
-    avg_conf = sum(p["confidence"] for p in PREDICTION_HISTORY) / total
-    dist = {"Minor": 0, "Moderate": 0, "Severe": 0}
-    for rec in PREDICTION_HISTORY:
-        if "Minor" in rec["severity"]:
-            dist["Minor"] += 1
-        elif "Moderate" in rec["severity"]:
-            dist["Moderate"] += 1
-        else:
-            dist["Severe"] += 1
-    return {
-        "total_predictions": total,
-        "average_confidence": avg_conf,
-        "severity_distribution": dist,
-    }
+def query_history(cursor: str = None, limit: int = 50, scope: str = "session",
+                  session_id: str = None, newest_first: bool = True, **filters):
+    """Return one page of prediction records matching the filters.
+
+    Args:
+        cursor (str): `next_cursor` of the previous page (None for the first)
+        limit (int): Maximum records per page
+        scope (str): "session" for the current session, "global" for all
+            sessions (requires the history database)
+        session_id (str): Explicit session id (defaults to the current one)
+        newest_first (bool): Page backwards in time when True
+        **filters: start, end (datetime), class_ids (iterable of class ids),
+            min_confidence, max_confidence (percent), model_version (str)
+    Returns:
+        dict: {"records": [...], "next_cursor": str or None}
+    """
+    if scope == "session":
+        session = HISTORY.session(session_id)
+        if HISTORY.database is None:
+            return session.query(cursor=cursor, limit=limit, newest_first=newest_first, **filters)
+        filters["session_id"] = session.session_id
+    elif HISTORY.database is None:
+        raise ValueError("Global history queries require the history database")
+    return HISTORY.database.query(cursor=cursor, limit=limit, newest_first=newest_first, **filters)
+
+def query_history_frame(cursor: str = None, limit: int = 500, scope: str = "session",
+                        session_id: str = None, newest_first: bool = True, **filters):
+    """Columnar `query_history`: one page of matching records as a DataFrame.
+
+    Returns:
+        tuple: (pd.DataFrame with timestamp, severity (categorical), class_id,
+                confidence and model_version columns, next_cursor)
+    """
+    if scope == "session":
+        session = HISTORY.session(session_id)
+        if HISTORY.database is None:
+            page = session.query_columns(cursor=cursor, limit=limit, newest_first=newest_first, **filters)
+            return history_frame(page["columns"], SEVERITY_CLASSES), page["next_cursor"]
+        filters["session_id"] = session.session_id
+    elif HISTORY.database is None:
+        raise ValueError("Global history queries require the history database")
+    page = HISTORY.database.query_columns(cursor=cursor, limit=limit, newest_first=newest_first, **filters)
+    return history_frame(page["columns"], SEVERITY_CLASSES), page["next_cursor"]
+
+def get_history_frame(limit: int = None, session_id: str = None, since: int = None):
+    """Return the current session's newest `limit` records as a DataFrame (oldest first).
+
+    Pass `since=<session history version>` to get only the records recorded
+    after that version (see `get_history_version`).
+    """
+    return history_frame(HISTORY.session(session_id).columns(limit, since=since), SEVERITY_CLASSES)
+
+def history_persisted() -> bool:
+    """Return True when predictions are persisted to the history database."""
+    return HISTORY.database is not None
+
+def get_model_versions():
+    """Return the model versions present in the prediction history."""
+    if HISTORY.database is not None:
+        return HISTORY.database.model_versions()
+    return [MODEL_VERSION]
+
+def iter_history(page_size: int = 1000, **query):
+    """Yield every record matching a `query_history` query, one page at a time."""
+    cursor = None
+    while True:
+        page = query_history(cursor=cursor, limit=page_size, **query)
+        yield from page["records"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+def count_predictions(since: datetime = None):
+    """Return the number of predictions recorded across all sessions since `since`.
+
+    Returns:
+        int or None: None without the history database (in-memory history
+            only knows the current process's sessions)
+    """
+    if HISTORY.database is None:
+        return None
+    return HISTORY.database.count(start=since)
+
+def get_history_version(scope: str = "session", session_id: str = None) -> int:
+    """Return a counter that changes whenever predictions are recorded.
+
+    The global version also changes when history compaction rolls up and
+    deletes stored records. Use it as a cache key for anything derived from
+    the history.
+    """
+    if scope == "global":
+        return HISTORY.aggregate.version
+    return HISTORY.session(session_id).aggregate.version
+
+def get_statistics(scope: str = "session", session_id: str = None):
+    """Aggregate statistics over predictions.
+
+    Args:
+        scope (str): "session" for the current session only, "global" for
+            every session across all worker processes
+        session_id (str): Explicit session id (defaults to the current one)
+    Returns:
+        dict: total_predictions, average_confidence, severity_distribution
+    """
+    if scope == "global":
+        return HISTORY.aggregate.summary()
+    return HISTORY.session(session_id).aggregate.summary()
+
+def get_drift_report():
+    """Return the live drift metrics against the reference distribution."""
+    report = DRIFT.report()
+    report["reference"] = DRIFT.reference
+    report["reference_source"] = DRIFT.reference_source
+    report["psi_threshold"] = DRIFT.psi_threshold
+    report["window"] = DRIFT.window
+    report["min_samples"] = DRIFT.min_samples
+    return report
 
 def model_info():
     """Static metadata about the model."""
@@ -189,7 +577,7 @@ def model_info():
         "batch_size": 32,
         "optimizer": "Adam",
         "learning_rate": 0.001,
-        "version": "v1.0.0",
+        "version": MODEL_VERSION,
         "last_updated": "2024-01-15",
         "framework": "TensorFlow 2.15",
     }
@@ -229,4 +617,4 @@ def get_recommendations(severity_class: str):
     return recs["Severe"]
 
 # Optional eager loading (commented out)
-# MODEL = load_model()
+# get_model_manager().model
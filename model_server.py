@@ -0,0 +1,365 @@
+"""
+Out-of-Process Model Server
+One local process owns the model; Streamlit and API workers send it batches
+
+The server listens on a Unix domain socket and runs every request through
+its inference queue, so batching and priority scheduling span all client
+processes and only the server holds the model in memory. Image tensors do
+not travel over the socket: each client connection writes its batch into
+its own shared-memory block and sends only the block name, shape and dtype;
+the server maps the block and hands the model a view of it. Replies carry
+just the class probabilities.
+
+Messages are length-prefixed JSON:
+    {"op": "predict", "shm": name, "shape": [...], "dtype": "float32",
+     "timeout": seconds or null, "priority": "interactive", "traceparent": optional}
+      -> {"ok": true, "probs": [[...], ...], "degraded": false, "fallback": false}
+      -> {"ok": false, "rejected": true, "reason": "...", "retry_after": 1.5}
+      -> {"ok": false, "error": "..."}
+    {"op": "ping"} -> {"ok": true, "pid": ..., "model_loaded": ..., "inference": {...}}
+
+Clients are enabled by pointing ACCIDENT_MODEL_SERVER at the socket path;
+`model.predict_batch` then goes through `ModelClient`, which reconnects
+after a lost connection and falls back to in-process prediction while the
+server is unreachable.
+
+Usage:
+    python model_server.py [--socket /tmp/accident-model.sock]
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import tracing
+
+# Socket used when neither --socket nor ACCIDENT_MODEL_SERVER is given
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "accident-model.sock")
+
+# Seconds a client predicts in-process after failing to reach the server
+RECONNECT_INTERVAL = 5.0
+
+# Seconds added to the request deadline before a client gives up on a reply
+REPLY_MARGIN = 2.0
+
+# Seconds a client waits for the reply to a request without a deadline (bulk)
+# before it treats the server as hung
+NO_DEADLINE_REPLY_TIMEOUT = 600.0
+
+_HEADER = struct.Struct("!I")
+
+
+def _send(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks += chunk
+    return bytes(chunks)
+
+
+def _recv(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def _attach(name):
+    """Map a client's segment without letting the resource tracker unlink it at exit."""
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+    return segment
+
+
+# -- server -------------------------------------------------------------------
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """Serves one client connection; the segment it last named stays mapped for reuse."""
+
+    def handle(self):
+        import numpy as np
+        import model
+        from inference_queue import InferenceRejected
+
+        segments = {}
+        try:
+            while True:
+                try:
+                    message = _recv(self.request)
+                except (ConnectionError, OSError):
+                    return
+
+                if message.get("op") == "ping":
+                    manager = model.get_model_manager()
+                    _send(self.request, {
+                        "ok": True,
+                        "pid": os.getpid(),
+                        "model_loaded": manager.is_loaded,
+                        "model_fallback": manager.is_fallback,
+                        "model_version": model.MODEL_VERSION,
+                        "inference": model.get_inference_metrics(),
+                    })
+                    continue
+                if message.get("op") != "predict":
+                    _send(self.request, {"ok": False, "error": f"Unknown op: {message.get('op')}"})
+                    continue
+
+                parent = tracing.parse_traceparent(message.get("traceparent"))
+                with tracing.span("model_server.predict", parent=parent, kind=tracing.KIND_SERVER,
+                                  priority=message.get("priority"), shape="x".join(map(str, message.get("shape") or ()))):
+                    try:
+                        segment = segments.get(message["shm"])
+                        if segment is None:
+                            # The client replaced its block with a larger one
+                            for old in segments.values():
+                                old.close()
+                            segments = {message["shm"]: _attach(message["shm"])}
+                            segment = segments[message["shm"]]
+                        images = np.ndarray(tuple(message["shape"]), dtype=message["dtype"], buffer=segment.buf)
+                        probs, degraded = model.INFERENCE.predict(
+                            images, message.get("timeout"), message.get("priority", "interactive")
+                        )
+                        del images
+                        reply = {"ok": True, "probs": np.asarray(probs).tolist(), "degraded": degraded,
+                                 "fallback": model.get_model_manager().is_fallback}
+                    except InferenceRejected as e:
+                        reply = {"ok": False, "rejected": True, "reason": e.reason, "retry_after": e.retry_after}
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                _send(self.request, reply)
+        finally:
+            for segment in segments.values():
+                try:
+                    segment.close()
+                except BufferError:
+                    pass  # still referenced by a request the queue has not released
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server; one thread per client connection."""
+
+    daemon_threads = True
+
+
+def serve(socket_path=DEFAULT_SOCKET):
+    """Load the model and serve predictions on `socket_path` until interrupted."""
+    import model
+
+    if os.path.exists(socket_path):
+        try:
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            probe.connect(socket_path)
+            probe.close()
+            raise SystemExit(f"❌ A model server is already listening on {socket_path}")
+        except ConnectionRefusedError:
+            os.unlink(socket_path)  # left behind by a server that did not shut down cleanly
+
+    model.get_model_manager().model
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # clean up the socket on SIGTERM too
+    server = ModelServer(socket_path, _ConnectionHandler)
+    os.chmod(socket_path, 0o660)
+    print(f"🚀 Model server {os.getpid()} listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Shutting down", file=sys.stderr)
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# -- client -------------------------------------------------------------------
+
+
+class _Channel:
+    """One connection to the server plus the shared-memory block it sends batches in."""
+
+    def __init__(self, socket_path):
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.conn.connect(socket_path)
+        except OSError:
+            self.conn.close()
+            raise
+        self.segment = None
+
+    def buffer(self, nbytes):
+        """Shared-memory block of at least `nbytes`, replacing a smaller one."""
+        if self.segment is None or self.segment.size < nbytes:
+            self._unlink()
+            self.segment = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self.segment
+
+    def request(self, message, timeout=None):
+        self.conn.settimeout(timeout)
+        _send(self.conn, message)
+        return _recv(self.conn)
+
+    def _unlink(self):
+        if self.segment is not None:
+            try:
+                self.segment.close()
+                self.segment.unlink()
+            except (BufferError, FileNotFoundError):
+                pass
+            self.segment = None
+
+    def close(self):
+        self.conn.close()
+        self._unlink()
+
+
+class ModelClient:
+    """
+    Thin client for the model server
+
+    Requests borrow a channel (connection + shared-memory block) from a
+    small pool, so concurrent Streamlit sessions do not serialize on one
+    socket and blocks are reused across reruns. When the server cannot be
+    reached the client reports it once and returns None for
+    RECONNECT_INTERVAL seconds, during which callers predict in-process; the
+    next call after that tries to reconnect.
+    """
+
+    # Idle channels kept open for reuse
+    MAX_IDLE = 8
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self._idle = []
+        self._down_until = 0.0
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _Channel(self.socket_path)
+
+    def _release(self, channel):
+        with self._lock:
+            if len(self._idle) < self.MAX_IDLE:
+                self._idle.append(channel)
+                return
+        channel.close()
+
+    def _mark_down(self, error):
+        with self._lock:
+            if time.monotonic() >= self._down_until:
+                print(f"⚠️ Model server unavailable ({error}); predicting in-process")
+            self._down_until = time.monotonic() + RECONNECT_INTERVAL
+
+    def _call(self, message, timeout, images=None):
+        """Send one message (writing `images` into shared memory first) and return the reply, or None."""
+        import numpy as np
+
+        for attempt in range(2):  # one retry on a fresh channel if a pooled one went stale
+            channel = None
+            try:
+                channel = self._acquire()
+                if images is not None:
+                    segment = channel.buffer(images.nbytes)
+                    np.ndarray(images.shape, dtype=images.dtype, buffer=segment.buf)[:] = images
+                    message["shm"] = segment.name
+                reply = channel.request(message, timeout)
+            except (OSError, ConnectionError, ValueError) as e:
+                if channel is not None:
+                    channel.close()
+                if attempt == 1 or channel is None or isinstance(e, socket.timeout):
+                    self._mark_down(e)
+                    return None
+                continue
+            self._release(channel)
+            return reply
+
+    def ping(self):
+        """Server status, or None when it cannot be reached."""
+        return self._call({"op": "ping"}, REPLY_MARGIN)
+
+    def predict(self, image_batch, timeout=None, priority="interactive"):
+        """
+        Class probabilities from the server
+
+        Args:
+            image_batch (np.ndarray): Preprocessed images (N, 224, 224, 3)
+            timeout (float): Seconds allowed (None for the server's class
+                             default; the client then waits for the local
+                             class default plus REPLY_MARGIN, so a hung server
+                             never blocks the caller indefinitely)
+            priority (str): Scheduling class on the server
+
+        Returns:
+            tuple or None: (probabilities, degraded, fallback), or None when the
+                           server is unreachable and the caller should predict in-process
+
+        Raises:
+            InferenceRejected: The server shed the request
+        """
+
+        import numpy as np
+        from inference_queue import InferenceRejected, PRIORITY_TIMEOUTS
+
+        if time.monotonic() < self._down_until:
+            return None
+
+        image_batch = np.ascontiguousarray(image_batch, dtype=np.float32)
+        message = {
+            "op": "predict",
+            "shape": list(image_batch.shape),
+            "dtype": str(image_batch.dtype),
+            "timeout": timeout,
+            "priority": priority,
+        }
+        trace = tracing.current_context()
+        if trace is not None:
+            message["traceparent"] = trace.traceparent()
+        deadline = timeout if timeout is not None else PRIORITY_TIMEOUTS.get(priority)
+        wait = deadline + REPLY_MARGIN if deadline is not None else NO_DEADLINE_REPLY_TIMEOUT
+        reply = self._call(message, wait, image_batch)
+
+        if reply is None:
+            return None
+        if reply.get("ok"):
+            return np.asarray(reply["probs"], dtype=np.float32), reply["degraded"], reply.get("fallback", False)
+        if reply.get("rejected"):
+            raise InferenceRejected(reply["reason"], reply.get("retry_after"))
+        raise RuntimeError(f"Model server error: {reply.get('error')}")
+
+    def close(self):
+        """Close pooled connections and unlink their shared-memory blocks."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for channel in idle:
+            channel.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the accident severity model over a Unix socket")
+    parser.add_argument("--socket", default=os.environ.get("ACCIDENT_MODEL_SERVER") or DEFAULT_SOCKET,
+                        help="Socket path (clients find it through ACCIDENT_MODEL_SERVER)")
+    args = parser.parse_args(argv)
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Batch Analysis Page - Multi-Image Claim Assessment with Modern UI
+Analyze every photo of a claim at once with live, per-batch results
+"""
+
+import html
+import streamlit as st
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import get_recommendations
+from batch_inference import BATCH_SIZE, BUSY_STATUS, analyze_files, summarize_claim
+from caching import use_cached_model
+from styles import inject_custom_css, create_hero_section, create_gradient_divider
+
+# Page Configuration
+st.set_page_config(
+    page_title="Batch Analysis",
+    page_icon="🗂️",
+    layout="wide"
+)
+
+# Inject Custom Styling
+inject_custom_css()
+
+# Share one cached model manager across sessions
+use_cached_model()
+
+# Hero Section
+create_hero_section(
+    "🗂️ Batch Claim Analysis",
+    "Upload every photo of a claim and get a combined severity assessment"
+)
+
+# Results per uploaded file id, kept across reruns so each photo is analyzed once
+_RESULTS_KEY = "_batch_results"
+
+# Table column setup for the live results table
+RESULT_COLUMNS = {
+    "file": st.column_config.TextColumn("📷 File"),
+    "status": st.column_config.TextColumn("📋 Status"),
+    "severity": st.column_config.TextColumn("⚠️ Severity"),
+    "class_id": None,
+    "confidence": st.column_config.ProgressColumn("🎯 Confidence", format="%.1f%%", min_value=0, max_value=100),
+    "megapixels": st.column_config.NumberColumn("📊 MP", format="%.1f"),
+}
+
+st.markdown("""
+<div style="max-width: 900px; margin: 0 auto;">
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <p style="font-size: 1.1rem; color: var(--text-secondary);">
+            Drop all photos of a claim below. Supported formats: JPG, PNG, JPEG (max 10MB each)
+        </p>
+    </div>
+</div>
+""", unsafe_allow_html=True)
+
+claim_reference = st.text_input("🔖 Claim reference (optional)", placeholder="e.g. CLM-2024-00123")
+
+uploaded_files = st.file_uploader(
+    "Choose accident images",
+    type=["jpg", "jpeg", "png"],
+    accept_multiple_files=True,
+    help="Upload every photo of the claim at once",
+    label_visibility="collapsed"
+)
+
+if uploaded_files:
+    results = st.session_state.setdefault(_RESULTS_KEY, {})
+    file_ids = [uploaded_file.file_id for uploaded_file in uploaded_files]
+
+    # Forget photos removed from the uploader
+    for stale_id in set(results) - set(file_ids):
+        del results[stale_id]
+
+    pending = [uploaded_file for uploaded_file in uploaded_files if uploaded_file.file_id not in results]
+
+    st.markdown("""
+    <h3 style="margin: 1.5rem 0 1rem 0;">
+        📋 <span class="gradient-text">Image Results</span>
+    </h3>
+    """, unsafe_allow_html=True)
+
+    progress = st.progress(
+        (len(file_ids) - len(pending)) / len(file_ids),
+        text=f"{len(file_ids) - len(pending)} of {len(file_ids)} images analyzed"
+    )
+    table = st.empty()
+
+    def show_table():
+        rows = [results[file_id] for file_id in file_ids if file_id in results]
+        table.dataframe(rows, column_config=RESULT_COLUMNS, use_container_width=True, hide_index=True)
+
+    show_table()
+
+    # Results stream in as each micro-batch finishes
+    offset = 0
+    busy = []
+    for batch_rows in analyze_files(pending, batch_size=BATCH_SIZE):
+        for uploaded_file, row in zip(pending[offset:offset + len(batch_rows)], batch_rows):
+            results[uploaded_file.file_id] = row
+            if row["status"] == BUSY_STATUS:
+                busy.append(uploaded_file.file_id)
+        offset += len(batch_rows)
+        done = len(file_ids) - len(pending) + offset
+        progress.progress(done / len(file_ids), text=f"{done} of {len(file_ids)} images analyzed")
+        show_table()
+
+    rows = [results[file_id] for file_id in file_ids]
+    summary = summarize_claim(rows)
+
+    # Photos turned away under load are analyzed again on the next rerun
+    for file_id in busy:
+        del results[file_id]
+    if busy:
+        st.warning(f"⏳ **The model is busy:** {len(busy)} image(s) were not analyzed. Press **Retry** to try them again.")
+        st.button("🔄 Retry")
+
+    create_gradient_divider()
+
+    # Per-claim summary
+    title = f"Claim Summary · {html.escape(claim_reference)}" if claim_reference else "Claim Summary"
+    st.markdown(f"""
+    <h3 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2rem;">
+        🧾 <span class="gradient-text">{title}</span>
+    </h3>
+    """, unsafe_allow_html=True)
+
+    if summary["analyzed"] == 0:
+        st.error("❌ **None of the uploaded images could be analyzed.** Check the status column above.")
+    else:
+        summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
+
+        with summary_col1:
+            st.metric(
+                "⚠️ Worst Severity",
+                summary["worst_severity"],
+                help="Most severe classification among the claim's photos"
+            )
+
+        with summary_col2:
+            st.metric(
+                "📷 Images Analyzed",
+                f"{summary['analyzed']} / {summary['images']}",
+                delta=f"-{summary['failed']} rejected" if summary["failed"] else None
+            )
+
+        with summary_col3:
+            st.metric(
+                "🎯 Mean Confidence",
+                f"{summary['mean_confidence']:.1f}%",
+                help=f"Standard deviation: {summary['confidence_stdev']:.1f} points"
+            )
+
+        with summary_col4:
+            st.metric(
+                "📏 Confidence Spread",
+                f"{summary['confidence_spread']:.1f} pts",
+                help=f"Lowest {summary['min_confidence']:.1f}% · highest {summary['max_confidence']:.1f}%"
+            )
+
+        count_cols = st.columns(len(summary["severity_counts"]))
+        for count_col, (severity, count) in zip(count_cols, summary["severity_counts"].items()):
+            with count_col:
+                st.markdown('<div class="glass-card" style="text-align: center;">', unsafe_allow_html=True)
+                st.markdown(f"**{severity}**")
+                st.markdown(f"<h2>{count}</h2>", unsafe_allow_html=True)
+                st.progress(count / summary["analyzed"])
+                st.markdown('</div>', unsafe_allow_html=True)
+
+        create_gradient_divider()
+
+        # Recommendations follow the worst photo of the claim
+        st.markdown("""
+        <h3 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2rem;">
+            💡 <span class="gradient-text">Recommended Actions</span>
+        </h3>
+        """, unsafe_allow_html=True)
+
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        for i, rec in enumerate(get_recommendations(summary["worst_severity"]), 1):
+            st.markdown(f"{i}. {rec}")
+        st.markdown('</div>', unsafe_allow_html=True)
+else:
+    st.session_state.pop(_RESULTS_KEY, None)
+    st.info("📤 Upload one or more photos to start the batch analysis.")
@@ -4,16 +4,16 @@ Technical specifications and performance details
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import json
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model import model_info, get_statistics, get_prediction_history, model_exists
+from model import model_exists, get_drift_report, iter_history, SEVERITY_CLASSES
+from caching import cached_model_info, cached_statistics, session_key
+from export import write_export, export_filename, export_mime
+import profiler
 from styles import inject_custom_css, create_hero_section, create_gradient_divider
 
 # Page Configuration
@@ -53,8 +53,154 @@ if is_fallback:
     </div>
     """, unsafe_allow_html=True)
 
-# Get model information
-info = model_info()
+# Get model information (static, cached for the process)
+info = cached_model_info()
+
+
+@st.cache_data(show_spinner=False)
+def build_performance_figure():
+    """Bar chart of the model's evaluation metrics."""
+    import plotly.graph_objects as go
+    info = cached_model_info()
+    
+    metrics = ['Accuracy', 'Precision', 'Recall', 'F1-Score']
+    values = [info['accuracy'], info['precision'], info['recall'], info['f1_score']]
+    colors = ['#8B5CF6', '#3B82F6', '#EC4899', '#F59E0B']
+
+    fig = go.Figure()
+
+    # Add bars
+    fig.add_trace(go.Bar(
+        x=metrics,
+        y=values,
+        marker=dict(
+            color=colors,
+            line=dict(color='rgba(255,255,255,0.3)', width=1)
+        ),
+        text=[f"{v:.1f}%" for v in values],
+        textposition='outside',
+        textfont=dict(size=14, color='white'),
+        hovertemplate='<b>%{x}</b><br>Score: %{y:.1f}%<extra></extra>'
+    ))
+
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(
+            title='Percentage (%)',
+            gridcolor='rgba(255,255,255,0.1)',
+            showgrid=True,
+            range=[0, 100]
+        ),
+        xaxis=dict(title=''),
+        height=400,
+        margin=dict(t=40, b=40, l=60, r=40)
+    )
+    
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def build_split_figure():
+    """Donut chart of the dataset split."""
+    import plotly.graph_objects as go
+    info = cached_model_info()
+    training_size = info['training_samples']
+    validation_size = info['validation_samples']
+    test_size = info['test_samples']
+    
+    labels = ['Training', 'Validation', 'Test']
+    sizes = [training_size, validation_size, test_size]
+    colors_pie = ['#4CAF50', '#FF9800', '#F44336']
+
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=sizes,
+        hole=0.4,
+        marker=dict(colors=colors_pie, line=dict(color='#1a1a1a', width=2)),
+        textfont=dict(size=14, color='white'),
+        hovertemplate='<b>%{label}</b><br>Count: %{value:,}<br>Percentage: %{percent}<extra></extra>'
+    )])
+
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        ),
+        height=400,
+        margin=dict(t=40, b=40, l=40, r=40)
+    )
+    
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_drift_figures(observed, reference_source):
+    """Live-vs-reference drift charts, rebuilt only after new observations."""
+    import plotly.graph_objects as go
+    drift = get_drift_report()
+    
+    class_mix_fig = go.Figure()
+    if drift['reference'] is not None:
+        class_mix_fig.add_trace(go.Bar(
+            x=SEVERITY_CLASSES,
+            y=[p * 100 for p in drift['reference']['class_mix']],
+            name='Reference',
+            marker=dict(color='rgba(255,255,255,0.35)')
+        ))
+    class_mix_fig.add_trace(go.Bar(
+        x=SEVERITY_CLASSES,
+        y=[p * 100 for p in drift['class_mix']],
+        name='Live',
+        marker=dict(color='#8B5CF6')
+    ))
+    class_mix_fig.update_layout(
+        barmode='group',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(title='Share (%)', gridcolor='rgba(255,255,255,0.1)', showgrid=True),
+        height=350,
+        margin=dict(t=40, b=40, l=60, r=40)
+    )
+    
+    bin_width = 100 / len(drift['confidence_histogram'])
+    bin_labels = [f"{i * bin_width:.0f}-{(i + 1) * bin_width:.0f}%" for i in range(len(drift['confidence_histogram']))]
+
+    confidence_fig = go.Figure()
+    if drift['reference'] is not None:
+        confidence_fig.add_trace(go.Bar(
+            x=bin_labels,
+            y=[p * 100 for p in drift['reference']['confidence_histogram']],
+            name='Reference',
+            marker=dict(color='rgba(255,255,255,0.35)')
+        ))
+    confidence_fig.add_trace(go.Bar(
+        x=bin_labels,
+        y=[p * 100 for p in drift['confidence_histogram']],
+        name='Live',
+        marker=dict(color='#EC4899')
+    ))
+    confidence_fig.update_layout(
+        barmode='group',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(title='Share (%)', gridcolor='rgba(255,255,255,0.1)', showgrid=True),
+        height=350,
+        margin=dict(t=40, b=40, l=60, r=40)
+    )
+    
+    return class_mix_fig, confidence_fig
+
 
 # Model Overview
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📋 Model Overview</h2>', unsafe_allow_html=True)
@@ -127,42 +273,7 @@ with metrics_col3:
 st.markdown('<div class="glass-card" style="margin-top: 2rem;">', unsafe_allow_html=True)
 st.markdown("<h3 style='text-align: center;'>Model Performance Comparison</h3>", unsafe_allow_html=True)
 
-metrics = ['Accuracy', 'Precision', 'Recall', 'F1-Score']
-values = [info['accuracy'], info['precision'], info['recall'], info['f1_score']]
-colors = ['#8B5CF6', '#3B82F6', '#EC4899', '#F59E0B']
-
-fig = go.Figure()
-
-# Add bars
-fig.add_trace(go.Bar(
-    x=metrics,
-    y=values,
-    marker=dict(
-        color=colors,
-        line=dict(color='rgba(255,255,255,0.3)', width=1)
-    ),
-    text=[f"{v:.1f}%" for v in values],
-    textposition='outside',
-    textfont=dict(size=14, color='white'),
-    hovertemplate='<b>%{x}</b><br>Score: %{y:.1f}%<extra></extra>'
-))
-
-fig.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white', size=12),
-    yaxis=dict(
-        title='Percentage (%)',
-        gridcolor='rgba(255,255,255,0.1)',
-        showgrid=True,
-        range=[0, 100]
-    ),
-    xaxis=dict(title=''),
-    height=400,
-    margin=dict(t=40, b=40, l=60, r=40)
-)
-
-st.plotly_chart(fig, use_container_width=True)
+st.plotly_chart(build_performance_figure(), use_container_width=True)
 st.markdown('</div>', unsafe_allow_html=True)
 
 create_gradient_divider()
@@ -183,7 +294,7 @@ with data_col1:
     st.metric("Total Samples", f"{total_size:,}")
     
     st.markdown("### **Sample Distribution**")
-    split_data = pd.DataFrame({
+    split_data = {
         'Data Split': ['🟢 Training', '🟡 Validation', '🔴 Test', '📊 Total'],
         'Samples': [f"{training_size:,}", f"{validation_size:,}", f"{test_size:,}", f"{total_size:,}"],
         'Percentage': [
@@ -192,7 +303,7 @@ with data_col1:
             f"{(test_size/total_size)*100:.1f}%",
             "100%"
         ]
-    })
+    }
     st.dataframe(split_data, use_container_width=True, hide_index=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -200,36 +311,7 @@ with data_col2:
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
     st.markdown("<h3 style='text-align: center;'>Dataset Split Distribution</h3>", unsafe_allow_html=True)
     
-    labels = ['Training', 'Validation', 'Test']
-    sizes = [training_size, validation_size, test_size]
-    colors_pie = ['#4CAF50', '#FF9800', '#F44336']
-    
-    fig = go.Figure(data=[go.Pie(
-        labels=labels,
-        values=sizes,
-        hole=0.4,
-        marker=dict(colors=colors_pie, line=dict(color='#1a1a1a', width=2)),
-        textfont=dict(size=14, color='white'),
-        hovertemplate='<b>%{label}</b><br>Count: %{value:,}<br>Percentage: %{percent}<extra></extra>'
-    )])
-    
-    fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white', size=12),
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.2,
-            xanchor="center",
-            x=0.5
-        ),
-        height=400,
-        margin=dict(t=40, b=40, l=40, r=40)
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(build_split_figure(), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 create_gradient_divider()
@@ -237,11 +319,11 @@ create_gradient_divider()
 # Classification Classes
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">🏷️ Classification Classes</h2>', unsafe_allow_html=True)
 
-classes_data = pd.DataFrame([
+classes_data = [
     {"Class": "🟢 Minor Damage", "ID": 0, "Description": "Scratches, dents, cosmetic damage", "Action": "Local repair"},
     {"Class": "🟡 Moderate Damage", "ID": 1, "Description": "Structural damage, airbag deployment possible", "Action": "Professional inspection"},
     {"Class": "🔴 Severe Crash", "ID": 2, "Description": "Major structural failure, potential total loss", "Action": "Emergency services"}
-])
+]
 
 st.markdown('<div class="glass-card">', unsafe_allow_html=True)
 st.dataframe(classes_data, use_container_width=True, hide_index=True)
@@ -249,6 +331,60 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 create_gradient_divider()
 
+# Prediction Drift
+st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📉 Prediction Drift</h2>', unsafe_allow_html=True)
+
+drift = get_drift_report()
+
+drift_col1, drift_col2, drift_col3, drift_col4 = st.columns(4)
+
+with drift_col1:
+    if drift['reference'] is None:
+        st.metric("🧭 Drift Status", "Calibrating",
+                  help=f"Building a baseline from the first {drift['window']} predictions "
+                       f"({drift['baseline_samples']} so far); add models/reference_distribution.json "
+                       "(python drift.py) to compare with a fixed reference")
+    elif not drift['ready']:
+        st.metric("🧭 Drift Status", "Warming up", help=f"Needs {drift['min_samples']} predictions in the window")
+    elif drift['drifting']:
+        st.metric("🧭 Drift Status", "⚠️ Drifting", help=f"PSI above {drift['psi_threshold']}")
+    else:
+        st.metric("🧭 Drift Status", "✅ Stable", help=f"PSI below {drift['psi_threshold']}")
+
+with drift_col2:
+    st.metric("🪟 Window", f"{drift['samples']} / {drift['window']}",
+              help=f"Recent predictions compared to the reference ({drift['reference_source'] or 'not set yet'})")
+
+with drift_col3:
+    st.metric("🏷️ Class Mix PSI", f"{drift['class_psi']:.3f}", help=f"KL divergence: {drift['class_kl']:.3f}")
+
+with drift_col4:
+    st.metric("🎯 Confidence PSI", f"{drift['confidence_psi']:.3f}", help=f"KL divergence: {drift['confidence_kl']:.3f}")
+
+if drift['samples']:
+    drift_chart_col1, drift_chart_col2 = st.columns(2)
+    class_mix_fig, confidence_fig = build_drift_figures(drift['observed'], drift['reference_source'])
+    
+    with drift_chart_col1:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: center;'>Class Mix: Live vs Reference</h3>", unsafe_allow_html=True)
+        
+        st.plotly_chart(class_mix_fig, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with drift_chart_col2:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: center;'>Confidence: Live vs Reference</h3>", unsafe_allow_html=True)
+        
+        st.plotly_chart(confidence_fig, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+elif drift['reference'] is None:
+    st.info(f"📉 Drift charts appear once this worker's baseline of {drift['window']} predictions is complete.")
+else:
+    st.info("📉 Drift monitoring starts with the first prediction of this worker.")
+
+create_gradient_divider()
+
 # Model Capabilities & Implementation
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">⚡ Capabilities & Implementation</h2>', unsafe_allow_html=True)
 
@@ -376,59 +512,50 @@ st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size:
 st.markdown("""
 <div style="text-align: center; margin-bottom: 1.5rem;">
     <p style="color: var(--text-secondary); font-size: 1.1rem;">
-        Download model metadata, statistics, and recent prediction history
+        Download model metadata, statistics, and the full prediction history
     </p>
 </div>
 """, unsafe_allow_html=True)
 
 # Gather data
-stats = get_statistics()
-prediction_history = get_prediction_history(limit=100)
-
-# Combine into dict
-export_data = {
-    "model_info": info,
-    "statistics": stats,
-    "prediction_history": [
-        {
-            "timestamp": p["timestamp"].isoformat(),
-            "severity": p["severity"],
-            "confidence": p["confidence"]
-        } for p in prediction_history
-    ]
-}
+session_id, session_version = session_key()
+session_stats = cached_statistics("session", session_id, session_version)
 
 export_col1, export_col2 = st.columns(2)
 
 with export_col1:
-    # JSON download
-    json_str = json.dumps(export_data, indent=2)
-    st.download_button(
-        label="📋 **Download Complete Data (JSON)**",
-        data=json_str,
-        file_name="model_export.json",
-        mime="application/json",
-        use_container_width=True
-    )
-
-with export_col2:
-    # CSV download (prediction history)
-    if prediction_history:
-        df = pd.DataFrame([
-            {
-                "timestamp": p["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
-                "severity": p["severity"],
-                "confidence": p["confidence"]
-            } for p in prediction_history
-        ])
-        csv_data = df.to_csv(index=False)
+    # JSON download (metadata, statistics and the session's full history, streamed)
+    if st.button("📋 **Export Complete Data (JSON)**", use_container_width=True):
+        with st.spinner("💾 Writing export..."):
+            json_export = write_export(
+                iter_history(scope="session", session_id=session_id, newest_first=False),
+                format="json",
+                metadata={"model_info": info, "statistics": session_stats}
+            )
         st.download_button(
-            label="📊 **Download Prediction History (CSV)**",
-            data=csv_data,
-            file_name="prediction_history.csv",
-            mime="text/csv",
+            label="💾 Click to Download JSON",
+            data=json_export,
+            file_name=export_filename("model_export", "json"),
+            mime=export_mime("json"),
             use_container_width=True
         )
+
+with export_col2:
+    # CSV download (prediction history)
+    if session_stats["total_predictions"]:
+        if st.button("📊 **Export Prediction History (CSV)**", use_container_width=True):
+            with st.spinner("💾 Writing export..."):
+                csv_export = write_export(
+                    iter_history(scope="session", session_id=session_id, newest_first=False),
+                    format="csv"
+                )
+            st.download_button(
+                label="💾 Click to Download CSV",
+                data=csv_export,
+                file_name=export_filename("prediction_history", "csv"),
+                mime=export_mime("csv"),
+                use_container_width=True
+            )
     else:
         st.button("📊 **No Prediction History Available**", disabled=True, use_container_width=True)
 
@@ -438,6 +565,76 @@ create_gradient_divider()
 with st.expander("🔍 **Advanced Technical Details (JSON)**"):
     st.json(info)
 
+
+def toggle_profiler():
+    """Start or stop sampling this server process to match the admin toggle."""
+    if st.session_state["profiler_on"]:
+        try:
+            profiler.start(st.session_state["profiler_seconds"], memory=st.session_state["profiler_memory"])
+        except RuntimeError as e:
+            st.session_state["profiler_error"] = str(e)
+    else:
+        profiler.stop()
+
+
+# The panel refreshes itself only while a run is in progress
+profiler_refreshing = profiler.status()["running"]
+
+
+@st.fragment(run_every=2 if profiler_refreshing else None)
+def profiler_panel():
+    """Profiler controls and the files of the last run, refreshed while a run is in progress."""
+    status = profiler.status()
+    if status["running"] != profiler_refreshing:
+        st.rerun()  # whole page, to switch the fragment's auto-refresh on or off
+    st.session_state["profiler_on"] = status["running"]
+
+    control_col1, control_col2, control_col3 = st.columns(3)
+    with control_col1:
+        st.toggle("🔬 **Profile this server process**", key="profiler_on", on_change=toggle_profiler)
+    with control_col2:
+        st.slider("Seconds", 5, profiler.MAX_SECONDS, 30, step=5, key="profiler_seconds",
+                  disabled=status["running"])
+    with control_col3:
+        st.checkbox("Track allocations (tracemalloc)", key="profiler_memory", disabled=status["running"],
+                    help="Records the top allocation sites; slows allocation-heavy code while it runs")
+
+    error = st.session_state.pop("profiler_error", None)
+    if error:
+        st.warning(f"⚠️ {error}")
+    if status["running"]:
+        st.progress(min(status["elapsed"] / status["seconds"], 1.0),
+                    text=f"Sampling process {status['pid']}: {status['samples']} samples")
+        return
+
+    result = status["result"]
+    if result is None:
+        st.caption(f"Samples every thread of process {status['pid']} and writes speedscope and collapsed-stack files.")
+        return
+    if "error" in result:
+        st.error(f"❌ Profiling failed: {result['error']}")
+        return
+
+    st.success(f"✅ {result['samples']} samples over {result['seconds']}s from {result['threads']} threads")
+    with open(result["files"]["speedscope"], "rb") as f:
+        st.download_button("💾 Download speedscope profile", f.read(),
+                           file_name=os.path.basename(result["files"]["speedscope"]),
+                           mime="application/json")
+    st.caption(f"Files: {', '.join(result['files'].values())}")
+    if result["top_allocations"]:
+        st.markdown("**Top allocation sites**")
+        st.dataframe(result["top_allocations"], use_container_width=True, hide_index=True)
+
+
+# Admin: on-demand profiler (only with ACCIDENT_ADMIN_TOKEN set)
+if profiler.admin_token():
+    with st.expander("🛠️ **Admin: Runtime Profiler**"):
+        token = st.text_input("Admin token", type="password", key="profiler_token")
+        if profiler.is_admin(token):
+            profiler_panel()
+        elif token:
+            st.error("❌ Invalid admin token")
+
 # Footer
 st.markdown(f"""
 <div style="text-align: center; padding: 1.5rem; color: var(--text-secondary);">
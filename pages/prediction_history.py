@@ -4,17 +4,23 @@ Real-time analytics and performance metrics
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime
+from datetime import datetime, time, timedelta
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model import get_prediction_history, get_statistics
+from model import (
+    SEVERITY_CLASSES, query_history_frame, iter_history, history_persisted, get_model_versions,
+    get_history_frame
+)
+from caching import (
+    history_version, session_key, cached_statistics, cached_history_frame, measured_kpis, format_seconds
+)
+from metrics import latency_summary, resident_memory, uptime
+import profiler
+from export import write_export, export_filename, export_mime, parquet_available
 from styles import inject_custom_css, create_hero_section, create_gradient_divider
 
 # Page Configuration
@@ -33,178 +39,464 @@ create_hero_section(
     "Real-time prediction analytics and comprehensive performance metrics"
 )
 
-# Get data from model
-predictions = get_prediction_history(limit=100)
-stats = get_statistics()
+# Rows per page options for the history table
+HISTORY_PAGE_SIZES = [100, 1000, 10000, 50000]
 
-# Key Metrics Section
-st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📈 Key Performance Indicators</h2>', unsafe_allow_html=True)
+# Short severity labels for the table, indexed by class id
+SEVERITY_DISPLAY = ["🟢 Minor", "🟡 Moderate", "🔴 Severe"]
 
-metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+# Download formats for the history table (Parquet needs pyarrow)
+EXPORT_CHOICES = ["csv", "ndjson", "json"] + (["parquet"] if parquet_available() else [])
 
-with metric_col1:
-    st.metric(
-        label="🎯 Total Predictions",
-        value=f"{stats['total_predictions']}",
-        delta="+89 this week",
-        help="Total number of predictions made by the system"
-    )
+# Seconds between live refreshes of the KPI, distribution and trend sections
+# (ACCIDENT_DASHBOARD_REFRESH, 0 disables auto-refresh)
+LIVE_REFRESH_SECONDS = float(os.environ.get("ACCIDENT_DASHBOARD_REFRESH", "5"))
 
-with metric_col2:
-    st.metric(
-        label="🎲 Avg Confidence",
-        value=f"{stats['average_confidence']:.1f}%",
-        delta="+2.3%",
-        help="Average confidence score across all predictions"
-    )
+# Points up to which the confidence trend chart draws individual markers
+TREND_MARKER_LIMIT = 50
 
-with metric_col3:
-    st.metric(
-        label="⚡ Processing Speed",
-        value="1.8s",
-        delta="-0.3s",
-        help="Average time per prediction"
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_distribution_figures(version):
+    """Pie and bar charts of the global severity distribution for a history version."""
+    distribution = cached_statistics("global", None, version)['severity_distribution']
+    severity_labels = list(distribution.keys())
+    severity_values = list(distribution.values())
+    if sum(severity_values) == 0:
+        return None, None
+    
+    import plotly.graph_objects as go
+    
+    # Create modern pie chart with Plotly
+    colors = ['#4CAF50', '#FF9800', '#F44336']
+    pie_fig = go.Figure(data=[go.Pie(
+        labels=severity_labels,
+        values=severity_values,
+        hole=0.4,
+        marker=dict(colors=colors, line=dict(color='#1a1a1a', width=2)),
+        textfont=dict(size=14, color='white'),
+        hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
+    )])
+    
+    pie_fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        ),
+        height=400,
+        margin=dict(t=40, b=40, l=40, r=40)
     )
+    
+    # Create modern bar chart with Plotly
+    colors_map = {
+        '🟢 Minor Damage': '#4CAF50',
+        '🟡 Moderate Damage': '#FF9800',
+        '🔴 Severe Crash': '#F44336'
+    }
+    
+    bar_fig = go.Figure(data=[go.Bar(
+        x=severity_labels,
+        y=severity_values,
+        marker=dict(
+            color=[colors_map.get(label, '#8B5CF6') for label in severity_labels],
+            line=dict(color='rgba(255,255,255,0.3)', width=1)
+        ),
+        text=severity_values,
+        textposition='outside',
+        textfont=dict(size=14, color='white'),
+        hovertemplate='<b>%{x}</b><br>Count: %{y}<extra></extra>'
+    )])
+    
+    bar_fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(
+            title='Number of Predictions',
+            gridcolor='rgba(255,255,255,0.1)',
+            showgrid=True
+        ),
+        xaxis=dict(title=''),
+        height=400,
+        margin=dict(t=40, b=40, l=60, r=40)
+    )
+    
+    return pie_fig, bar_fig
 
-with metric_col4:
-    st.metric(
-        label="🎯 Model Accuracy",
-        value="94.2%",
-        delta="+2.1%",
-        help="Model accuracy on test dataset"
+
+def make_trend_figures(history_df):
+    """Confidence trend (LTTB-downsampled) and class count charts for a session's full history."""
+    import numpy as np
+    import plotly.graph_objects as go
+    from downsampling import lttb_indices, DEFAULT_CHART_POINTS
+    
+    # A fixed number of points goes to the browser however long the history is
+    keep = lttb_indices(history_df['confidence'].to_numpy(), DEFAULT_CHART_POINTS)
+    sampled_df = history_df.iloc[keep]
+    confidence_values = sampled_df['confidence'].to_numpy()
+    time_labels = sampled_df['timestamp'].dt.strftime("%H:%M").to_numpy()
+    
+    trend_fig = go.Figure()
+    
+    # Add confidence line (markers only while individual points are readable)
+    trend_fig.add_trace(go.Scatter(
+        x=keep,
+        y=confidence_values,
+        mode='lines+markers' if len(keep) <= TREND_MARKER_LIMIT else 'lines',
+        name='Confidence',
+        line=dict(color='#8B5CF6', width=3 if len(keep) <= TREND_MARKER_LIMIT else 1.5),
+        marker=dict(size=8, color='#8B5CF6', line=dict(width=2, color='white')),
+        hovertemplate='<b>Time: %{text}</b><br>Confidence: %{y:.1f}%<extra></extra>',
+        text=time_labels
+    ))
+    
+    # Add threshold line
+    trend_fig.add_hline(y=80, line_dash="dash", line_color="rgba(255,255,255,0.3)", 
+                        annotation_text="80% Threshold", annotation_position="right")
+    
+    trend_fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(
+            title='Confidence (%)',
+            gridcolor='rgba(255,255,255,0.1)',
+            showgrid=True,
+            range=[0, 100]
+        ),
+        xaxis=dict(
+            title='Prediction Sequence',
+            gridcolor='rgba(255,255,255,0.05)',
+            showgrid=True
+        ),
+        height=400,
+        margin=dict(t=40, b=40, l=60, r=40),
+        showlegend=False
+    )
+    
+    classes = SEVERITY_DISPLAY
+    counts = np.bincount(history_df['class_id'].to_numpy(), minlength=len(SEVERITY_DISPLAY)).tolist()
+    colors = ['#4CAF50', '#FF9800', '#F44336']
+    
+    count_fig = go.Figure(data=[go.Bar(
+        x=classes,
+        y=counts,
+        marker=dict(
+            color=colors,
+            line=dict(color='rgba(255,255,255,0.3)', width=1)
+        ),
+        text=counts,
+        textposition='outside',
+        textfont=dict(size=16, color='white', family='Poppins'),
+        hovertemplate='<b>%{x}</b><br>Total: %{y}<extra></extra>'
+    )])
+    
+    count_fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white', size=12),
+        yaxis=dict(
+            title='Total Count',
+            gridcolor='rgba(255,255,255,0.1)',
+            showgrid=True
+        ),
+        xaxis=dict(title=''),
+        height=400,
+        margin=dict(t=40, b=40, l=60, r=40)
+    )
+    
+    return trend_fig, count_fig
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_history_page(scope, session_id, version, cursor, page_size, filters):
+    """One page of the history table as a display DataFrame, plus the next cursor."""
+    import pandas as pd
+    frame, next_cursor = query_history_frame(
+        cursor=cursor,
+        limit=page_size,
+        scope=scope,
+        session_id=session_id,
+        **dict(filters)
     )
+    
+    # Vectorized formatting: no per-row Python
+    display_df = pd.DataFrame({
+        "🕐 Time": frame['timestamp'].dt.strftime("%H:%M:%S"),
+        "📅 Date": frame['timestamp'].dt.strftime("%Y-%m-%d"),
+        "⚠️ Severity": pd.Categorical.from_codes(frame['class_id'], categories=SEVERITY_DISPLAY),
+        "🎯 Confidence": frame['confidence'].round(1).astype(str) + "%"
+    })
+    return display_df, next_cursor
+
+
+def update_live_trends(session_id):
+    """
+    Bring the trend window in session state up to the session's history version
+
+    Only the records added since the last version seen are fetched and
+    appended; the charts are rebuilt (from a downsampled series) only when
+    something changed.
+
+    Returns:
+        dict: version, frame (the session's full history) and figures
+    """
+    import pandas as pd
+
+    version = history_version("session", session_id)
+    state = st.session_state.get("live_trends")
+
+    if state is None or state["session_id"] != session_id or version < state["version"]:
+        frame = get_history_frame(session_id=session_id)
+    elif version > state["version"]:
+        delta = get_history_frame(session_id=session_id, since=state["version"])
+        frame = pd.concat([state["frame"], delta], ignore_index=True)
+    else:
+        return state
+
+    state = {
+        "session_id": session_id,
+        "version": version,
+        "frame": frame,
+        "figures": make_trend_figures(frame) if len(frame) > 5 else None,
+    }
+    st.session_state["live_trends"] = state
+    return state
+
+
+# Live updates switch for wall-screen use; turning it off stops the timers
+live_updates = st.sidebar.toggle(
+    "🔴 Live updates",
+    value=LIVE_REFRESH_SECONDS > 0,
+    disabled=LIVE_REFRESH_SECONDS <= 0,
+    help=f"Refresh metrics and trends every {LIVE_REFRESH_SECONDS:g}s without reloading the page"
+)
+refresh_interval = LIVE_REFRESH_SECONDS if live_updates and LIVE_REFRESH_SECONDS > 0 else None
+
+# Get data from model (this session's history, plus totals shared by all workers);
+# cached results are reused until a new prediction bumps the history version
+session_id, session_version = session_key()
+history_df = cached_history_frame(session_id, session_version)
+
+# Key Metrics Section
+st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📈 Key Performance Indicators</h2>', unsafe_allow_html=True)
+
+@st.fragment(run_every=refresh_interval)
+def live_kpis():
+    """KPI cards, re-read from the cached global statistics and live metrics on every refresh."""
+    global_stats = cached_statistics("global", None, history_version("global"))
+    kpis = measured_kpis()
+    week = kpis["week_predictions"]
+
+    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+
+    with metric_col1:
+        st.metric(
+            label="🎯 Total Predictions",
+            value=f"{global_stats['total_predictions']}",
+            delta=f"+{week} this week" if week is not None else None,
+            help="Total number of predictions made by the system across all sessions"
+        )
+
+    with metric_col2:
+        st.metric(
+            label="🎲 Avg Confidence",
+            value=f"{global_stats['average_confidence']:.1f}%",
+            help="Average confidence score across all predictions"
+        )
+
+    with metric_col3:
+        st.metric(
+            label="⚡ Processing Speed",
+            value=format_seconds(kpis["latency"]["mean"]),
+            delta=f"p95 {format_seconds(kpis['latency']['p95'])}" if kpis["latency"]["count"] else None,
+            delta_color="off",
+            help="Average time from upload to result, measured by this server process"
+        )
+
+    with metric_col4:
+        st.metric(
+            label="🎯 Model Accuracy",
+            value="94.2%",
+            help="Accuracy reported for the model on its test dataset (not measured live)"
+        )
+
+
+live_kpis()
 
 create_gradient_divider()
 
 # Severity Distribution Section
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📊 Severity Distribution Analysis</h2>', unsafe_allow_html=True)
 
-severity_col1, severity_col2 = st.columns(2)
+@st.fragment(run_every=refresh_interval)
+def live_distribution():
+    """Distribution charts, rebuilt only when the global history version changes."""
+    severity_col1, severity_col2 = st.columns(2)
 
-severity_labels = list(stats['severity_distribution'].keys())
-severity_values = list(stats['severity_distribution'].values())
+    pie_fig, bar_fig = build_distribution_figures(history_version("global"))
 
-with severity_col1:
-    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-    st.markdown("<h3 style='text-align: center;'>Distribution by Percentage</h3>", unsafe_allow_html=True)
-    
-    if sum(severity_values) > 0:
-        # Create modern pie chart with Plotly
-        colors = ['#4CAF50', '#FF9800', '#F44336']
-        fig = go.Figure(data=[go.Pie(
-            labels=severity_labels,
-            values=severity_values,
-            hole=0.4,
-            marker=dict(colors=colors, line=dict(color='#1a1a1a', width=2)),
-            textfont=dict(size=14, color='white'),
-            hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
-        )])
-        
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.2,
-                xanchor="center",
-                x=0.5
-            ),
-            height=400,
-            margin=dict(t=40, b=40, l=40, r=40)
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("📊 No prediction data available yet. Upload images to see analytics!")
+    with severity_col1:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: center;'>Distribution by Percentage</h3>", unsafe_allow_html=True)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+        if pie_fig is not None:
+            st.plotly_chart(pie_fig, use_container_width=True)
+        else:
+            st.info("📊 No prediction data available yet. Upload images to see analytics!")
+    
+        st.markdown('</div>', unsafe_allow_html=True)
 
-with severity_col2:
-    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-    st.markdown("<h3 style='text-align: center;'>Distribution by Count</h3>", unsafe_allow_html=True)
-    
-    if sum(severity_values) > 0:
-        # Create modern bar chart with Plotly
-        colors_map = {
-            '🟢 Minor Damage': '#4CAF50',
-            '🟡 Moderate Damage': '#FF9800',
-            '🔴 Severe Crash': '#F44336'
-        }
-        
-        fig = go.Figure(data=[go.Bar(
-            x=severity_labels,
-            y=severity_values,
-            marker=dict(
-                color=[colors_map.get(label, '#8B5CF6') for label in severity_labels],
-                line=dict(color='rgba(255,255,255,0.3)', width=1)
-            ),
-            text=severity_values,
-            textposition='outside',
-            textfont=dict(size=14, color='white'),
-            hovertemplate='<b>%{x}</b><br>Count: %{y}<extra></extra>'
-        )])
-        
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            yaxis=dict(
-                title='Number of Predictions',
-                gridcolor='rgba(255,255,255,0.1)',
-                showgrid=True
-            ),
-            xaxis=dict(title=''),
-            height=400,
-            margin=dict(t=40, b=40, l=60, r=40)
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("📊 Generate predictions to see bar chart analytics!")
+    with severity_col2:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: center;'>Distribution by Count</h3>", unsafe_allow_html=True)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+        if bar_fig is not None:
+            st.plotly_chart(bar_fig, use_container_width=True)
+        else:
+            st.info("📊 Generate predictions to see bar chart analytics!")
+    
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+live_distribution()
 
 create_gradient_divider()
 
 # Recent Predictions Table
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📋 Recent Predictions History</h2>', unsafe_allow_html=True)
 
-if predictions:
+# Other sessions' predictions are only shown to (and exported for) admins (ACCIDENT_ADMIN_TOKEN)
+is_admin = False
+if history_persisted() and profiler.admin_token():
+    with st.expander("🛠️ **Admin: All Sessions**"):
+        admin_token = st.text_input("Admin token", type="password", key="history_admin_token")
+        is_admin = profiler.is_admin(admin_token)
+        if admin_token and not is_admin:
+            st.error("❌ Invalid admin token")
+
+if not history_df.empty or history_persisted():
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
     
-    df_data = []
-    for pred in predictions[-20:]:
-        # Add emoji indicators
-        if "Minor" in pred['severity']:
-            severity_display = "🟢 Minor"
-        elif "Moderate" in pred['severity']:
-            severity_display = "🟡 Moderate"
-        else:
-            severity_display = "🔴 Severe"
-        
-        df_data.append({
-            "🕐 Time": pred['timestamp'].strftime("%H:%M:%S"),
-            "📅 Date": pred['timestamp'].strftime("%Y-%m-%d"),
-            "⚠️ Severity": severity_display,
-            "🎯 Confidence": f"{pred['confidence']:.1f}%"
-        })
-    
-    df = pd.DataFrame(df_data)
-    st.dataframe(df, use_container_width=True, height=400)
-    
-    if st.button("📥 **Export Recent Predictions to CSV**", use_container_width=False):
-        csv_data = df.to_csv(index=False)
-        st.download_button(
-            label="💾 Click to Download CSV",
-            data=csv_data,
-            file_name=f"predictions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv",
-            use_container_width=False
+    # Query filters
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    
+    with filter_col1:
+        date_range = st.date_input("📅 Date Range", value=(), help="Leave empty to include all dates")
+    
+    with filter_col2:
+        severity_filter = st.multiselect(
+            "⚠️ Severity",
+            options=list(range(len(SEVERITY_CLASSES))),
+            default=list(range(len(SEVERITY_CLASSES))),
+            format_func=lambda class_id: SEVERITY_CLASSES[class_id]
         )
     
+    with filter_col3:
+        confidence_band = st.slider("🎯 Confidence Band (%)", 0.0, 100.0, (0.0, 100.0), step=0.5)
+    
+    with filter_col4:
+        version_filter = st.selectbox("🏷️ Model Version", ["All versions"] + get_model_versions())
+        page_size = st.selectbox("📄 Rows per Page", HISTORY_PAGE_SIZES, index=1)
+        all_sessions = is_admin and st.toggle("🌐 All sessions", help="Include predictions from every session")
+    
+    history_filters = {
+        "start": datetime.combine(date_range[0], time.min) if len(date_range) == 2 else None,
+        "end": datetime.combine(date_range[1] + timedelta(days=1), time.min) if len(date_range) == 2 else None,
+        "class_ids": tuple(severity_filter),
+        "min_confidence": confidence_band[0] if confidence_band[0] > 0 else None,
+        "max_confidence": confidence_band[1] if confidence_band[1] < 100 else None,
+        "model_version": None if version_filter == "All versions" else version_filter,
+    }
+    history_scope = "global" if all_sessions else "session"
+    
+    # Restart pagination whenever the filters change
+    filter_key = (history_scope, page_size, tuple(history_filters.items()))
+    if st.session_state.get("history_filter_key") != filter_key:
+        st.session_state.history_filter_key = filter_key
+        st.session_state.history_cursors = [None]
+    
+    table_version = history_version(history_scope, session_id)
+    df, next_cursor = build_history_page(
+        history_scope,
+        session_id,
+        table_version,
+        st.session_state.history_cursors[-1],
+        page_size,
+        tuple(history_filters.items())
+    )
+    
+    if not df.empty:
+        st.dataframe(df, use_container_width=True, height=400)
+    else:
+        st.info("🔍 No predictions match the selected filters.")
+    
+    # Cursor pagination
+    def _next_history_page(cursor):
+        st.session_state.history_cursors.append(cursor)
+    
+    def _previous_history_page():
+        st.session_state.history_cursors.pop()
+    
+    page_col1, page_col2, page_col3 = st.columns([1, 2, 1])
+    with page_col1:
+        st.button(
+            "⬅️ Newer",
+            disabled=len(st.session_state.history_cursors) == 1,
+            on_click=_previous_history_page,
+            use_container_width=True
+        )
+    with page_col2:
+        st.caption(f"Page {len(st.session_state.history_cursors)} · {page_size:,} predictions per page")
+    with page_col3:
+        st.button(
+            "Older ➡️",
+            disabled=next_cursor is None,
+            on_click=_next_history_page,
+            args=(next_cursor,),
+            use_container_width=True
+        )
+    
+    export_format_col, export_compress_col, export_button_col = st.columns([1, 1, 2])
+    with export_format_col:
+        export_format = st.selectbox(
+            "📄 Export format",
+            EXPORT_CHOICES,
+            format_func=str.upper,
+            key="history_export_format"
+        )
+    with export_compress_col:
+        export_compress = st.checkbox(
+            "🗜️ Gzip",
+            disabled=export_format == "parquet",
+            key="history_export_gzip"
+        )
+    with export_button_col:
+        if st.button("📥 **Export Filtered Predictions**", use_container_width=False):
+            # Stream every matching record, page by page, into a temp file
+            with st.spinner("💾 Writing export..."):
+                export_file = write_export(
+                    iter_history(scope=history_scope, newest_first=False, **history_filters),
+                    format=export_format,
+                    compress=export_compress
+                )
+            st.download_button(
+                label="💾 Click to Download",
+                data=export_file,
+                file_name=export_filename(
+                    f"predictions_{datetime.now().strftime('%Y%m%d_%H%M%S')}", export_format, export_compress
+                ),
+                mime=export_mime(export_format, export_compress),
+                use_container_width=False
+            )
+    
     st.markdown('</div>', unsafe_allow_html=True)
 else:
     st.markdown("""
@@ -222,137 +514,72 @@ create_gradient_divider()
 # Performance Trends
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📈 Performance Trends</h2>', unsafe_allow_html=True)
 
-if len(predictions) > 5:
-    trend_col1, trend_col2 = st.columns(2)
+@st.fragment(run_every=refresh_interval)
+def live_trends():
+    """Trend charts for this session, updated with only the newly added records."""
+    trends = update_live_trends(session_id)
+
+    if trends["figures"] is not None:
+        trend_col1, trend_col2 = st.columns(2)
+        trend_fig, count_fig = trends["figures"]
     
-    with trend_col1:
-        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        st.markdown("<h3 style='text-align: center;'>Confidence Score Trend</h3>", unsafe_allow_html=True)
-        
-        recent_preds = predictions[-20:]
-        confidence_values = [p['confidence'] for p in recent_preds]
-        time_labels = [p['timestamp'].strftime("%H:%M") for p in recent_preds]
-        
-        fig = go.Figure()
-        
-        # Add confidence line
-        fig.add_trace(go.Scatter(
-            x=list(range(len(confidence_values))),
-            y=confidence_values,
-            mode='lines+markers',
-            name='Confidence',
-            line=dict(color='#8B5CF6', width=3),
-            marker=dict(size=8, color='#8B5CF6', line=dict(width=2, color='white')),
-            hovertemplate='<b>Time: %{text}</b><br>Confidence: %{y:.1f}%<extra></extra>',
-            text=time_labels
-        ))
-        
-        # Add threshold line
-        fig.add_hline(y=80, line_dash="dash", line_color="rgba(255,255,255,0.3)", 
-                      annotation_text="80% Threshold", annotation_position="right")
-        
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            yaxis=dict(
-                title='Confidence (%)',
-                gridcolor='rgba(255,255,255,0.1)',
-                showgrid=True,
-                range=[0, 100]
-            ),
-            xaxis=dict(
-                title='Prediction Sequence',
-                gridcolor='rgba(255,255,255,0.05)',
-                showgrid=True
-            ),
-            height=400,
-            margin=dict(t=40, b=40, l=60, r=40),
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        with trend_col1:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.markdown("<h3 style='text-align: center;'>Confidence Score Trend</h3>", unsafe_allow_html=True)
+            st.plotly_chart(trend_fig, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
     
-    with trend_col2:
-        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        st.markdown("<h3 style='text-align: center;'>Overall Distribution</h3>", unsafe_allow_html=True)
-        
-        min_count = sum(1 for p in predictions if "Minor" in p['severity'])
-        mod_count = sum(1 for p in predictions if "Moderate" in p['severity'])
-        sev_count = sum(1 for p in predictions if "Severe" in p['severity'])
-        
-        classes = ['🟢 Minor', '🟡 Moderate', '🔴 Severe']
-        counts = [min_count, mod_count, sev_count]
-        colors = ['#4CAF50', '#FF9800', '#F44336']
-        
-        fig = go.Figure(data=[go.Bar(
-            x=classes,
-            y=counts,
-            marker=dict(
-                color=colors,
-                line=dict(color='rgba(255,255,255,0.3)', width=1)
-            ),
-            text=counts,
-            textposition='outside',
-            textfont=dict(size=16, color='white', family='Poppins'),
-            hovertemplate='<b>%{x}</b><br>Total: %{y}<extra></extra>'
-        )])
-        
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            yaxis=dict(
-                title='Total Count',
-                gridcolor='rgba(255,255,255,0.1)',
-                showgrid=True
-            ),
-            xaxis=dict(title=''),
-            height=400,
-            margin=dict(t=40, b=40, l=60, r=40)
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-else:
-    st.markdown("""
-    <div class="glass-card" style="text-align: center; padding: 2rem;">
-        <p style="color: var(--text-secondary); font-size: 1.1rem;">
-            📊 Not enough data for trend analysis. Make more predictions to see performance trends.
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+        with trend_col2:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.markdown("<h3 style='text-align: center;'>Overall Distribution</h3>", unsafe_allow_html=True)
+            st.plotly_chart(count_fig, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div class="glass-card" style="text-align: center; padding: 2rem;">
+            <p style="color: var(--text-secondary); font-size: 1.1rem;">
+                📊 Not enough data for trend analysis. Make more predictions to see performance trends.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+live_trends()
 
 create_gradient_divider()
 
 # System Health
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">🔧 System Health Monitor</h2>', unsafe_allow_html=True)
 
+model_latency = latency_summary("predict")
+rss = resident_memory()
+hours, seconds = divmod(int(uptime()), 3600)
+
 health_col1, health_col2, health_col3 = st.columns(3)
 
 with health_col1:
     st.metric(
         label="🟢 API Status",
         value="Operational",
-        delta="100% Uptime",
-        help="System API operational status"
+        delta=f"Up {hours}h {seconds // 60}m",
+        delta_color="off",
+        help="This server process is serving; time since it started"
     )
 
 with health_col2:
     st.metric(
         label="💾 Memory Usage",
-        value="~250MB",
-        delta="Stable",
-        help="Current system memory usage"
+        value=f"{rss / 1024 ** 2:.0f}MB" if rss is not None else "—",
+        help="Resident memory of this server process"
     )
 
 with health_col3:
     st.metric(
         label="⚡ Response Time",
-        value="1.8s",
-        delta="-0.2s",
-        help="Average API response time"
+        value=format_seconds(model_latency["mean"]),
+        delta=f"p95 {format_seconds(model_latency['p95'])}" if model_latency["count"] else None,
+        delta_color="off",
+        help="Average model response time (queue wait plus inference) in this server process"
     )
 
 create_gradient_divider()
@@ -360,35 +587,35 @@ create_gradient_divider()
 # Detailed Statistics
 st.markdown('<h2 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2.5rem;">📊 Detailed Statistical Analysis</h2>', unsafe_allow_html=True)
 
-if predictions:
-    confidence_scores = [p['confidence'] for p in predictions]
+if not history_df.empty:
+    confidence_scores = history_df['confidence'].to_numpy()
     
     stat_col1, stat_col2, stat_col3 = st.columns(3)
     
     with stat_col1:
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
         st.markdown("### **📊 Confidence Statistics**")
-        st.markdown(f"**🔝 Highest:** `{max(confidence_scores):.1f}%`")
-        st.markdown(f"**📉 Lowest:** `{min(confidence_scores):.1f}%`")
-        st.markdown(f"**📏 Range:** `{max(confidence_scores) - min(confidence_scores):.1f}%`")
-        st.markdown(f"**📊 Average:** `{sum(confidence_scores)/len(confidence_scores):.1f}%`")
+        st.markdown(f"**🔝 Highest:** `{confidence_scores.max():.1f}%`")
+        st.markdown(f"**📉 Lowest:** `{confidence_scores.min():.1f}%`")
+        st.markdown(f"**📏 Range:** `{confidence_scores.max() - confidence_scores.min():.1f}%`")
+        st.markdown(f"**📊 Average:** `{confidence_scores.mean():.1f}%`")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with stat_col2:
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        severe_predictions = sum(1 for p in predictions if "Severe" in p['severity'])
-        severe_percentage = (severe_predictions / len(predictions)) * 100 if predictions else 0
+        severe_predictions = int((history_df['class_id'] == 2).sum())
+        severe_percentage = (severe_predictions / len(history_df)) * 100
         st.markdown("### **🔴 Severe Cases**")
         st.markdown(f"**🔢 Count:** `{severe_predictions}`")
         st.markdown(f"**📊 Percentage:** `{severe_percentage:.1f}%`")
         st.markdown(f"**📈 Rate:** `{'⚠️ High' if severe_percentage > 30 else '✓ Normal'}`")
-        st.markdown(f"**📉 Total:** `{len(predictions)} predictions`")
+        st.markdown(f"**📉 Total:** `{len(history_df)} predictions`")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with stat_col3:
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        avg_conf = sum(confidence_scores) / len(confidence_scores)
-        reliable_predictions = sum(1 for c in confidence_scores if c >= 80) / len(confidence_scores) * 100
+        avg_conf = confidence_scores.mean()
+        reliable_predictions = (confidence_scores >= 80).mean() * 100
         st.markdown("### **🎯 Reliability Metrics**")
         st.markdown(f"**📊 Avg Confidence:** `{avg_conf:.1f}%`")
         st.markdown(f"**✅ ≥80% Conf:** `{reliable_predictions:.1f}%`")
@@ -416,8 +643,21 @@ with export_col1:
         st.info("📄 Full analytics report generation coming soon! This will include comprehensive charts, statistics, and insights.")
 
 with export_col2:
-    if st.button("📋 **Export Raw Data (JSON)**", use_container_width=True):
-        st.info("💾 Raw data export feature coming soon! Download all predictions in JSON format.")
+    if st.button("📋 **Export Raw Data (NDJSON)**", use_container_width=True):
+        # This session's full history; every session only for admins (see above)
+        with st.spinner("💾 Writing export..."):
+            raw_export = write_export(
+                iter_history(scope="global" if is_admin else "session", newest_first=False),
+                format="ndjson",
+                compress=True
+            )
+        st.download_button(
+            label="💾 Click to Download",
+            data=raw_export,
+            file_name=export_filename(f"predictions_{datetime.now().strftime('%Y%m%d_%H%M%S')}", "ndjson", True),
+            mime=export_mime("ndjson", True),
+            use_container_width=True
+        )
 
 create_gradient_divider()
 
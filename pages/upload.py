@@ -4,16 +4,17 @@ Streamlit page for uploading and analyzing accident images
 """
 
 import streamlit as st
-from PIL import Image
-import numpy as np
 import sys
 import os
+from concurrent.futures import as_completed
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model import predict_severity, get_detailed_analysis, get_recommendations
-from utils import preprocess_image, validate_image, get_image_metadata
+from model import get_recommendations
+from analysis_cache import analyze_upload, start_extras
+from history import current_session_id
+from caching import use_cached_model
 from styles import inject_custom_css, create_hero_section, create_gradient_divider
 
 # Page Configuration
@@ -26,6 +27,9 @@ st.set_page_config(
 # Inject Custom Styling
 inject_custom_css()
 
+# Share one cached model manager across sessions
+use_cached_model()
+
 # Hero Section
 create_hero_section(
     "📤 Upload & Analysis",
@@ -51,11 +55,11 @@ uploaded_file = st.file_uploader(
 )
 
 if uploaded_file is not None:
-    # Load image
-    image = Image.open(uploaded_file)
-    
-    # Validate image
-    is_valid, message = validate_image(image)
+    # Decode, validate and classify once per upload; reruns reuse the result
+    with st.spinner("🔄 Analyzing image with AI..."):
+        analysis = analyze_upload(uploaded_file, extras=True)
+    image = analysis["image"]
+    is_valid, message = analysis["is_valid"], analysis["message"]
     
     if not is_valid:
         st.error(f"❌ **Image Validation Failed:** {message}")
@@ -77,7 +81,7 @@ if uploaded_file is not None:
             
             # Show image metadata in expander
             with st.expander("📊 **Image Details & Metadata**"):
-                metadata = get_image_metadata(image)
+                metadata = analysis["metadata"]
                 
                 meta_col1, meta_col2 = st.columns(2)
                 with meta_col1:
@@ -96,16 +100,10 @@ if uploaded_file is not None:
             </h3>
             """, unsafe_allow_html=True)
             
-            # Processing indicator with custom styling
-            with st.spinner("🔄 Analyzing image with AI..."):
-                # Preprocess image
-                processed_img = preprocess_image(image)
-                
-                # Get prediction
-                severity_class, confidence = predict_severity(processed_img)
-                
-                # Get detailed analysis
-                details = get_detailed_analysis(severity_class)
+            # Results computed once per upload by analyze_upload()
+            severity_class = analysis["severity_class"]
+            confidence = analysis["confidence"]
+            details = analysis["details"]
             
             # Display results in glass card
             st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -121,6 +119,9 @@ if uploaded_file is not None:
                 st.error(f"**Severity Classification:** {severity_class}")
                 severity_color = "hsl(0, 80%, 60%)"
             
+            if analysis["degraded"]:
+                st.info("⚡ **Fast estimate:** the model was under heavy load, so this result comes from the degraded fallback path. Re-upload later for a full analysis.")
+            
             st.markdown('</div>', unsafe_allow_html=True)
             
             # Confidence score with glowing progress bar
@@ -265,6 +266,38 @@ if uploaded_file is not None:
         
         create_gradient_divider()
         
+        # Additional Analysis: slower extras run in the background and fill
+        # these placeholders once everything above has been drawn
+        st.markdown("""
+        <h3 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2rem;">
+            🔬 <span class="gradient-text">Additional Analysis</span>
+        </h3>
+        """, unsafe_allow_html=True)
+        
+        extras = start_extras(analysis, current_session_id())
+        
+        extra_col1, extra_col2 = st.columns(2, gap="large")
+        
+        with extra_col1:
+            st.markdown("**🎲 Class Probabilities**")
+            for label, probability in analysis["probabilities"].items():
+                st.progress(probability / 100, text=f"{label}: {probability:.1f}%")
+            
+            st.markdown("**📊 Image Statistics**")
+            placeholders = {"image_stats": st.empty()}
+        
+        with extra_col2:
+            st.markdown("**🗂️ Similar Past Cases (this session)**")
+            placeholders["similar_cases"] = st.empty()
+        
+        st.markdown("**✨ Enhancement Preview**")
+        placeholders["enhancement"] = st.empty()
+        
+        for placeholder in placeholders.values():
+            placeholder.info("⏳ Computing...")
+        
+        create_gradient_divider()
+        
         # Export Options
         st.markdown("""
         <h3 style="text-align: center; margin: 2rem 0 1.5rem 0; font-size: 2rem;">
@@ -281,6 +314,44 @@ if uploaded_file is not None:
         with export_col2:
             if st.button("💾 Save to History", use_container_width=True):
                 st.info("💾 Analysis will be saved to your prediction history. Feature coming soon!")
+        
+        # Fill the extras in as they finish
+        names = {future: name for name, future in extras.items()}
+        for future in as_completed(names):
+            name = names[future]
+            placeholder = placeholders[name]
+            try:
+                value = future.result()
+            except Exception as e:
+                placeholder.warning(f"⚠️ Could not compute this section: {e}")
+                continue
+            
+            if name == "image_stats":
+                with placeholder.container():
+                    stat_col1, stat_col2, stat_col3 = st.columns(3)
+                    stat_col1.metric("☀️ Brightness", f"{value['mean_brightness']:.1f}")
+                    stat_col2.metric("🌓 Contrast (σ)", f"{value['std_brightness']:.1f}")
+                    stat_col3.metric("📏 Range", f"{value['min_value']}–{value['max_value']}")
+            elif name == "enhancement":
+                with placeholder.container():
+                    before_col, after_col = st.columns(2)
+                    before_col.image(value["original"], caption="Original", use_container_width=True)
+                    after_col.image(value["enhanced"], caption="Enhanced", use_container_width=True)
+            elif value:
+                placeholder.dataframe(
+                    [
+                        {
+                            "🕒 Time": record["timestamp"].strftime("%Y-%m-%d %H:%M"),
+                            "⚠️ Severity": record["severity"],
+                            "🎯 Confidence": f"{record['confidence']:.1f}%",
+                        }
+                        for record in value
+                    ],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                placeholder.info("No earlier predictions in this session with this severity and a similar confidence.")
 
 else:
     # Instructions when no image uploaded
@@ -0,0 +1,234 @@
+"""
+Prefork API Launcher
+Loads the model once and forks API workers that share it copy-on-write
+
+The parent process binds the listening socket, imports the image stack,
+loads the model and runs one warm-up prediction, then moves every object
+it has created into the permanent GC generation (`gc.freeze()`), so the
+collector in the workers never writes to (and thereby copies) the pages
+holding the weights and module state. It then forks the workers, which all
+accept on the shared socket, and restarts any worker that exits. History
+compaction runs in one more forked child, never in the parent: the parent
+stays free of threads and SQLite connections in use, so a replacement
+worker forked later inherits none of them.
+
+Memory is reported per worker from /proc/<pid>/smaps_rollup:
+- rss_mb: Resident memory, including pages shared with the parent
+- pss_mb: Proportional share (shared pages split between their users)
+- uss_mb: Unique memory, freed if the worker exits (Private_Clean + Private_Dirty)
+
+The parent must not serve requests before forking; connections, locks and
+threads it holds are reset in the workers by `model`'s at-fork hook.
+TensorFlow does not document its runtime as fork-safe, so with the real
+model use --no-preload if workers misbehave (each then loads its own copy).
+
+Usage:
+    python prefork.py [--workers 4] [--host 127.0.0.1] [--port 8000]
+                      [--report-interval 60] [--no-preload]
+"""
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+
+# Fields read from smaps_rollup, in kB
+_SMAPS_FIELDS = ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty")
+
+
+def memory_usage(pid):
+    """
+    Resident, proportional and unique memory of a process
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        dict: rss_mb, pss_mb, uss_mb and shared_mb, or None where
+              /proc/<pid>/smaps_rollup is unavailable (non-Linux)
+    """
+
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            values = {}
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError):
+        return None
+
+    return {
+        "rss_mb": values.get("Rss", 0) / 1024,
+        "pss_mb": values.get("Pss", 0) / 1024,
+        "uss_mb": (values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024,
+        "shared_mb": (values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)) / 1024,
+    }
+
+
+def memory_report(workers):
+    """Memory of the parent and each worker, keyed by role and pid."""
+    report = {f"parent {os.getpid()}": memory_usage(os.getpid())}
+    for pid in sorted(workers):
+        report[f"worker {pid}"] = memory_usage(pid)
+    return report
+
+
+def print_memory_report(workers):
+    report = memory_report(workers)
+    if all(usage is None for usage in report.values()):
+        print("⚠️ Per-process memory is only available on Linux (/proc/<pid>/smaps_rollup)", file=sys.stderr)
+        return
+
+    print("📊 Memory per process (MB):      RSS      PSS      USS   shared", file=sys.stderr)
+    for name, usage in report.items():
+        if usage is not None:
+            print(f"   {name:<24} {usage['rss_mb']:8.1f} {usage['pss_mb']:8.1f} "
+                  f"{usage['uss_mb']:8.1f} {usage['shared_mb']:8.1f}", file=sys.stderr)
+
+
+def preload():
+    """Import the image stack, load the model and run one warm-up prediction."""
+    import numpy as np
+    from PIL import Image
+    import utils  # noqa: F401  (imported for its shared pages)
+    import model
+
+    Image.init()  # format plugins are otherwise imported by each worker on first open
+
+    manager = model.get_model_manager()
+    # Called on the manager directly: the inference queue would start its
+    # scheduler thread in the parent
+    manager.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    print(f"📦 Model loaded and warmed up in parent {os.getpid()}", file=sys.stderr)
+
+
+def run_worker(server):
+    """Serve requests in a forked worker until terminated."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def run_compactor(server):
+    """Compact the history database in a forked child until terminated."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    try:
+        server.socket.close()  # only the workers accept connections
+        import model
+        compaction = model.start_history_compaction()
+        if compaction is not None:
+            compaction.join()
+    finally:
+        os._exit(0)
+
+
+def compaction_enabled():
+    """True when a history database is attached and retention is on."""
+    import model
+    from history_compaction import RetentionPolicy
+
+    return model.history_persisted() and RetentionPolicy.from_env().raw_days > 0
+
+
+def spawn(server, target=run_worker):
+    pid = os.fork()
+    if pid == 0:
+        target(server)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the inference API from preforked workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--report-interval", type=float, default=60,
+                        help="Seconds between memory reports (0 disables; SIGUSR1 prints one)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load the model in each worker instead of sharing the parent's")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        parser.error("prefork needs os.fork(); run api.py directly on this platform")
+
+    import api
+
+    server = api.create_server(args.host, args.port)
+    if not args.no_preload:
+        preload()
+
+    # Move everything loaded so far out of the collector's reach so workers
+    # never dirty those pages just by running a collection
+    gc.collect()
+    gc.freeze()
+
+    workers = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print_memory_report(workers))
+
+    for _ in range(args.workers):
+        workers.add(spawn(server))
+
+    # One compaction process for all workers; the parent never compacts, so
+    # replacement workers are forked from a process without that thread
+    compactor = spawn(server, run_compactor) if compaction_enabled() else None
+    print(f"🚀 {len(workers)} workers serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+
+    next_report = time.monotonic() + args.report_interval
+    while not stopping:
+        time.sleep(0.5)
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                break
+            if pid == compactor:
+                if not stopping:
+                    print(f"⚠️ Compaction process {pid} exited (status {status}); restarting it", file=sys.stderr)
+                    compactor = spawn(server, run_compactor)
+                continue
+            workers.discard(pid)
+            if not stopping:
+                print(f"⚠️ Worker {pid} exited (status {status}); starting a replacement", file=sys.stderr)
+                workers.add(spawn(server))
+
+        if args.report_interval and time.monotonic() >= next_report:
+            print_memory_report(workers)
+            next_report = time.monotonic() + args.report_interval
+
+    print("👋 Stopping workers", file=sys.stderr)
+    children = workers | {compactor} if compactor else workers
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
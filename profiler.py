@@ -0,0 +1,297 @@
+"""
+On-Demand Profiler
+Samples the stacks of the running process for a fixed time, without a restart
+
+A daemon thread reads every thread's current frame (`sys._current_frames`)
+at a fixed interval and counts identical stacks. Reading frames from a
+thread works for all threads of the process - Streamlit runs page scripts
+and the API runs requests outside the main thread, which a signal-based
+sampler (main thread only) would miss - and costs one short GIL hold per
+sample. When the run ends it writes:
+
+- <name>.speedscope.json: Open at https://www.speedscope.app (one profile per thread)
+- <name>.collapsed.txt: "thread;frame;frame count" lines for flamegraph.pl and similar
+- <name>.memory.json: With memory=True, the top allocation sites from tracemalloc
+
+Files go to ACCIDENT_PROFILE_DIR (default: <tempdir>/accident-profiles).
+Profiles cover only the process they run in: with prefork each API worker,
+and with a model server the server process, must be profiled separately.
+
+Started from the admin section of the Model Information page or the API's
+/debug/profile endpoint; both require ACCIDENT_ADMIN_TOKEN to be set. The
+same token unlocks other sessions' predictions on the Prediction History page.
+"""
+
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Where profile files are written
+PROFILE_DIR = os.environ.get("ACCIDENT_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "accident-profiles")
+
+# Seconds between samples and longest allowed run
+DEFAULT_INTERVAL = 0.01
+MAX_SECONDS = 300
+
+# Stack depth kept per tracemalloc allocation and allocation sites reported
+TRACEMALLOC_FRAMES = 25
+TOP_ALLOCATIONS = 25
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def admin_token():
+    """Token guarding the profiler controls (None: controls disabled)."""
+    return os.environ.get("ACCIDENT_ADMIN_TOKEN") or None
+
+
+def is_admin(token):
+    """True when `token` matches ACCIDENT_ADMIN_TOKEN (always False while it is unset)."""
+    expected = admin_token()
+    if not token or expected is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def _short_path(filename):
+    """Path relative to the repository, or to the sys.path entry (site-packages, stdlib) holding it."""
+    if filename.startswith(_ROOT + os.sep):
+        return os.path.relpath(filename, _ROOT)
+    prefixes = [p for p in sys.path if p and filename.startswith(p.rstrip(os.sep) + os.sep)]
+    return os.path.relpath(filename, max(prefixes, key=len)) if prefixes else filename
+
+
+def _frame_name(code):
+    filename = _short_path(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})", filename, code.co_firstlineno
+
+
+class _Run:
+    """One profiling run: sampler thread, counted stacks and the written result."""
+
+    def __init__(self, seconds, interval, memory):
+        self.seconds = seconds
+        self.interval = interval
+        self.memory = memory
+        self.started_at = datetime.now()
+        self.started = time.monotonic()
+        self.stop_event = threading.Event()
+        self.stacks = {}  # thread name -> Counter of stacks (tuples of code objects, root first)
+        self.samples = 0
+        self.result = None
+        self.thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def _sample(self):
+        own = threading.get_ident()
+        started_tracemalloc = False
+        try:
+            if self.memory:
+                import tracemalloc
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                    started_tracemalloc = True
+
+            deadline = self.started + self.seconds
+            while not self.stop_event.is_set() and time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack.reverse()
+                    name = names.get(ident, f"thread-{ident}")
+                    self.stacks.setdefault(name, Counter())[tuple(stack)] += 1
+                self.samples += 1
+                self.stop_event.wait(self.interval)
+
+            self.result = self._write()
+        except Exception as e:
+            print(f"❌ Profiling failed: {e}")
+            self.result = {"error": str(e)}
+        finally:
+            if started_tracemalloc:
+                import tracemalloc
+                tracemalloc.stop()
+
+    def _write(self):
+        elapsed = time.monotonic() - self.started
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"profile-{os.getpid()}-{self.started_at:%Y%m%d-%H%M%S}")
+
+        frames, index = [], {}
+        profiles, collapsed = [], []
+        for thread_name, counts in sorted(self.stacks.items()):
+            samples, weights = [], []
+            for stack, count in counts.most_common():
+                names = []
+                for code in stack:
+                    name, filename, line = _frame_name(code)
+                    if code not in index:
+                        index[code] = len(frames)
+                        frames.append({"name": name, "file": filename, "line": line})
+                    names.append(name.replace(";", ":"))
+                samples.append([index[code] for code in stack])
+                weights.append(count * self.interval * 1000)
+                collapsed.append(f"{thread_name};{';'.join(names)} {count}")
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+
+        files = {"speedscope": base + ".speedscope.json", "collapsed": base + ".collapsed.txt"}
+        with open(files["speedscope"], "w", encoding="utf-8") as f:
+            json.dump({
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "name": f"accident-severity pid {os.getpid()} {self.started_at:%Y-%m-%d %H:%M:%S}",
+                "exporter": "accident-severity profiler",
+                "activeProfileIndex": 0,
+                "shared": {"frames": frames},
+                "profiles": profiles,
+            }, f)
+        with open(files["collapsed"], "w", encoding="utf-8") as f:
+            f.write("\n".join(collapsed) + "\n")
+
+        allocations = None
+        if self.memory:
+            allocations = top_allocations()
+            files["memory"] = base + ".memory.json"
+            with open(files["memory"], "w", encoding="utf-8") as f:
+                json.dump(allocations, f, indent=2)
+
+        print(f"🔬 Profile of {self.samples} samples written to {files['speedscope']}")
+        return {
+            "files": files,
+            "samples": self.samples,
+            "seconds": round(elapsed, 2),
+            "threads": len(profiles),
+            "top_allocations": allocations,
+        }
+
+    def status(self):
+        running = self.thread.is_alive()
+        return {
+            "running": running,
+            "pid": os.getpid(),
+            "started_at": self.started_at.isoformat(),
+            "seconds": self.seconds,
+            "interval": self.interval,
+            "memory": self.memory,
+            "elapsed": round(time.monotonic() - self.started, 2) if running else None,
+            "samples": self.samples,
+            "result": self.result,
+        }
+
+
+def top_allocations(limit=TOP_ALLOCATIONS):
+    """
+    Largest live allocation sites traced by tracemalloc
+
+    Returns:
+        list: dicts with file, line, size_kb and count, largest first
+              (empty when tracemalloc is not tracing)
+    """
+
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    allocations = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        allocations.append({
+            "file": _short_path(frame.filename),
+            "line": frame.lineno,
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        })
+    return allocations
+
+
+_lock = threading.Lock()
+_run = None
+
+
+def start(seconds=30, interval=DEFAULT_INTERVAL, memory=False):
+    """
+    Start sampling this process in the background
+
+    Args:
+        seconds (float): How long to sample (at most MAX_SECONDS)
+        interval (float): Seconds between samples
+        memory (bool): Also trace allocations with tracemalloc (slows
+                       allocation-heavy code noticeably while it runs)
+
+    Returns:
+        dict: The run's status (see `status`)
+
+    Raises:
+        RuntimeError: A run is already in progress
+    """
+
+    global _run
+    seconds = min(max(float(seconds), 1.0), MAX_SECONDS)
+    interval = max(float(interval), 0.001)
+    with _lock:
+        if _run is not None and _run.thread.is_alive():
+            raise RuntimeError("A profile is already being recorded")
+        _run = _Run(seconds, interval, bool(memory))
+        _run.thread.start()
+    print(f"🔬 Profiling process {os.getpid()} for {seconds:.0f}s")
+    return _run.status()
+
+
+def stop():
+    """End the current run early; its files are still written. Returns its status."""
+    with _lock:
+        run = _run
+    if run is None:
+        return status()
+    run.stop_event.set()
+    run.thread.join()
+    return run.status()
+
+
+def status():
+    """
+    State of the current or last run
+
+    Returns:
+        dict: running, pid, started_at, seconds, interval, memory, elapsed,
+              samples and result (files, samples, seconds, threads and
+              top_allocations once written; None while running), or only
+              running and pid before the first run
+    """
+
+    with _lock:
+        run = _run
+    if run is None:
+        return {"running": False, "pid": os.getpid(), "result": None}
+    return run.status()
+
+
+def _after_fork_in_child():
+    global _lock, _run
+    _lock = threading.Lock()
+    _run = None  # the sampler thread does not survive the fork
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,191 @@
+"""
+Cross-Process Prediction Statistics
+Counters shared by every worker process through a shared-memory segment
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, stats stay per-process
+    fcntl = None
+
+from history import SEVERITY_BUCKETS
+
+# Segment layout: magic, layout version, total, per-class counts, confidence
+# sum, revision (bumped when stored history changes without new records)
+LAYOUT = struct.Struct(f"<IIQ{len(SEVERITY_BUCKETS)}QdQ")
+MAGIC = 0x41434349  # "ACCI"
+LAYOUT_VERSION = 2
+
+
+def default_segment_name():
+    """Segment name unique to this deployment directory."""
+    digest = hashlib.sha1(os.path.abspath(os.getcwd()).encode("utf-8")).hexdigest()[:10]
+    return f"accident_stats_{digest}"
+
+
+def _untrack(segment):
+    """
+    Stop the resource tracker from unlinking the segment at process exit
+
+    The segment must outlive any single worker; it is only removed by an
+    explicit `SharedStatistics.unlink()`.
+    """
+
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class SharedStatistics:
+    """
+    Prediction totals kept in a named shared-memory block
+
+    Every worker attaches to the same segment and updates it under an
+    exclusive file lock, so the dashboard shows the same numbers whichever
+    worker serves it. Implements the same `add()` / `summary()` interface
+    as `history.HistoryAggregate`.
+    """
+
+    def __init__(self, name=None):
+        self.name = name or default_segment_name()
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), "a+b")
+
+        with self._locked():
+            try:
+                self._segment = shared_memory.SharedMemory(name=self.name, create=True, size=LAYOUT.size)
+            except FileExistsError:
+                self._segment = shared_memory.SharedMemory(name=self.name)
+                if self._segment.size < LAYOUT.size:
+                    # Left behind with an older, smaller layout: replace it
+                    self._segment.unlink()
+                    self._segment.close()
+                    self._segment = shared_memory.SharedMemory(name=self.name, create=True, size=LAYOUT.size)
+            _untrack(self._segment)
+
+            magic, layout_version = struct.unpack_from("<II", self._segment.buf, 0)
+            if magic != MAGIC or layout_version != LAYOUT_VERSION:
+                self._write(0, [0] * len(SEVERITY_BUCKETS), 0.0, 0)
+
+    def after_fork(self):
+        """
+        Reopen the lock file in a forked child process
+
+        flock() locks belong to the open file description, which a fork
+        shares, so without this the parent and child would not exclude
+        each other.
+        """
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(self._lock_file.name, "a+b")
+
+    def _locked(self):
+        return _SegmentLock(self._thread_lock, self._lock_file)
+
+    def _read(self):
+        values = LAYOUT.unpack_from(self._segment.buf, 0)
+        total = values[2]
+        counts = list(values[3:3 + len(SEVERITY_BUCKETS)])
+        confidence_sum, revision = values[-2:]
+        return total, counts, confidence_sum, revision
+
+    def _write(self, total, counts, confidence_sum, revision):
+        LAYOUT.pack_into(self._segment.buf, 0, MAGIC, LAYOUT_VERSION, total, *counts, confidence_sum, revision)
+
+    def add(self, record):
+        """Fold one prediction record into the shared totals."""
+        with self._locked():
+            total, counts, confidence_sum, revision = self._read()
+            counts[record["class_id"]] += 1
+            self._write(total + 1, counts, confidence_sum + record["confidence"], revision)
+
+    def bump(self):
+        """Change the version for every worker without adding a record."""
+        with self._locked():
+            total, counts, confidence_sum, revision = self._read()
+            self._write(total, counts, confidence_sum, revision + 1)
+
+    @property
+    def version(self):
+        """Records folded in by all workers plus bumps; changes on every append."""
+        values = LAYOUT.unpack_from(self._segment.buf, 0)
+        return values[2] + values[-1]
+
+    def summary(self):
+        """Return the shared totals in the shape of `model.get_statistics()`."""
+        with self._locked():
+            total, counts, confidence_sum, _ = self._read()
+
+        return {
+            "total_predictions": total,
+            "average_confidence": confidence_sum / total if total else 0,
+            "severity_distribution": dict(zip(SEVERITY_BUCKETS, counts)),
+        }
+
+    def reset(self):
+        """Zero all counters for every worker."""
+        with self._locked():
+            revision = self._read()[3]
+            self._write(0, [0] * len(SEVERITY_BUCKETS), 0.0, revision)
+
+    def close(self):
+        """Detach this process from the segment."""
+        self._segment.close()
+        self._lock_file.close()
+
+    def unlink(self):
+        """Destroy the segment (call once, when the deployment is torn down)."""
+        self._segment.unlink()
+
+
+class _SegmentLock:
+    """Thread lock plus an exclusive flock on the segment's lock file."""
+
+    def __init__(self, thread_lock, lock_file):
+        self._thread_lock = thread_lock
+        self._lock_file = lock_file
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
+        return False
+
+
+def open_shared_statistics(name=None):
+    """
+    Attach to the deployment's shared statistics segment
+
+    Args:
+        name (str): Segment name (defaults to ACCIDENT_SHARED_STATS or a
+                    name derived from the working directory; set the
+                    variable to an empty string to disable sharing)
+
+    Returns:
+        SharedStatistics or None: None when sharing is disabled or unavailable
+    """
+
+    if name is None:
+        name = os.environ.get("ACCIDENT_SHARED_STATS", default_segment_name())
+    if not name or fcntl is None:
+        return None
+
+    try:
+        return SharedStatistics(name)
+    except OSError as e:
+        print(f"⚠️ Shared statistics unavailable ({e}). Using per-process totals.")
+        return None
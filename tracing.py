@@ -0,0 +1,412 @@
+"""
+Request Tracing
+Nested timing spans per request, exported as OTLP JSON and structured logs
+
+A request (one upload, one API call, one scorer batch) opens a root span;
+every stage below it - decode, validation, preprocessing, queueing, the
+model call, history writes - opens a child span with `span(name, **attrs)`
+or the `traced(name)` decorator. The root's trace id doubles as the request
+id. When the root span ends, the whole trace is either exported or dropped:
+
+- ACCIDENT_TRACE_FILE: Append each kept trace as one OTLP/JSON
+  `ExportTraceServiceRequest` line (the OpenTelemetry file exporter format,
+  readable by the collector's otlpjsonfile receiver)
+- ACCIDENT_TRACE_LOG: Set to 1 to also write one JSON line per span to
+  stderr through the "accident.trace" logger
+- ACCIDENT_TRACE_SAMPLE: Fraction of requests kept (default 1.0)
+- ACCIDENT_TRACE_SLOW_MS: Also keep any unsampled request slower than this
+
+Tracing is off unless a file or the log is configured; spans are then
+no-ops. Sampling is decided at the root (or taken from an incoming W3C
+`traceparent`), so a trace is kept or dropped as a whole.
+
+Spans follow the current thread's context. Work handed to a thread pool
+keeps its parent when the callable is wrapped with `bind`; the inference
+scheduler records its model call under the first waiting request and links
+the others.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger("accident.trace")
+
+SERVICE_NAME = "accident-severity"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_current = contextvars.ContextVar("accident_trace_span", default=None)
+
+
+class SpanContext:
+    """Identifies a span for parenting and links (possibly from another process)."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        """W3C trace context header value."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header):
+    """SpanContext from a W3C `traceparent` header, or None when absent or malformed."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(int(parts[3], 16) & 1))
+
+
+class Span:
+    """A timed operation; use through `span()` rather than directly."""
+
+    __slots__ = ("name", "context", "parent_id", "kind", "attributes", "links",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name, context, parent_id, kind, attributes, links):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.links = links
+        self.start_ns = None
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    @property
+    def request_id(self):
+        return self.context.trace_id
+
+    def set(self, **attributes):
+        """Add attributes (e.g. results known only at the end of the stage)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        with _lock:
+            trace = _pending.setdefault(self.context.trace_id, [0, []])
+            trace[0] += 1
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off."""
+
+    request_id = None
+    context = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Config:
+    def __init__(self):
+        self.path = None
+        self.log = False
+        self.sample_rate = 1.0
+        self.slow_ns = None
+
+    @property
+    def enabled(self):
+        return bool(self.path or self.log)
+
+
+_CONFIG = _Config()
+_lock = threading.Lock()
+_pending = {}  # trace id -> [open spans, finished spans] of traces with spans open here
+_log_handler = None
+
+
+def configure(path=None, log=None, sample_rate=None, slow_ms=None):
+    """
+    Set where traces go and which are kept (unset arguments keep their value)
+
+    Args:
+        path (str): File OTLP/JSON traces are appended to ("" disables)
+        log (bool): Write one JSON log line per span to stderr
+        sample_rate (float): Fraction of requests kept, 0.0-1.0
+        slow_ms (float): Keep unsampled requests slower than this (0 disables)
+    """
+
+    global _log_handler
+    if path is not None:
+        _CONFIG.path = path or None
+    if sample_rate is not None:
+        _CONFIG.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+    if slow_ms is not None:
+        _CONFIG.slow_ns = int(float(slow_ms) * 1_000_000) if slow_ms else None
+    if log is not None:
+        _CONFIG.log = bool(log)
+        if _CONFIG.log and _log_handler is None:
+            _log_handler = logging.StreamHandler(sys.stderr)
+            _log_handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(_log_handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        elif not _CONFIG.log and _log_handler is not None:
+            logger.removeHandler(_log_handler)
+            _log_handler = None
+            logger.propagate = True
+
+
+def settings():
+    """Current tracing configuration."""
+    return {
+        "enabled": _CONFIG.enabled,
+        "path": _CONFIG.path,
+        "log": _CONFIG.log,
+        "sample_rate": _CONFIG.sample_rate,
+        "slow_ms": _CONFIG.slow_ns / 1_000_000 if _CONFIG.slow_ns else None,
+    }
+
+
+def enabled():
+    """True when traces are written somewhere."""
+    return _CONFIG.enabled
+
+
+def _new_id(nbytes):
+    return f"{random.getrandbits(nbytes * 8) or 1:0{nbytes * 2}x}"
+
+
+def current_span():
+    """The innermost open span in this context (None outside a traced request)."""
+    return _current.get()
+
+
+def current_context():
+    """SpanContext of the innermost open span, for handing to another thread or process."""
+    active = _current.get()
+    return active.context if active is not None else None
+
+
+def request_id():
+    """Trace id of the request being served (None outside a traced request)."""
+    active = _current.get()
+    return active.context.trace_id if active is not None else None
+
+
+def span(name, parent=None, kind=KIND_INTERNAL, links=None, **attributes):
+    """
+    Open a span as a context manager
+
+    Without an open span (and no `parent`) this starts a new trace whose
+    sampling is decided here.
+
+    Args:
+        name (str): Operation name, e.g. "utils.preprocess_image"
+        parent (SpanContext): Explicit parent, e.g. from `parse_traceparent`
+                              or another thread (defaults to the current span)
+        kind (int): KIND_INTERNAL, KIND_SERVER or KIND_CLIENT
+        links (list): SpanContexts of related spans in other traces
+        **attributes: Span attributes (str, bool, int, float)
+
+    Returns:
+        Span, or a no-op stand-in while tracing is off
+    """
+
+    if not _CONFIG.enabled:
+        return _NOOP
+    if parent is None:
+        parent = current_context()
+    if parent is None:
+        context = SpanContext(_new_id(16), _new_id(8), random.random() < _CONFIG.sample_rate)
+        parent_id = None
+    else:
+        context = SpanContext(parent.trace_id, _new_id(8), parent.sampled)
+        parent_id = parent.span_id
+    return Span(name, context, parent_id, kind, attributes, list(links or ()))
+
+
+def traced(name):
+    """
+    Decorator wrapping every call in a span
+
+    When the first argument is an image (PIL) or array, its dimensions are
+    recorded: width, height and mode, or shape.
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _CONFIG.enabled:
+                return function(*args, **kwargs)
+            with span(name, **(describe(args[0]) if args else {})):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def describe(value):
+    """Span attributes describing an image or array (empty for anything else)."""
+    if hasattr(value, "mode") and hasattr(value, "size") and isinstance(value.size, tuple):
+        return {"image.width": value.size[0], "image.height": value.size[1], "image.mode": value.mode}
+    shape = getattr(value, "shape", None)
+    if isinstance(shape, tuple):
+        return {"array.shape": "x".join(str(n) for n in shape)}
+    return {}
+
+
+def bind(function):
+    """Wrap a callable so it runs under the caller's current span in any thread."""
+    active = _current.get()
+    if active is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current.set(active)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+# -- export -------------------------------------------------------------------
+
+
+def _finish(finished):
+    """Buffer a finished span; export its trace once no span of it is open in this process."""
+    with _lock:
+        trace = _pending[finished.context.trace_id]
+        trace[0] -= 1
+        trace[1].append(finished)
+        if trace[0]:
+            return
+        del _pending[finished.context.trace_id]
+    spans = trace[1]
+
+    # The last span to close is the local root (or a late background span)
+    keep = finished.context.sampled or (
+        _CONFIG.slow_ns is not None and finished.end_ns - finished.start_ns >= _CONFIG.slow_ns
+    )
+    if not keep:
+        return
+    try:
+        _export(spans)
+    except Exception as e:
+        print(f"❌ Trace export failed: {e}")
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_span(s):
+    encoded = {
+        "traceId": s.context.trace_id,
+        "spanId": s.context.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [_attribute(k, v) for k, v in s.attributes.items() if v is not None],
+        "status": {"code": _STATUS_ERROR, "message": s.error} if s.error else {"code": _STATUS_OK},
+    }
+    if s.parent_id:
+        encoded["parentSpanId"] = s.parent_id
+    if s.links:
+        encoded["links"] = [{"traceId": l.trace_id, "spanId": l.span_id} for l in s.links]
+    return encoded
+
+
+def _export(spans):
+    if _CONFIG.log:
+        for s in spans:
+            logger.info(json.dumps({
+                "event": "span",
+                "request_id": s.context.trace_id,
+                "span_id": s.context.span_id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "start": s.start_ns / 1e9,
+                "duration_ms": round((s.end_ns - s.start_ns) / 1e6, 3),
+                "status": "error" if s.error else "ok",
+                **({"error": s.error} if s.error else {}),
+                **s.attributes,
+            }, default=str))
+
+    if _CONFIG.path:
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", SERVICE_NAME),
+                _attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "accident.tracing"},
+                "spans": [_otlp_span(s) for s in spans],
+            }],
+        }]}, default=str)
+        with _lock:
+            with open(_CONFIG.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    _pending.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+configure(
+    path=os.environ.get("ACCIDENT_TRACE_FILE", ""),
+    log=os.environ.get("ACCIDENT_TRACE_LOG", "") not in ("", "0"),
+    sample_rate=os.environ.get("ACCIDENT_TRACE_SAMPLE", "1.0"),
+    slow_ms=os.environ.get("ACCIDENT_TRACE_SLOW_MS", "0"),
+)
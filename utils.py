@@ -7,7 +7,31 @@ import numpy as np
 from PIL import Image
 import io
 
+import tracing
+from metrics import instrumented
 
+
+@instrumented("decode")
+def decode_image(source):
+    """
+    Open and fully decode an image
+    
+    Args:
+        source: File path or file-like object (e.g. a Streamlit UploadedFile)
+    
+    Returns:
+        PIL.Image: Decoded image, independent of `source` once returned
+    """
+    
+    with tracing.span("utils.decode_image") as span:
+        image = Image.open(source)
+        image.load()
+        span.set(**tracing.describe(image), **{"image.format": image.format})
+    return image
+
+
+@instrumented("preprocess")
+@tracing.traced("utils.preprocess_image")
 def preprocess_image(image, target_size=(224, 224)):
     """
     Preprocess image for model input
@@ -35,16 +59,19 @@ def preprocess_image(image, target_size=(224, 224)):
     try:
         # Ensure RGB format (remove alpha channel if present)
         if image.mode != 'RGB':
-            image = image.convert('RGB')
+            with tracing.span("preprocess.convert", **{"image.mode": image.mode}):
+                image = image.convert('RGB')
         
         # Resize to model input size
-        image = image.resize(target_size, Image.Resampling.LANCZOS)
+        with tracing.span("preprocess.resize", target=f"{target_size[0]}x{target_size[1]}"):
+            image = image.resize(target_size, Image.Resampling.LANCZOS)
         
-        # Convert to numpy array
-        img_array = np.array(image, dtype=np.float32)
-        
-        # Normalize pixel values to [0, 1]
-        img_array = img_array / 255.0
+        with tracing.span("preprocess.normalize"):
+            # Convert to numpy array
+            img_array = np.array(image, dtype=np.float32)
+            
+            # Normalize pixel values to [0, 1]
+            img_array = img_array / 255.0
         
         # Add batch dimension: (224, 224, 3) -> (1, 224, 224, 3)
         img_array = np.expand_dims(img_array, axis=0)
@@ -55,12 +82,46 @@ def preprocess_image(image, target_size=(224, 224)):
         raise ValueError(f"Image preprocessing failed: {str(e)}")
 
 
-def validate_image(image):
+def preprocess_batch(images, target_size=(224, 224), executor=None):
+    """
+    Preprocess several images into one model input batch
+    
+    Args:
+        images (list): PIL images
+        target_size (tuple): Target dimensions (height, width)
+        executor (Executor): Optional pool that preprocesses images concurrently
+                             (Pillow releases the GIL while resizing)
+    
+    Returns:
+        np.ndarray: Batch of shape (N, 224, 224, 3), same values as
+                    stacking `preprocess_image` results
+    """
+    
+    batch = np.empty((len(images), target_size[1], target_size[0], 3), dtype=np.float32)
+    
+    def fill(i):
+        batch[i] = preprocess_image(images[i], target_size)[0]
+    
+    with tracing.span("utils.preprocess_batch", images=len(images)):
+        if executor is None or len(images) < 2:
+            for i in range(len(images)):
+                fill(i)
+        else:
+            list(executor.map(tracing.bind(fill), range(len(images))))
+    
+    return batch
+
+
+@instrumented("validate")
+@tracing.traced("utils.validate_image")
+def validate_image(image, file_size=None):
     """
     Validate uploaded image meets requirements
     
     Args:
         image (PIL.Image): Image to validate
+        file_size (int): Size of the uploaded file in bytes; when given it is
+                         checked directly instead of re-encoding the image
     
     Returns:
         tuple: (is_valid, error_message)
@@ -81,9 +142,17 @@ def validate_image(image):
         return False, f"❌ Unsupported color mode: {image.mode}"
     
     # Check file size (if available)
+    if file_size is not None:
+        size_mb = file_size / (1024 * 1024)
+        if size_mb > 10:
+            return False, f"❌ File too large: {size_mb:.2f}MB (max: 10MB)"
+        return True, "✅ Image validated successfully"
+    
     try:
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
+        with tracing.span("validate_image.png_encode") as span:
+            img_byte_arr = io.BytesIO()
+            image.save(img_byte_arr, format='PNG')
+            span.set(bytes=img_byte_arr.tell())
         size_mb = len(img_byte_arr.getvalue()) / (1024 * 1024)
         
         if size_mb > 10: